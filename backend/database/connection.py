@@ -68,17 +68,26 @@ async def init_db():
         # Import models inside function to avoid circular imports
         from models import (
             alert,
+            alert_daily_count,
+            alert_incident,
             machine,
+            machine_reliability,
             maintenance_log,
+            part_consumption,
             sensor_data,
             sop_task,
             spare_part,
+            stock_movement,
             supplier,
             supply_chain_risk,
         )
 
         await conn.run_sync(Base.metadata.create_all)
 
+        from database.migrations import apply_schema_upgrades
+
+        await apply_schema_upgrades(conn)
+
     print("Database initialized successfully")
 
 # ------------------------------
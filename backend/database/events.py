@@ -0,0 +1,61 @@
+"""
+Commit Events
+Notifies in-memory indexes about rows changed by committed transactions
+"""
+
+from collections import defaultdict
+from itertools import chain
+from typing import Any, Callable, Dict, Iterable, List
+import logging
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = "committed_changes"
+
+_callbacks: Dict[str, List[Callable[[List[Any]], None]]] = defaultdict(list)
+
+def on_commit(*tables: str):
+    """
+    Register a callback for committed changes to the given tables
+    The callback receives the changed ORM objects, or the rows passed to
+    mark_changed() for Core statements, and must not block
+    """
+    def decorator(callback: Callable[[List[Any]], None]):
+        for table in tables:
+            _callbacks[table].append(callback)
+        return callback
+    return decorator
+
+def mark_changed(session: Any, table: str, rows: Iterable[Any] = ()):
+    """Record a change made with a Core statement, which flush events do not see"""
+    session = getattr(session, "sync_session", session)
+    pending = session.info.setdefault(_PENDING_KEY, defaultdict(list))
+    pending[table].extend(rows)
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed(session, flush_context):
+    pending = session.info.setdefault(_PENDING_KEY, defaultdict(list))
+    for obj in chain(session.new, session.dirty, session.deleted):
+        table = getattr(obj, "__tablename__", None)
+        if table in _callbacks:
+            pending[table].append(obj)
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_committed(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+
+    for table, rows in pending.items():
+        for callback in _callbacks.get(table, ()):
+            try:
+                callback(rows)
+            except Exception as e:
+                logger.error(f"Commit callback for {table} failed: {e}", exc_info=True)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
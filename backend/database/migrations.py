@@ -0,0 +1,141 @@
+"""
+Schema Upgrades
+Idempotent DDL applied after create_all, for changes that create_all
+cannot make to tables that already exist
+"""
+
+from sqlalchemy import text
+
+def _text_to_jsonb(table: str, column: str) -> str:
+    """
+    Convert a TEXT column holding JSON to JSONB, once
+    Blank values become NULL, plain comma-separated lists become JSON arrays
+    and quoted scalars become one-element arrays, so @> containment matches them
+    """
+    return f"""
+    DO $$
+    BEGIN
+        IF (SELECT data_type FROM information_schema.columns
+            WHERE table_name = '{table}' AND column_name = '{column}') = 'text' THEN
+            ALTER TABLE {table} ALTER COLUMN {column} TYPE JSONB USING (
+                CASE
+                    WHEN {column} IS NULL OR btrim({column}) = '' THEN NULL
+                    WHEN left(btrim({column}), 1) = '"' THEN jsonb_build_array({column}::jsonb)
+                    WHEN left(btrim({column}), 1) IN ('[', '{{') THEN {column}::jsonb
+                    ELSE to_jsonb(regexp_split_to_array(btrim({column}), '\\s*,\\s*'))
+                END
+            );
+        END IF;
+        -- Scalars left behind by an earlier conversion
+        UPDATE {table} SET {column} = jsonb_build_array({column}) WHERE jsonb_typeof({column}) = 'string';
+    END $$
+    """
+
+# Tables served with ?since= delta sync, and the key their deletes are reported by
+SYNCED_TABLES = {
+    "machines": "id",
+    "alerts": "id",
+    "supply_chain_risk": "spare_part_id",
+    "sop_tasks": "id",
+}
+
+SCHEMA_UPGRADES = [
+    # One risk row per spare part (required by the bulk ON CONFLICT upsert);
+    # keep the newest row where older assessments left duplicates behind
+    """
+    DELETE FROM supply_chain_risk a
+    USING supply_chain_risk b
+    WHERE a.spare_part_id = b.spare_part_id AND a.id < b.id
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_supply_chain_risk_spare_part_id ON supply_chain_risk (spare_part_id)",
+    "DROP INDEX IF EXISTS ix_supply_chain_risk_spare_part_id",
+    # Incremental risk recomputation
+    "ALTER TABLE spare_parts ADD COLUMN IF NOT EXISTS risk_dirty BOOLEAN NOT NULL DEFAULT TRUE",
+    "CREATE INDEX IF NOT EXISTS idx_spare_parts_risk_dirty ON spare_parts (id) WHERE risk_dirty",
+    # Consumption index bookkeeping
+    "ALTER TABLE maintenance_logs ADD COLUMN IF NOT EXISTS consumption_indexed BOOLEAN NOT NULL DEFAULT FALSE",
+    # Stock reservation ledger
+    "ALTER TABLE spare_parts ADD COLUMN IF NOT EXISTS reserved_quantity INTEGER NOT NULL DEFAULT 0",
+    "ALTER TABLE stock_movements ADD COLUMN IF NOT EXISTS from_reservation BOOLEAN NOT NULL DEFAULT FALSE",
+    # JSON text columns -> indexed JSONB
+    *(
+        _text_to_jsonb(table, column)
+        for table, column in (
+            ("spare_parts", "compatible_machines"),
+            ("maintenance_logs", "spare_parts_used"),
+            ("sop_tasks", "checklist"),
+        )
+    ),
+    "CREATE INDEX IF NOT EXISTS idx_spare_parts_compatible_machines ON spare_parts USING gin (compatible_machines)",
+    "CREATE INDEX IF NOT EXISTS idx_maintenance_logs_spare_parts_used ON maintenance_logs USING gin (spare_parts_used jsonb_path_ops)",
+    "CREATE INDEX IF NOT EXISTS idx_sop_tasks_checklist ON sop_tasks USING gin (checklist)",
+    # Every listed row carries an updated_at
+    "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ",
+    "UPDATE alerts SET updated_at = GREATEST(created_at, acknowledged_at, resolved_at) WHERE updated_at IS NULL",
+    *(
+        statement
+        for table in SYNCED_TABLES
+        for statement in (
+            f"UPDATE {table} SET updated_at = COALESCE(created_at, now()) WHERE updated_at IS NULL",
+            f"ALTER TABLE {table} ALTER COLUMN updated_at SET DEFAULT clock_timestamp()",
+        )
+    ),
+    "ALTER TABLE alerts ALTER COLUMN updated_at SET NOT NULL",
+    # Delta sync reads (change_seq, id) ranges; change_seq is the writing transaction's id
+    """
+    CREATE OR REPLACE FUNCTION sync_stamp() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.change_seq := txid_current();
+        RETURN NEW;
+    END $$
+    """,
+    # Deletes leave a tombstone keyed by TG_ARGV[0]; re-inserting the key clears it
+    """
+    CREATE OR REPLACE FUNCTION sync_tombstone() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            INSERT INTO sync_tombstones (table_name, row_key, change_seq, deleted_at)
+            VALUES (TG_TABLE_NAME, (to_jsonb(OLD) ->> TG_ARGV[0])::integer, txid_current(), now())
+            ON CONFLICT (table_name, row_key)
+            DO UPDATE SET change_seq = EXCLUDED.change_seq, deleted_at = EXCLUDED.deleted_at;
+            RETURN OLD;
+        END IF;
+        DELETE FROM sync_tombstones
+        WHERE table_name = TG_TABLE_NAME AND row_key = (to_jsonb(NEW) ->> TG_ARGV[0])::integer;
+        RETURN NEW;
+    END $$
+    """,
+    *(
+        statement
+        for table, key in SYNCED_TABLES.items()
+        for statement in (
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS change_seq BIGINT",
+            # Rows written before the trigger existed sort first
+            f"UPDATE {table} SET change_seq = 0 WHERE change_seq IS NULL",
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_change_seq_id ON {table} (change_seq, id)",
+            f"DROP INDEX IF EXISTS idx_{table}_updated_at_id",
+            f"DROP TRIGGER IF EXISTS {table}_sync_stamp ON {table}",
+            f"CREATE TRIGGER {table}_sync_stamp BEFORE INSERT OR UPDATE ON {table} "
+            f"FOR EACH ROW EXECUTE PROCEDURE sync_stamp()",
+            f"DROP TRIGGER IF EXISTS {table}_sync_tombstone ON {table}",
+            # Only risk rows reuse a key (one per spare part); ids elsewhere are never reinserted
+            f"CREATE TRIGGER {table}_sync_tombstone AFTER {'INSERT OR DELETE' if key != 'id' else 'DELETE'} ON {table} "
+            f"FOR EACH ROW EXECUTE PROCEDURE sync_tombstone('{key}')",
+        )
+    ),
+    # Simulated risk percentiles served by /risk/all
+    "ALTER TABLE supply_chain_risk ADD COLUMN IF NOT EXISTS distribution JSONB",
+    # Alert storm grouping
+    "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS incident_id INTEGER REFERENCES alert_incidents (id)",
+    "CREATE INDEX IF NOT EXISTS ix_alerts_incident_id ON alerts (incident_id)",
+    # Open-alert queries
+    "CREATE INDEX IF NOT EXISTS idx_alerts_open ON alerts (status, created_at) WHERE status IN ('ACTIVE', 'ACKNOWLEDGED')",
+    # Booking calendar reloads
+    "CREATE INDEX IF NOT EXISTS idx_maintenance_logs_open_technician ON maintenance_logs (technician) WHERE status IN ('SCHEDULED', 'IN_PROGRESS')",
+    "CREATE INDEX IF NOT EXISTS idx_maintenance_logs_open_machine ON maintenance_logs (machine_id) WHERE status IN ('SCHEDULED', 'IN_PROGRESS')",
+]
+
+async def apply_schema_upgrades(conn):
+    """Run every upgrade statement on an open connection"""
+    for statement in SCHEMA_UPGRADES:
+        await conn.execute(text(statement))
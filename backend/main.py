@@ -14,10 +14,16 @@ logging.disable(logging.CRITICAL)  # <-- turns OFF ALL logs globally
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import uvicorn
 
 from database.connection import init_db, close_db
 from routes import sensors, machines, faults, supply_chain, inventory, alerts, sop, maintenance
+from monitoring.reprediction_scheduler import reprediction_scheduler
+from services.alert_engine import alert_engine
+from services.inventory_service import inventory_service
+from services.alert_retention import alert_retention
+from services.risk_refresher import risk_refresher
 
 
 @asynccontextmanager
@@ -31,7 +37,34 @@ async def lifespan(app: FastAPI):
     print("==================================\n")
 
     await init_db()
+
+    # Event-driven re-prediction of machines with new sensor data
+    scheduler_task = asyncio.create_task(reprediction_scheduler.run(faults.repredict_machine))
+
+    # Batched writer for alerts raised by readings and predictions
+    alert_engine_task = asyncio.create_task(alert_engine.run())
+
+    # Periodic reconciliation of part status and stock value
+    inventory_task = asyncio.create_task(inventory_service.run())
+
+    # Compaction of old resolved alerts into daily counts
+    retention_task = asyncio.create_task(alert_retention.run())
+
+    # Rescoring of dirty and expired supply chain risk assessments
+    risk_task = asyncio.create_task(risk_refresher.run())
+
     yield
+
+    reprediction_scheduler.stop()
+    await scheduler_task
+    alert_engine.stop()
+    await alert_engine_task
+    inventory_service.stop()
+    await inventory_task
+    alert_retention.stop()
+    await retention_task
+    risk_refresher.stop()
+    await risk_task
     await close_db()
 
 
@@ -2,21 +2,33 @@
 from .machine import Machine
 from .sensor_data import SensorData
 from .alert import Alert
+from .alert_incident import AlertIncident
+from .alert_daily_count import AlertDailyCount
 from .maintenance_log import MaintenanceLog
 from .spare_part import SparePart
 from .supplier import Supplier
 from .supply_chain_risk import SupplyChainRisk
 from .sop_task import SOPTask
+from .part_consumption import PartConsumption
+from .stock_movement import StockMovement
+from .machine_reliability import MachineReliability
+from .sync_tombstone import SyncTombstone
 
 __all__ = [
     "Machine",
     "SensorData",
     "Alert",
+    "AlertIncident",
+    "AlertDailyCount",
     "MaintenanceLog",
     "SparePart",
     "Supplier",
     "SupplyChainRisk",
-    "SOPTask"
+    "SOPTask",
+    "PartConsumption",
+    "StockMovement",
+    "MachineReliability",
+    "SyncTombstone"
 ]
 
 
@@ -3,7 +3,7 @@ Alert Model
 Stores alerts and warnings generated by the system
 """
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Enum
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Enum, Index, BigInteger
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import enum
@@ -35,6 +35,7 @@ class Alert(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     machine_id = Column(Integer, ForeignKey("machines.id"), nullable=True, index=True)
+    incident_id = Column(Integer, ForeignKey("alert_incidents.id"), nullable=True, index=True)
     
     alert_type = Column(Enum(AlertType), nullable=False)
     severity = Column(Enum(AlertSeverity), nullable=False, default=AlertSeverity.WARNING)
@@ -55,10 +56,21 @@ class Alert(Base):
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.clock_timestamp(), onupdate=func.clock_timestamp(), nullable=False)
+    change_seq = Column(BigInteger, nullable=True)  # writing transaction id, stamped by trigger for ?since= delta sync
     
     # Relationships
     machine = relationship("Machine", back_populates="alerts")
     
+    __table_args__ = (
+        Index('idx_alerts_change_seq_id', 'change_seq', 'id'),
+        # Open alerts are a small, hot slice of the table
+        Index(
+            'idx_alerts_open', 'status', 'created_at',
+            postgresql_where=status.in_([AlertStatus.ACTIVE, AlertStatus.ACKNOWLEDGED])
+        ),
+    )
+    
     def __repr__(self):
         return f"<Alert(id={self.id}, type='{self.alert_type}', severity='{self.severity}')>"
 
@@ -0,0 +1,30 @@
+"""
+Alert Daily Count Model
+Compact per-day alert history kept after old resolved alerts are purged
+"""
+
+from sqlalchemy import Column, Integer, Date, DateTime, Enum, Index
+from sqlalchemy.sql import func
+from database.connection import Base
+from models.alert import AlertType, AlertSeverity
+
+class AlertDailyCount(Base):
+    __tablename__ = "alert_daily_counts"
+    
+    day = Column(Date, primary_key=True)  # UTC day the alerts were raised
+    machine_id = Column(Integer, primary_key=True)  # no FK: history outlives machines; 0 = no machine
+    alert_type = Column(Enum(AlertType), primary_key=True)
+    severity = Column(Enum(AlertSeverity), primary_key=True)
+    
+    # Aggregates
+    alert_count = Column(Integer, nullable=False, default=0)
+    
+    # Timestamps
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        Index('idx_alert_daily_counts_machine_day', 'machine_id', 'day'),
+    )
+    
+    def __repr__(self):
+        return f"<AlertDailyCount(day={self.day}, machine={self.machine_id}, type='{self.alert_type}', count={self.alert_count})>"
@@ -0,0 +1,48 @@
+"""
+Alert Incident Model
+Groups alerts of one type raised at one location within a time window,
+so an alert storm is one incident with counters instead of a flood of rows
+"""
+
+from sqlalchemy import Column, Integer, String, DateTime, Enum, Index
+from sqlalchemy.sql import func
+import enum
+from database.connection import Base
+from models.alert import AlertType, AlertSeverity
+
+class IncidentStatus(str, enum.Enum):
+    OPEN = "open"          # at least one member alert is still active or acknowledged
+    RESOLVED = "resolved"  # every member alert is resolved or dismissed
+
+class AlertIncident(Base):
+    __tablename__ = "alert_incidents"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    
+    # Correlation key
+    location = Column(String(100), nullable=False)
+    alert_type = Column(Enum(AlertType), nullable=False)
+    
+    severity = Column(Enum(AlertSeverity), nullable=False)  # highest among member alerts
+    status = Column(Enum(IncidentStatus), nullable=False, default=IncidentStatus.OPEN)
+    
+    # Counters
+    alert_count = Column(Integer, nullable=False, default=0)
+    open_alert_count = Column(Integer, nullable=False, default=0)
+    machine_count = Column(Integer, nullable=False, default=0)
+    repeat_count = Column(Integer, nullable=False, default=0)  # re-triggers folded into open alerts
+    
+    first_alert_at = Column(DateTime(timezone=True), nullable=False)
+    last_alert_at = Column(DateTime(timezone=True), nullable=False)
+    resolved_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        Index('idx_alert_incidents_open', 'last_alert_at', postgresql_where=(status == IncidentStatus.OPEN)),
+    )
+    
+    def __repr__(self):
+        return f"<AlertIncident(id={self.id}, location='{self.location}', type='{self.alert_type}', alerts={self.alert_count})>"
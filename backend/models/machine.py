@@ -3,7 +3,7 @@ Machine Model
 Represents factory machines with their specifications and status
 """
 
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, Enum
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, Enum, Index, BigInteger
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import enum
@@ -58,13 +58,18 @@ class Machine(Base):
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.clock_timestamp(), onupdate=func.clock_timestamp())
+    change_seq = Column(BigInteger, nullable=True)  # writing transaction id, stamped by trigger for ?since= delta sync
     
     # Relationships
     sensor_data = relationship("SensorData", back_populates="machine", cascade="all, delete-orphan")
     alerts = relationship("Alert", back_populates="machine", cascade="all, delete-orphan")
     maintenance_logs = relationship("MaintenanceLog", back_populates="machine", cascade="all, delete-orphan")
     
+    __table_args__ = (
+        Index('idx_machines_change_seq_id', 'change_seq', 'id'),
+    )
+    
     def __repr__(self):
         return f"<Machine(id={self.id}, machine_id='{self.machine_id}', status='{self.status}')>"
 
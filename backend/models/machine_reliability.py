@@ -0,0 +1,35 @@
+"""
+Machine Reliability Model
+Per-machine maintenance aggregates behind the MTBF, MTTR and cost KPIs
+"""
+
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from database.connection import Base
+
+class MachineReliability(Base):
+    __tablename__ = "machine_reliability"
+    
+    machine_id = Column(Integer, ForeignKey("machines.id", ondelete="CASCADE"), primary_key=True)
+    
+    # Open work
+    scheduled_count = Column(Integer, nullable=False, default=0)
+    in_progress_count = Column(Integer, nullable=False, default=0)
+    
+    # Completed work
+    completed_count = Column(Integer, nullable=False, default=0)
+    maintenance_hours = Column(Float, nullable=False, default=0.0)  # downtime of all completed work
+    total_cost = Column(Float, nullable=False, default=0.0)
+    
+    # Failures: completed corrective and emergency maintenance
+    failure_count = Column(Integer, nullable=False, default=0)
+    repair_count = Column(Integer, nullable=False, default=0)  # failures with a known repair time
+    repair_hours = Column(Float, nullable=False, default=0.0)
+    failure_cost = Column(Float, nullable=False, default=0.0)
+    last_failure_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # Timestamps
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<MachineReliability(machine={self.machine_id}, failures={self.failure_count}, completed={self.completed_count})>"
@@ -3,8 +3,9 @@ Maintenance Log Model
 Tracks maintenance activities and history
 """
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Enum
-from sqlalchemy.sql import func
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Enum, Boolean, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func, text
 from sqlalchemy.orm import relationship
 import enum
 from database.connection import Base
@@ -42,7 +43,8 @@ class MaintenanceLog(Base):
     # Cost and resources
     cost = Column(Float, nullable=True)
     technician = Column(String(100), nullable=True)
-    spare_parts_used = Column(Text, nullable=True)  # JSON string of parts
+    spare_parts_used = Column(JSONB, nullable=True)  # list of {part_id|part_number, quantity}
+    consumption_indexed = Column(Boolean, default=False, nullable=False)  # parts used counted in part_consumption
     
     # SOP reference
     sop_reference = Column(String(50), nullable=True)  # e.g., "SOP-MAINT-02"
@@ -57,6 +59,16 @@ class MaintenanceLog(Base):
     # Relationships
     machine = relationship("Machine", back_populates="maintenance_logs")
     
+    __table_args__ = (
+        Index('idx_maintenance_logs_spare_parts_used', 'spare_parts_used',
+              postgresql_using='gin', postgresql_ops={'spare_parts_used': 'jsonb_path_ops'}),
+        # Calendar reloads under the booking locks read only open work
+        Index('idx_maintenance_logs_open_technician', 'technician',
+              postgresql_where=text("status IN ('SCHEDULED', 'IN_PROGRESS')")),
+        Index('idx_maintenance_logs_open_machine', 'machine_id',
+              postgresql_where=text("status IN ('SCHEDULED', 'IN_PROGRESS')")),
+    )
+    
     def __repr__(self):
         return f"<MaintenanceLog(id={self.id}, type='{self.maintenance_type}', status='{self.status}')>"
 
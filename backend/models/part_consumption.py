@@ -0,0 +1,30 @@
+"""
+Part Consumption Model
+Daily and weekly spare part usage aggregated from completed maintenance logs
+"""
+
+from sqlalchemy import Column, Integer, Float, Date, DateTime, ForeignKey, Enum
+from sqlalchemy.sql import func
+import enum
+from database.connection import Base
+
+class ConsumptionPeriod(str, enum.Enum):
+    DAY = "day"
+    WEEK = "week"  # period_start is the Monday of the ISO week
+
+class PartConsumption(Base):
+    __tablename__ = "part_consumption"
+    
+    spare_part_id = Column(Integer, ForeignKey("spare_parts.id"), primary_key=True)
+    period = Column(Enum(ConsumptionPeriod), primary_key=True)
+    period_start = Column(Date, primary_key=True)
+    
+    # Aggregates
+    quantity = Column(Float, nullable=False, default=0.0)
+    log_count = Column(Integer, nullable=False, default=0)
+    
+    # Timestamps
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<PartConsumption(part={self.spare_part_id}, {self.period}={self.period_start}, quantity={self.quantity})>"
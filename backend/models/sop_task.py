@@ -3,7 +3,8 @@ SOP Task Model
 Manages Standard Operating Procedure tasks and workflows
 """
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Enum, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Enum, Boolean, Index, BigInteger
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import enum
@@ -45,8 +46,8 @@ class SOPTask(Base):
     assigned_to = Column(String(100), nullable=True)
     created_by = Column(String(100), nullable=True)
     
-    # Checklist (JSON string)
-    checklist = Column(Text, nullable=True)  # JSON array of checklist items
+    # Checklist
+    checklist = Column(JSONB, nullable=True)  # array of checklist items
     
     # Results and notes
     results = Column(Text, nullable=True)
@@ -58,11 +59,17 @@ class SOPTask(Base):
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.clock_timestamp(), onupdate=func.clock_timestamp())
+    change_seq = Column(BigInteger, nullable=True)  # writing transaction id, stamped by trigger for ?since= delta sync
     
     # Relationships
     machine = relationship("Machine")
     
+    __table_args__ = (
+        Index('idx_sop_tasks_checklist', 'checklist', postgresql_using='gin'),
+        Index('idx_sop_tasks_change_seq_id', 'change_seq', 'id'),
+    )
+    
     def __repr__(self):
         return f"<SOPTask(id={self.id}, sop_code='{self.sop_code}', status='{self.status}')>"
 
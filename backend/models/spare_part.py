@@ -3,7 +3,8 @@ Spare Part Model
 Manages inventory of spare parts
 """
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Enum
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Enum, Boolean, Index, event, inspect
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import enum
@@ -28,6 +29,7 @@ class SparePart(Base):
     current_quantity = Column(Integer, default=0, nullable=False)
     min_quantity = Column(Integer, default=5, nullable=False)  # Reorder point
     max_quantity = Column(Integer, default=50, nullable=False)
+    reserved_quantity = Column(Integer, default=0, nullable=False)  # held by open reservations
     unit = Column(String(20), default="pcs", nullable=False)
     
     # Cost
@@ -38,7 +40,7 @@ class SparePart(Base):
     status = Column(Enum(PartStatus), default=PartStatus.IN_STOCK)
     
     # Compatibility
-    compatible_machines = Column(Text, nullable=True)  # JSON array of machine_ids
+    compatible_machines = Column(JSONB, nullable=True)  # array of machine_ids (codes or keys)
     
     # Supplier info
     primary_supplier_id = Column(Integer, ForeignKey("suppliers.id"), nullable=True)
@@ -52,19 +54,48 @@ class SparePart(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     last_ordered_at = Column(DateTime(timezone=True), nullable=True)
     
+    # Supply chain risk must be recomputed (set when a risk input changes)
+    risk_dirty = Column(Boolean, default=True, nullable=False)
+    
     # Relationships
     supplier = relationship("Supplier", back_populates="spare_parts")
     
+    __table_args__ = (
+        Index('idx_spare_parts_risk_dirty', 'id', postgresql_where=risk_dirty.is_(True)),
+        Index('idx_spare_parts_compatible_machines', 'compatible_machines', postgresql_using='gin'),
+    )
+    
     def __repr__(self):
         return f"<SparePart(id={self.id}, part_number='{self.part_number}', quantity={self.current_quantity})>"
 
+# Columns that determine status and total_value
+STOCK_COLUMNS = ("current_quantity", "min_quantity", "unit_cost")
 
+def stock_status(quantity: int, min_quantity: int) -> PartStatus:
+    """Status implied by the stock level (SOP-SC-04)"""
+    if quantity <= 0:
+        return PartStatus.OUT_OF_STOCK
+    if quantity <= min_quantity:
+        return PartStatus.LOW_STOCK
+    return PartStatus.IN_STOCK
 
+@event.listens_for(SparePart, "before_insert")
+@event.listens_for(SparePart, "before_update")
+def _sync_stock_fields(mapper, connection, target):
+    """Keep status and total_value in step with ORM inventory writes"""
+    state = inspect(target)
+    if state.has_identity and not any(state.attrs[column].history.has_changes() for column in STOCK_COLUMNS):
+        return
+    quantity = target.current_quantity or 0
+    target.status = stock_status(quantity, target.min_quantity if target.min_quantity is not None else 5)
+    target.total_value = quantity * (target.unit_cost or 0.0)
 
+# Columns that feed the supply chain risk score
+RISK_INPUT_COLUMNS = ("current_quantity", "min_quantity", "primary_supplier_id", "lead_time_days", "status")
 
-
-
-
-
-
-
+@event.listens_for(SparePart, "before_update")
+def _mark_risk_dirty(mapper, connection, target):
+    """Flag the part for risk recomputation when a risk input changes through the ORM"""
+    state = inspect(target)
+    if any(state.attrs[column].history.has_changes() for column in RISK_INPUT_COLUMNS):
+        target.risk_dirty = True
@@ -0,0 +1,43 @@
+"""
+Stock Movement Model
+Append-only ledger of spare part reservations, consumption and receipts
+"""
+
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, Index, Boolean
+from sqlalchemy.sql import func
+import enum
+from database.connection import Base
+
+class MovementType(str, enum.Enum):
+    RESERVE = "reserve"    # held for a job, still on hand
+    RELEASE = "release"    # reservation returned without use
+    CONSUME = "consume"    # taken out of stock
+    RECEIVE = "receive"    # delivered into stock
+
+class StockMovement(Base):
+    __tablename__ = "stock_movements"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    spare_part_id = Column(Integer, ForeignKey("spare_parts.id"), nullable=False)
+    maintenance_log_id = Column(Integer, ForeignKey("maintenance_logs.id"), nullable=True, index=True)
+    
+    movement_type = Column(Enum(MovementType), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    from_reservation = Column(Boolean, default=False, nullable=False)  # consumption that used up a reservation
+    
+    # Balances on the part right after this movement
+    on_hand_after = Column(Integer, nullable=False)
+    reserved_after = Column(Integer, nullable=False)
+    
+    reference = Column(String(100), nullable=True)  # e.g. purchase order number
+    performed_by = Column(String(100), nullable=True)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index('idx_stock_movements_part_id', 'spare_part_id', 'id'),
+    )
+    
+    def __repr__(self):
+        return f"<StockMovement(part={self.spare_part_id}, {self.movement_type}={self.quantity})>"
@@ -3,7 +3,7 @@ Supplier Model
 Stores supplier information and performance metrics
 """
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, event, inspect, update
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from database.connection import Base
@@ -49,13 +49,18 @@ class Supplier(Base):
     def __repr__(self):
         return f"<Supplier(id={self.id}, name='{self.name}', reliability={self.reliability_score})>"
 
+# Columns that feed the supply chain risk score of every part they supply
+RISK_INPUT_COLUMNS = ("reliability_score", "average_lead_time_days", "on_time_delivery_rate")
 
-
-
-
-
-
-
-
-
-
+@event.listens_for(Supplier, "after_update")
+def _mark_supplied_parts_dirty(mapper, connection, target):
+    """Flag all parts of a supplier for risk recomputation when its performance changes"""
+    state = inspect(target)
+    if any(state.attrs[column].history.has_changes() for column in RISK_INPUT_COLUMNS):
+        from models.spare_part import SparePart
+        
+        connection.execute(
+            update(SparePart.__table__)
+            .where(SparePart.__table__.c.primary_supplier_id == target.id)
+            .values(risk_dirty=True)
+        )
@@ -3,7 +3,8 @@ Supply Chain Risk Model
 Tracks risk assessments for supply chain continuity
 """
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Enum
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Enum, Index, BigInteger
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import enum
@@ -20,7 +21,7 @@ class SupplyChainRisk(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     supplier_id = Column(Integer, ForeignKey("suppliers.id"), nullable=True, index=True)
-    spare_part_id = Column(Integer, ForeignKey("spare_parts.id"), nullable=True, index=True)
+    spare_part_id = Column(Integer, ForeignKey("spare_parts.id"), nullable=True)
     
     # Risk assessment
     risk_level = Column(Enum(RiskLevel), nullable=False, default=RiskLevel.LOW)
@@ -36,6 +37,7 @@ class SupplyChainRisk(Base):
     supplier_reliability = Column(Float, nullable=True)
     lead_time_variance = Column(Float, nullable=True)  # days of variance
     demand_forecast = Column(Float, nullable=True)
+    distribution = Column(JSONB, nullable=True)  # simulated delay, stockout date and horizon percentiles
     
     # Mitigation
     recommended_action = Column(Text, nullable=True)
@@ -43,12 +45,19 @@ class SupplyChainRisk(Base):
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.clock_timestamp(), onupdate=func.clock_timestamp())
+    change_seq = Column(BigInteger, nullable=True)  # writing transaction id, stamped by trigger for ?since= delta sync
     
     # Relationships
     supplier = relationship("Supplier")
     spare_part = relationship("SparePart")
     
+    # One assessment per part, target of the bulk ON CONFLICT upsert
+    __table_args__ = (
+        Index('uq_supply_chain_risk_spare_part_id', 'spare_part_id', unique=True),
+        Index('idx_supply_chain_risk_change_seq_id', 'change_seq', 'id'),
+    )
+    
     def __repr__(self):
         return f"<SupplyChainRisk(id={self.id}, risk_level='{self.risk_level}', score={self.risk_score})>"
 
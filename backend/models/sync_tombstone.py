@@ -0,0 +1,28 @@
+"""
+Sync Tombstone Model
+Keys of rows deleted from delta-synced tables, so ?since= polls can report deletes
+"""
+
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Index
+from sqlalchemy.sql import func
+from database.connection import Base
+
+class SyncTombstone(Base):
+    __tablename__ = "sync_tombstones"
+    
+    table_name = Column(String(50), primary_key=True)
+    row_key = Column(Integer, primary_key=True)  # the key clients see: row id, or spare_part_id for risks
+    
+    # Id of the deleting transaction, ordered with the rows' change_seq
+    change_seq = Column(BigInteger, nullable=False)
+    
+    # Timestamps
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    __table_args__ = (
+        Index('idx_sync_tombstones_table_seq', 'table_name', 'change_seq', 'row_key'),
+        Index('idx_sync_tombstones_deleted_at', 'deleted_at'),
+    )
+    
+    def __repr__(self):
+        return f"<SyncTombstone(table='{self.table_name}', key={self.row_key}, seq={self.change_seq})>"
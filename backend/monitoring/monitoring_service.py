@@ -16,7 +16,7 @@ class MonitoringService:
     """
     Industrial monitoring service that continuously:
     - Monitors machine health
-    - Runs fault predictions
+    - Tracks the event-driven fault prediction scheduler
     - Generates alerts
     - Updates health scores
     """
@@ -52,11 +52,14 @@ class MonitoringService:
             machines = machines_response.json()
             logger.info(f"Monitoring {len(machines)} machines")
             
-            # 2. Run fault predictions for all machines
-            predictions_response = await client.get(f"{self.api_base_url}/api/faults/predict/all")
-            if predictions_response.status_code == 200:
-                predictions = predictions_response.json()
-                logger.info(f"Completed fault predictions for {len(predictions.get('predictions', []))} machines")
+            # 2. Fault predictions are event-driven inside the API; report scheduler progress
+            scheduler_response = await client.get(f"{self.api_base_url}/api/faults/scheduler/stats")
+            if scheduler_response.status_code == 200:
+                scheduler_stats = scheduler_response.json()
+                logger.info(
+                    f"Re-prediction scheduler: {scheduler_stats.get('predictions_run', 0)} predictions run, "
+                    f"{scheduler_stats.get('queued', 0)} queued"
+                )
             
             # 3. Check for new alerts
             alerts_response = await client.get(f"{self.api_base_url}/api/alerts/active")
@@ -0,0 +1,188 @@
+"""
+Re-prediction Scheduler
+Event-driven fault prediction: machines are re-scored when new sensor data
+arrives instead of on a fixed fleet-wide interval
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Lower value = predicted first
+STATUS_PRIORITY = {
+    "critical": 0,
+    "warning": 1,
+}
+DEFAULT_PRIORITY = 2
+
+@dataclass
+class _MachineState:
+    new_readings: int = 0
+    first_pending_at: Optional[float] = None
+    last_enqueued_at: float = 0.0
+    last_predicted_at: Optional[float] = None
+    status: Optional[str] = None
+    scoring: Optional[int] = None  # new_readings when a queued prediction was dequeued
+
+class RepredictionScheduler:
+    """
+    In-process scheduler that follows the ingest path:
+    - counts new readings per machine
+    - queues a re-prediction once a machine has enough new readings,
+      or its oldest unscored reading is older than the staleness limit
+    - debounces repeated triggers for the same machine
+    - serves warning/critical machines before healthy ones
+    """
+
+    def __init__(
+        self,
+        reading_threshold: Optional[int] = None,
+        staleness_seconds: Optional[float] = None,
+        debounce_seconds: Optional[float] = None,
+        tick_seconds: float = 5.0
+    ):
+        self.reading_threshold = reading_threshold if reading_threshold is not None else int(os.getenv("REPREDICT_READING_THRESHOLD", "20"))
+        self.staleness_seconds = staleness_seconds if staleness_seconds is not None else float(os.getenv("REPREDICT_STALENESS_SECONDS", "300"))
+        self.debounce_seconds = debounce_seconds if debounce_seconds is not None else float(os.getenv("REPREDICT_DEBOUNCE_SECONDS", "10"))
+        self.tick_seconds = tick_seconds
+        if self.reading_threshold < 1:
+            raise ValueError(f"reading_threshold (REPREDICT_READING_THRESHOLD) must be at least 1, got {self.reading_threshold}")
+        if self.staleness_seconds < 0 or self.debounce_seconds < 0:
+            raise ValueError("staleness_seconds and debounce_seconds must not be negative")
+
+        self._states: Dict[str, _MachineState] = {}
+        self._queue: List[Tuple[int, float, int, str]] = []
+        self._queued: Set[str] = set()
+        self._sequence = itertools.count()
+        self._wakeup = asyncio.Event()
+        self.running = False
+
+        self.readings_seen = 0
+        self.predictions_run = 0
+        self.prediction_errors = 0
+
+    def record_reading(self, machine_id: str, status: Optional[str] = None):
+        """Called from the ingest path for every stored sensor reading"""
+        now = time.monotonic()
+        state = self._states.setdefault(machine_id, _MachineState())
+        state.new_readings += 1
+        if state.first_pending_at is None:
+            state.first_pending_at = now
+        if status:
+            state.status = status
+        self.readings_seen += 1
+
+        if self._try_enqueue(machine_id, state, now):
+            self._wakeup.set()
+
+    def mark_predicted(self, machine_id: str, status: Optional[str] = None):
+        """
+        Clear the readings a prediction scored (scheduled or on demand)
+        A scheduled prediction scored the readings pending when it was
+        dequeued; readings stored while it ran stay pending, so they trigger
+        the next re-prediction instead of being lost.
+        """
+        now = time.monotonic()
+        state = self._states.setdefault(machine_id, _MachineState())
+        scored = state.new_readings if state.scoring is None else state.scoring
+        state.scoring = None
+        state.new_readings = max(state.new_readings - scored, 0)
+        state.first_pending_at = now if state.new_readings else None
+        state.last_predicted_at = now
+        if status:
+            state.status = status
+
+        if self._try_enqueue(machine_id, state, now):
+            self._wakeup.set()
+
+    def _is_due(self, state: _MachineState, now: float) -> bool:
+        if state.new_readings <= 0:
+            return False
+        if state.new_readings >= self.reading_threshold:
+            return True
+        return now - state.first_pending_at >= self.staleness_seconds
+
+    def _try_enqueue(self, machine_id: str, state: _MachineState, now: float) -> bool:
+        if machine_id in self._queued or not self._is_due(state, now):
+            return False
+        if now - state.last_enqueued_at < self.debounce_seconds:
+            return False
+
+        priority = STATUS_PRIORITY.get(state.status, DEFAULT_PRIORITY)
+        heapq.heappush(self._queue, (priority, now, next(self._sequence), machine_id))
+        self._queued.add(machine_id)
+        state.last_enqueued_at = now
+        return True
+
+    def _sweep_stale(self, now: float):
+        """Queue machines whose pending readings crossed the staleness limit"""
+        for machine_id, state in self._states.items():
+            self._try_enqueue(machine_id, state, now)
+
+    async def run(self, predict: Callable[[str], Awaitable[Optional[str]]]):
+        """
+        Worker loop
+        `predict` re-scores one machine, commits and calls mark_predicted()
+        """
+        self.running = True
+        logger.info(
+            f"Starting re-prediction scheduler (threshold: {self.reading_threshold} readings, "
+            f"staleness: {self.staleness_seconds}s)"
+        )
+
+        while self.running:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.tick_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            self._sweep_stale(time.monotonic())
+
+            while self._queue and self.running:
+                _, _, _, machine_id = heapq.heappop(self._queue)
+                self._queued.discard(machine_id)
+                state = self._states[machine_id]
+                state.scoring = state.new_readings
+
+                # predict() calls mark_predicted() once its results are committed
+                try:
+                    await predict(machine_id)
+                    self.predictions_run += 1
+                except Exception as e:
+                    self.prediction_errors += 1
+                    logger.error(f"Re-prediction failed for {machine_id}: {e}", exc_info=True)
+                finally:
+                    # Not marked (failed, or nothing to score): the readings stay pending
+                    state.scoring = None
+
+    def stop(self):
+        """Stop the worker loop"""
+        self.running = False
+        self._wakeup.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Scheduler counters for monitoring"""
+        return {
+            "running": self.running,
+            "reading_threshold": self.reading_threshold,
+            "staleness_seconds": self.staleness_seconds,
+            "debounce_seconds": self.debounce_seconds,
+            "tracked_machines": len(self._states),
+            "queued": len(self._queue),
+            "pending_readings": sum(s.new_readings for s in self._states.values()),
+            "readings_seen": self.readings_seen,
+            "predictions_run": self.predictions_run,
+            "prediction_errors": self.prediction_errors
+        }
+
+
+# Fed by the sensor ingest route, started in the application lifespan
+reprediction_scheduler = RepredictionScheduler()
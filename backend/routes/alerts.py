@@ -3,21 +3,32 @@ Alerts Routes
 Handles alerts and warnings management
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
-from typing import Optional
+from sqlalchemy import select, update, desc, func
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from database.connection import get_db
-from models.alert import Alert, AlertStatus, AlertSeverity
+from database.events import mark_changed
+from models.alert import Alert, AlertStatus, AlertSeverity, AlertType
+from models.alert_incident import AlertIncident, IncidentStatus
+from services.alert_engine import alert_engine
+from services.alert_incidents import incident_grouper
+from services.alert_counters import alert_counters
+from services.alert_retention import alert_retention
+from services.resource_versions import conditional_get
+from services.event_hub import event_hub, ALERTS, ALERT_EVENTS, alert_bulk_status_events
+from services.delta_sync import delta_sync, delta_response, MAX_PAGE_SIZE
 
 router = APIRouter()
 
 class AlertResponse(BaseModel):
     id: int
     machine_id: Optional[int]
+    incident_id: Optional[int] = None
     alert_type: str
     severity: str
     status: str
@@ -26,21 +37,107 @@ class AlertResponse(BaseModel):
     fault_probability: Optional[float]
     predicted_failure_window: Optional[str]
     created_at: datetime
+    updated_at: Optional[datetime] = None
     
     class Config:
         from_attributes = True
 
-@router.get("/")
+class IncidentResponse(BaseModel):
+    id: int
+    location: str
+    alert_type: str
+    severity: str
+    status: str
+    alert_count: int
+    open_alert_count: int
+    machine_count: int
+    repeat_count: int
+    first_alert_at: datetime
+    last_alert_at: datetime
+    resolved_at: Optional[datetime]
+    
+    class Config:
+        from_attributes = True
+
+class BulkAlertAction(BaseModel):
+    """Alerts to change: explicit ids and/or filters, all of which must match"""
+    alert_ids: Optional[List[int]] = None
+    machine_id: Optional[int] = None
+    alert_type: Optional[str] = None
+    incident_id: Optional[int] = None
+    older_than_minutes: Optional[float] = None
+    acknowledged_by: Optional[str] = None
+
+def _bulk_conditions(action: BulkAlertAction) -> list:
+    """WHERE clauses for a bulk action; refuses an action that selects every alert"""
+    conditions = []
+    if action.alert_ids is not None:
+        conditions.append(Alert.id.in_(action.alert_ids))
+    if action.machine_id is not None:
+        conditions.append(Alert.machine_id == action.machine_id)
+    if action.alert_type:
+        try:
+            conditions.append(Alert.alert_type == AlertType(action.alert_type))
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid alert type: {action.alert_type}")
+    if action.incident_id is not None:
+        conditions.append(Alert.incident_id == action.incident_id)
+    if action.older_than_minutes is not None:
+        conditions.append(Alert.created_at < func.now() - timedelta(minutes=action.older_than_minutes))
+    
+    if not conditions:
+        raise HTTPException(status_code=400, detail="Select alerts with alert_ids or at least one filter")
+    return conditions
+
+async def _bulk_transition(
+    db: AsyncSession,
+    conditions: list,
+    from_statuses: List[AlertStatus],
+    values: Dict[str, Any]
+) -> list:
+    """
+    Move every matching alert in one of from_statuses with a single
+    UPDATE ... FROM (SELECT ... FOR UPDATE) ... RETURNING, which also reports
+    each alert's previous status for the live event stream (caller commits)
+    """
+    current = (
+        select(Alert.id, Alert.status)
+        .where(*conditions, Alert.status.in_(from_statuses))
+        .with_for_update()
+        .subquery()
+    )
+    result = await db.execute(
+        update(Alert)
+        .where(Alert.id == current.c.id)
+        .values(**values)
+        .returning(
+            Alert.id, Alert.machine_id, Alert.incident_id, Alert.alert_type,
+            Alert.severity, Alert.status, current.c.status.label("previous_status")
+        )
+        .execution_options(synchronize_session=False)
+    )
+    rows = result.all()
+    
+    if rows:
+        mark_changed(db, "alerts", rows)
+        mark_changed(db, ALERT_EVENTS, alert_bulk_status_events(rows))
+    return rows
+
+@router.get("/", dependencies=[Depends(conditional_get("alerts", skip_query="since"))])
 async def get_alerts(
     status: Optional[str] = None,
     severity: Optional[str] = None,
-    limit: int = 100,
+    since: Optional[str] = Query(None, description="Sync cursor; 0 starts from the beginning"),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Get all alerts with optional filtering
+    With since, returns alerts created, changed or deleted (e.g. purged by
+    retention) after the cursor instead of the newest ones. Filters still apply, so an alert that changes out of
+    a status filter is not reported; mirror all alerts by syncing unfiltered.
     """
-    query = select(Alert).order_by(desc(Alert.created_at)).limit(limit)
+    query = select(Alert)
     
     if status:
         try:
@@ -56,28 +153,211 @@ async def get_alerts(
         except ValueError:
             raise HTTPException(status_code=400, detail=f"Invalid severity: {severity}")
     
-    result = await db.execute(query)
+    if since is not None:
+        rows, deleted, cursor, has_more = await delta_sync.fetch(db, query, Alert, since, limit)
+        return delta_response([AlertResponse.model_validate(a) for a, in rows], deleted, cursor, has_more)
+    
+    result = await db.execute(query.order_by(desc(Alert.created_at)).limit(limit))
     alerts = result.scalars().all()
     
     return [AlertResponse.model_validate(a) for a in alerts]
 
-@router.get("/active")
+@router.get("/active", dependencies=[Depends(conditional_get("alerts"))])
 async def get_active_alerts(
+    limit: int = Query(100, ge=1, le=1000),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get all active (unresolved) alerts"""
+    """
+    Newest active (unresolved) alerts
+    count is the total number active; use /incidents for a grouped view
+    """
     result = await db.execute(
         select(Alert)
         .where(Alert.status == AlertStatus.ACTIVE)
         .order_by(desc(Alert.created_at))
+        .limit(limit)
     )
     alerts = result.scalars().all()
     
+    await alert_counters.ensure_built(db)
+    
     return {
-        "count": len(alerts),
+        "count": alert_counters.active_total(),
         "alerts": [AlertResponse.model_validate(a) for a in alerts]
     }
 
+@router.get("/summary", dependencies=[Depends(conditional_get("alerts"))])
+async def get_alert_summary(
+    db: AsyncSession = Depends(get_db)
+):
+    """Open alert counts by severity and type, served from in-memory counters"""
+    await alert_counters.ensure_built(db)
+    
+    return alert_counters.summary()
+
+@router.get("/history/daily", dependencies=[Depends(conditional_get("alerts"))])
+async def get_alert_history(
+    days: int = Query(30, ge=1, le=3650),
+    machine_id: Optional[int] = None,
+    alert_type: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Alerts raised per day, type and severity, including compacted history"""
+    type_enum = None
+    if alert_type:
+        try:
+            type_enum = AlertType(alert_type)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid alert type: {alert_type}")
+    
+    return {
+        "days": days,
+        "counts": await alert_retention.daily_counts(db, days, machine_id, type_enum)
+    }
+
+@router.get("/retention")
+async def get_retention_stats():
+    """Retention settings and compaction counters"""
+    return alert_retention.stats()
+
+@router.post("/retention/run")
+async def run_retention(
+    max_batches: Optional[int] = Query(None, ge=1)
+):
+    """Compact resolved and dismissed alerts past the retention age now"""
+    return await alert_retention.compact(max_batches)
+
+@router.get("/incidents", dependencies=[Depends(conditional_get("alerts"))])
+async def get_incidents(
+    status: Optional[str] = "open",
+    alert_type: Optional[str] = None,
+    location: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Alert incidents, most recently active first
+    Each incident stands for every alert of one type at one location raised
+    within the grouping window, however many machines alerted.
+    """
+    query = select(AlertIncident).order_by(desc(AlertIncident.last_alert_at)).limit(limit)
+    
+    if status:
+        try:
+            query = query.where(AlertIncident.status == IncidentStatus(status))
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid status: {status}")
+    
+    if alert_type:
+        try:
+            query = query.where(AlertIncident.alert_type == AlertType(alert_type))
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid alert type: {alert_type}")
+    
+    if location:
+        query = query.where(AlertIncident.location == location)
+    
+    result = await db.execute(query)
+    incidents = result.scalars().all()
+    
+    return {
+        "count": len(incidents),
+        "incidents": [IncidentResponse.model_validate(i) for i in incidents]
+    }
+
+@router.get("/incidents/{incident_id}", dependencies=[Depends(conditional_get("alerts"))])
+async def get_incident(
+    incident_id: int,
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db)
+):
+    """An incident with its newest member alerts"""
+    incident = await db.get(AlertIncident, incident_id)
+    
+    if not incident:
+        raise HTTPException(status_code=404, detail=f"Incident {incident_id} not found")
+    
+    result = await db.execute(
+        select(Alert)
+        .where(Alert.incident_id == incident_id)
+        .order_by(desc(Alert.created_at))
+        .limit(limit)
+    )
+    
+    return {
+        "incident": IncidentResponse.model_validate(incident),
+        "alerts": [AlertResponse.model_validate(a) for a in result.scalars().all()]
+    }
+
+@router.get("/engine/stats")
+async def get_alert_engine_stats():
+    """Alert engine evaluation and write counters"""
+    return {**alert_engine.stats(), "counter_rebuilds": alert_counters.rebuilds}
+
+@router.get("/stream")
+async def stream_alerts(
+    request: Request,
+    severity: Optional[List[str]] = Query(None),
+    alert_type: Optional[List[str]] = Query(None),
+    machine_id: Optional[List[int]] = Query(None)
+):
+    """
+    Server-Sent Events: alert_created, alert_status and alert_status_bulk events as they commit
+    Optional filters narrow the stream; slow clients are disconnected
+    """
+    subscriber = event_hub.subscribe(ALERTS, {
+        "severity": severity,
+        "alert_type": alert_type,
+        "machine_id": machine_id
+    })
+    
+    return StreamingResponse(
+        event_hub.stream(subscriber, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/stream/stats")
+async def get_stream_stats():
+    """Connected stream clients and published event counters"""
+    return event_hub.stats()
+
+@router.post("/bulk/acknowledge")
+async def bulk_acknowledge_alerts(
+    action: BulkAlertAction,
+    db: AsyncSession = Depends(get_db)
+):
+    """Acknowledge every active alert matching the ids and filters in one statement"""
+    if not action.acknowledged_by:
+        raise HTTPException(status_code=400, detail="acknowledged_by is required")
+    
+    rows = await _bulk_transition(db, _bulk_conditions(action), [AlertStatus.ACTIVE], {
+        "status": AlertStatus.ACKNOWLEDGED,
+        "acknowledged_by": action.acknowledged_by,
+        "acknowledged_at": func.now()
+    })
+    await db.commit()
+    
+    return {"updated": len(rows), "alert_ids": [row.id for row in rows]}
+
+@router.post("/bulk/resolve")
+async def bulk_resolve_alerts(
+    action: BulkAlertAction,
+    db: AsyncSession = Depends(get_db)
+):
+    """Resolve every active or acknowledged alert matching the ids and filters in one statement"""
+    rows = await _bulk_transition(db, _bulk_conditions(action), [AlertStatus.ACTIVE, AlertStatus.ACKNOWLEDGED], {
+        "status": AlertStatus.RESOLVED,
+        "resolved_at": func.now()
+    })
+    await incident_grouper.refresh_open_counts(db, {row.incident_id for row in rows})
+    await db.commit()
+    
+    for row in rows:
+        alert_engine.release(row.machine_id, row.alert_type)
+    
+    return {"updated": len(rows), "alert_ids": [row.id for row in rows]}
+
 @router.post("/{alert_id}/acknowledge")
 async def acknowledge_alert(
     alert_id: int,
@@ -118,7 +398,10 @@ async def resolve_alert(
     alert.status = AlertStatus.RESOLVED
     alert.resolved_at = datetime.utcnow()
     
+    await db.flush()
+    await incident_grouper.refresh_open_counts(db, [alert.incident_id])
     await db.commit()
+    alert_engine.release(alert.machine_id, alert.alert_type)
     
     return {"message": "Alert resolved", "alert_id": alert_id}
 
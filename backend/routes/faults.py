@@ -9,10 +9,13 @@ from sqlalchemy import select, desc
 from typing import Optional
 from pydantic import BaseModel
 
-from database.connection import get_db
+from database.connection import get_db, AsyncSessionLocal
 from models.machine import Machine, MachineStatus
 from models.sensor_data import SensorData
 from services.fault_prediction import FaultPredictionService
+from services.prediction_cache import prediction_cache
+from monitoring.reprediction_scheduler import reprediction_scheduler
+from services.alert_engine import alert_engine
 
 router = APIRouter()
 
@@ -27,23 +30,35 @@ class FaultPredictionResponse(BaseModel):
     risk_factors: list
     recommendations: list
 
-@router.get("/predict/{machine_id}")
-async def predict_fault(
-    machine_id: str,
-    db: AsyncSession = Depends(get_db)
-):
-    """
-    Get ML-based fault prediction for a machine
-    Uses LSTM/GRU, Isolation Forest, and Autoencoder models
-    """
-    # Get machine
+async def _latest_reading_watermark(machine: Machine, db: AsyncSession) -> Optional[int]:
+    """Id of the newest sensor reading for a machine (served by idx_machine_timestamp)"""
     result = await db.execute(
-        select(Machine).where(Machine.machine_id == machine_id)
+        select(SensorData.id)
+        .where(SensorData.machine_id == machine.id)
+        .order_by(desc(SensorData.timestamp))
+        .limit(1)
     )
-    machine = result.scalar_one_or_none()
+    return result.scalar_one_or_none()
+
+async def _predict_machine(
+    machine: Machine,
+    db: AsyncSession,
+    prediction_service: FaultPredictionService
+) -> Optional[FaultPredictionResponse]:
+    """
+    Run (or reuse) the fault prediction for one machine
+    Returns None when the machine has too little sensor data
+    """
+    model_version = FaultPredictionService.MODEL_VERSION
+    watermark = await _latest_reading_watermark(machine, db)
+    if watermark is None:
+        return None
     
-    if not machine:
-        raise HTTPException(status_code=404, detail=f"Machine {machine_id} not found")
+    # Unchanged window: nothing new to score
+    cached = prediction_cache.get(machine.machine_id, model_version, watermark)
+    if cached is not None:
+        reprediction_scheduler.mark_predicted(machine.machine_id, cached.status)
+        return cached
     
     # Get recent sensor data (last 100 readings for ML model)
     result = await db.execute(
@@ -55,13 +70,7 @@ async def predict_fault(
     sensor_readings = result.scalars().all()
     
     if len(sensor_readings) < 10:
-        raise HTTPException(
-            status_code=400,
-            detail="Insufficient sensor data for prediction. Need at least 10 readings."
-        )
-    
-    # Initialize prediction service
-    prediction_service = FaultPredictionService()
+        return None
     
     # Prepare data for ML models
     sensor_data_list = [
@@ -77,7 +86,7 @@ async def predict_fault(
     
     # Run predictions
     prediction_result = await prediction_service.predict(
-        machine_id=machine_id,
+        machine_id=machine.machine_id,
         sensor_data=sensor_data_list,
         machine=machine
     )
@@ -98,9 +107,10 @@ async def predict_fault(
         machine.status = MachineStatus.OPERATIONAL
     
     await db.commit()
+    reprediction_scheduler.mark_predicted(machine.machine_id, machine.status.value)
     
-    return FaultPredictionResponse(
-        machine_id=machine_id,
+    response = FaultPredictionResponse(
+        machine_id=machine.machine_id,
         fault_probability=prediction_result["fault_probability"],
         anomaly_score=prediction_result["anomaly_score"],
         predicted_failure_window=prediction_result.get("predicted_failure_window"),
@@ -110,6 +120,34 @@ async def predict_fault(
         risk_factors=prediction_result.get("risk_factors", []),
         recommendations=prediction_result.get("recommendations", [])
     )
+    
+    prediction_cache.put(machine.machine_id, model_version, watermark, response)
+    alert_engine.evaluate_prediction(machine, response)
+    
+    return response
+
+async def repredict_machine(machine_id: str) -> Optional[str]:
+    """Scheduler callback: re-score one machine in its own session"""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Machine).where(Machine.machine_id == machine_id)
+        )
+        machine = result.scalar_one_or_none()
+        if not machine:
+            return None
+        
+        prediction = await _predict_machine(machine, db, FaultPredictionService())
+        return prediction.status if prediction else machine.status.value
+
+@router.get("/scheduler/stats")
+async def get_scheduler_stats():
+    """Event-driven re-prediction scheduler counters"""
+    return reprediction_scheduler.stats()
+
+@router.get("/cache/stats")
+async def get_prediction_cache_stats():
+    """Prediction cache size and hit rate"""
+    return prediction_cache.stats()
 
 @router.get("/predict/all")
 async def predict_all_faults(
@@ -123,43 +161,48 @@ async def predict_all_faults(
     prediction_service = FaultPredictionService()
     
     for machine in machines:
-        # Get recent sensor data
-        result = await db.execute(
-            select(SensorData)
-            .where(SensorData.machine_id == machine.id)
-            .order_by(desc(SensorData.timestamp))
-            .limit(100)
-        )
-        sensor_readings = result.scalars().all()
+        prediction = await _predict_machine(machine, db, prediction_service)
         
-        if len(sensor_readings) < 10:
+        if prediction is None:
             continue
         
-        sensor_data_list = [
-            {
-                "vibration": sd.vibration,
-                "temperature": sd.temperature,
-                "acoustic_noise": sd.acoustic_noise,
-                "load": sd.load,
-                "rpm": sd.rpm
-            }
-            for sd in reversed(sensor_readings)
-        ]
-        
-        prediction_result = await prediction_service.predict(
-            machine_id=machine.machine_id,
-            sensor_data=sensor_data_list,
-            machine=machine
-        )
-        
         predictions.append({
             "machine_id": machine.machine_id,
             "name": machine.name,
-            "fault_probability": prediction_result["fault_probability"],
-            "anomaly_score": prediction_result["anomaly_score"],
-            "health_score": prediction_result["health_score"],
-            "alert_level": prediction_result["alert_level"]
+            "fault_probability": prediction.fault_probability,
+            "anomaly_score": prediction.anomaly_score,
+            "health_score": prediction.health_score,
+            "alert_level": prediction.alert_level
         })
     
-    return {"predictions": predictions}
+    return {"predictions": predictions, "cache": prediction_cache.stats()}
+
+@router.get("/predict/{machine_id}")
+async def predict_fault(
+    machine_id: str,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get ML-based fault prediction for a machine
+    Uses LSTM/GRU, Isolation Forest, and Autoencoder models
+    Served from the prediction cache while no new reading has arrived
+    """
+    # Get machine
+    result = await db.execute(
+        select(Machine).where(Machine.machine_id == machine_id)
+    )
+    machine = result.scalar_one_or_none()
+    
+    if not machine:
+        raise HTTPException(status_code=404, detail=f"Machine {machine_id} not found")
+    
+    prediction = await _predict_machine(machine, db, FaultPredictionService())
+    
+    if prediction is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Insufficient sensor data for prediction. Need at least 10 readings."
+        )
+    
+    return prediction
 
@@ -3,14 +3,19 @@ Inventory Routes
 Handles spare parts inventory management
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import Optional
-from pydantic import BaseModel
+from sqlalchemy import select, or_
+from typing import List, Optional
+from datetime import datetime
+from pydantic import BaseModel, Field
 
 from database.connection import get_db
-from models.spare_part import SparePart, PartStatus
+from models.spare_part import SparePart
+from models.machine import Machine
+from models.maintenance_log import MaintenanceLog
+from services.inventory_service import inventory_service
+from services.stock_ledger import stock_ledger, InsufficientStockError
 
 router = APIRouter()
 
@@ -21,6 +26,7 @@ class InventoryResponse(BaseModel):
     current_quantity: int
     min_quantity: int
     max_quantity: int
+    reserved_quantity: int
     status: str
     unit_cost: float
     total_value: float
@@ -28,43 +34,114 @@ class InventoryResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class StockMovementRequest(BaseModel):
+    quantity: int = Field(gt=0)
+    maintenance_log_id: Optional[int] = None
+    reference: Optional[str] = None
+    performed_by: Optional[str] = None
+
+class StockConsumeRequest(StockMovementRequest):
+    from_reservation: bool = False
+
+class StockMovementResponse(BaseModel):
+    id: int
+    spare_part_id: int
+    maintenance_log_id: Optional[int]
+    movement_type: str
+    quantity: int
+    on_hand_after: int
+    reserved_after: int
+    reference: Optional[str]
+    performed_by: Optional[str]
+    created_at: Optional[datetime]
+    
+    class Config:
+        from_attributes = True
+
+async def _record_movement(operation, part_id: int, request: StockMovementRequest, db: AsyncSession, **options):
+    """Run a ledger operation, commit it and map ledger errors to HTTP errors"""
+    # Checked up front: a dangling id would only fail at the ledger insert's foreign key
+    if request.maintenance_log_id is not None:
+        log_exists = await db.scalar(select(MaintenanceLog.id).where(MaintenanceLog.id == request.maintenance_log_id))
+        if log_exists is None:
+            raise HTTPException(status_code=404, detail=f"Maintenance log {request.maintenance_log_id} not found")
+    
+    try:
+        movement = await operation(
+            part_id, request.quantity, db,
+            maintenance_log_id=request.maintenance_log_id,
+            reference=request.reference,
+            performed_by=request.performed_by,
+            **options
+        )
+    except InsufficientStockError as e:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    if movement is None:
+        raise HTTPException(status_code=404, detail=f"Spare part {part_id} not found")
+    
+    await db.commit()
+    
+    return StockMovementResponse.model_validate(movement)
+
 @router.get("/check")
 async def check_inventory(
     low_stock_only: bool = False,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Check inventory status - implements SOP-SC-04: Spare Parts Inventory Check
+    Read-only: totals come from SQL aggregates and parts are returned in pages
     """
-    query = select(SparePart)
-    if low_stock_only:
-        query = query.where(SparePart.current_quantity <= SparePart.min_quantity)
+    inventory_summary = await inventory_service.summary(db, low_stock_only=low_stock_only)
+    parts = await inventory_service.list_parts(db, low_stock_only=low_stock_only, offset=offset, limit=limit)
     
-    result = await db.execute(query)
-    parts = result.scalars().all()
-    
-    # Update status for each part
-    for part in parts:
-        if part.current_quantity <= 0:
-            part.status = PartStatus.OUT_OF_STOCK
-        elif part.current_quantity <= part.min_quantity:
-            part.status = PartStatus.LOW_STOCK
-        else:
-            part.status = PartStatus.IN_STOCK
-        
-        part.total_value = part.current_quantity * part.unit_cost
+    inventory_summary.update({
+        "offset": offset,
+        "limit": limit,
+        "parts": [InventoryResponse.model_validate(p) for p in parts]
+    })
     
+    return inventory_summary
+
+@router.post("/refresh-status")
+async def refresh_inventory_status(
+    db: AsyncSession = Depends(get_db)
+):
+    """Reconcile stale part status and total value in one set-based update"""
+    updated = await inventory_service.refresh_stock_fields(db)
     await db.commit()
     
-    inventory_summary = {
-        "total_parts": len(parts),
-        "low_stock_count": sum(1 for p in parts if p.current_quantity <= p.min_quantity),
-        "out_of_stock_count": sum(1 for p in parts if p.current_quantity == 0),
-        "total_inventory_value": sum(p.total_value for p in parts),
-        "parts": [InventoryResponse.model_validate(p) for p in parts]
-    }
+    return {"updated_parts": updated}
+
+@router.get("/by-machine/{machine_id}")
+async def get_parts_for_machine(
+    machine_id: str,
+    db: AsyncSession = Depends(get_db)
+):
+    """Spare parts compatible with a machine (GIN containment lookup on compatible_machines)"""
+    result = await db.execute(
+        select(Machine.id).where(Machine.machine_id == machine_id)
+    )
+    machine_pk = result.scalar_one_or_none()
     
-    return inventory_summary
+    if machine_pk is None:
+        raise HTTPException(status_code=404, detail=f"Machine {machine_id} not found")
+    
+    result = await db.execute(
+        select(SparePart)
+        .where(or_(
+            SparePart.compatible_machines.contains([machine_id]),
+            SparePart.compatible_machines.contains([machine_pk])
+        ))
+        .order_by(SparePart.id)
+    )
+    parts = result.scalars().all()
+    
+    return [InventoryResponse.model_validate(p) for p in parts]
 
 @router.get("/{part_id}")
 async def get_part_details(
@@ -82,13 +159,53 @@ async def get_part_details(
     
     return InventoryResponse.model_validate(part)
 
+@router.post("/{part_id}/reserve")
+async def reserve_stock(
+    part_id: int,
+    request: StockMovementRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Reserve stock for a job; 409 if not enough unreserved stock is left"""
+    return await _record_movement(stock_ledger.reserve, part_id, request, db)
 
+@router.post("/{part_id}/release")
+async def release_stock(
+    part_id: int,
+    request: StockMovementRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Return reserved stock without using it"""
+    return await _record_movement(stock_ledger.release, part_id, request, db)
 
+@router.post("/{part_id}/consume")
+async def consume_stock(
+    part_id: int,
+    request: StockConsumeRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Take stock out, from a prior reservation or from unreserved stock"""
+    return await _record_movement(
+        stock_ledger.consume, part_id, request, db,
+        from_reservation=request.from_reservation
+    )
 
+@router.post("/{part_id}/receive")
+async def receive_stock(
+    part_id: int,
+    request: StockMovementRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Book a delivery into stock"""
+    return await _record_movement(stock_ledger.receive, part_id, request, db)
 
-
-
-
-
-
-
+@router.get("/{part_id}/movements")
+async def get_stock_movements(
+    part_id: int,
+    before_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db)
+):
+    """Stock ledger for a part, newest first; page with before_id"""
+    movements = await stock_ledger.movements(part_id, db, before_id=before_id, limit=limit)
+    
+    return [StockMovementResponse.model_validate(m) for m in movements]
@@ -3,9 +3,11 @@ Machine Routes
 Handles machine information, status, and health metrics
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, desc
+from sqlalchemy import select, func, desc, true
+from sqlalchemy.orm import aliased
 from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel
@@ -13,6 +15,10 @@ from pydantic import BaseModel
 from database.connection import get_db
 from models.machine import Machine, MachineStatus
 from models.sensor_data import SensorData
+from services.plant_rollups import plant_rollups
+from services.event_hub import event_hub, MACHINES
+from services.resource_versions import conditional_get
+from services.delta_sync import delta_sync, delta_response, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
 router = APIRouter()
 
@@ -46,12 +52,29 @@ class MachineCreate(BaseModel):
     department: Optional[str] = None
     downtime_cost_per_hour: float = 1000.0
 
-@router.get("/")
+def _sensor_payload(sensor: SensorData) -> dict:
+    """Latest reading fields included in machine status responses"""
+    return {
+        "vibration": sensor.vibration,
+        "temperature": sensor.temperature,
+        "acoustic_noise": sensor.acoustic_noise,
+        "load": sensor.load,
+        "rpm": sensor.rpm,
+        "timestamp": sensor.timestamp
+    }
+
+@router.get("/", dependencies=[Depends(conditional_get("machines", skip_query="since"))])
 async def get_all_machines(
     status: Optional[str] = None,
+    since: Optional[str] = Query(None, description="Sync cursor; 0 starts from the beginning"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size with since"),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get all machines with optional status filter"""
+    """
+    Get all machines with optional status filter
+    With since, only machines created, changed or deleted after the cursor
+    are returned, with the cursor for the next poll
+    """
     query = select(Machine)
     if status:
         try:
@@ -60,12 +83,57 @@ async def get_all_machines(
         except ValueError:
             raise HTTPException(status_code=400, detail=f"Invalid status: {status}")
     
+    if since is not None:
+        rows, deleted, cursor, has_more = await delta_sync.fetch(db, query, Machine, since, limit)
+        return delta_response([MachineResponse.model_validate(m) for m, in rows], deleted, cursor, has_more)
+    
     result = await db.execute(query)
     machines = result.scalars().all()
     
     return [MachineResponse.model_validate(m) for m in machines]
 
-@router.get("/{machine_id}")
+@router.get("/rollups", dependencies=[Depends(conditional_get("machines"))])
+async def get_plant_rollup(
+    db: AsyncSession = Depends(get_db)
+):
+    """Plant-wide health, fault risk and downtime exposure, broken down by department"""
+    await plant_rollups.ensure_built(db)
+    
+    return plant_rollups.subtree()
+
+@router.get("/rollups/{department}", dependencies=[Depends(conditional_get("machines"))])
+async def get_department_rollup(
+    department: str,
+    db: AsyncSession = Depends(get_db)
+):
+    """Department aggregates, broken down by location"""
+    await plant_rollups.ensure_built(db)
+    rollup = plant_rollups.subtree(department)
+    
+    if rollup is None:
+        raise HTTPException(status_code=404, detail=f"Department {department} not found")
+    
+    return rollup
+
+@router.get("/rollups/{department}/{location}", dependencies=[Depends(conditional_get("machines"))])
+async def get_location_rollup(
+    department: str,
+    location: str,
+    db: AsyncSession = Depends(get_db)
+):
+    """Location aggregates with its machines, highest downtime exposure first"""
+    await plant_rollups.ensure_built(db)
+    rollup = plant_rollups.subtree(department, location)
+    
+    if rollup is None:
+        raise HTTPException(status_code=404, detail=f"Location {location} not found in department {department}")
+    
+    return rollup
+
+@router.get(
+    "/{machine_id}",
+    dependencies=[Depends(conditional_get("machines", "sensor_data:key", key_param="machine_id"))]
+)
 async def get_machine_status(
     machine_id: str,
     db: AsyncSession = Depends(get_db)
@@ -92,14 +160,7 @@ async def get_machine_status(
     response_dict = response.model_dump()
     
     if latest_sensor:
-        response_dict["latest_sensor_data"] = {
-            "vibration": latest_sensor.vibration,
-            "temperature": latest_sensor.temperature,
-            "acoustic_noise": latest_sensor.acoustic_noise,
-            "load": latest_sensor.load,
-            "rpm": latest_sensor.rpm,
-            "timestamp": latest_sensor.timestamp
-        }
+        response_dict["latest_sensor_data"] = _sensor_payload(latest_sensor)
     
     return response_dict
 
@@ -138,40 +199,79 @@ async def create_machine(
     
     return MachineResponse.model_validate(new_machine)
 
-@router.get("/status/all")
+@router.get("/status/all", dependencies=[Depends(conditional_get("machines"))])
 async def get_all_machines_status(
     db: AsyncSession = Depends(get_db)
 ):
-    """Get health status overview for all machines"""
-    result = await db.execute(select(Machine))
-    machines = result.scalars().all()
+    """
+    Get health status overview for all machines
+    Served from the plant rollup root; the database is only read to build it
+    """
+    await plant_rollups.ensure_built(db)
     
-    status_summary = {
-        "total_machines": len(machines),
-        "operational": 0,
-        "warning": 0,
-        "critical": 0,
-        "maintenance": 0,
-        "offline": 0,
-        "average_health_score": 0.0,
-        "machines": []
-    }
+    return plant_rollups.fleet_summary()
+
+@router.get("/status/latest")
+async def get_machines_latest_readings(
+    machine_ids: Optional[List[str]] = Query(None),
+    status: Optional[str] = None,
+    location: Optional[str] = None,
+    department: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=2000),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Machines with their latest sensor reading in one round trip
+    One LATERAL subquery per machine row, answered from idx_machine_timestamp
+    """
+    latest = (
+        select(SensorData)
+        .where(SensorData.machine_id == Machine.id)
+        .order_by(desc(SensorData.timestamp))
+        .limit(1)
+        .lateral("latest_reading")
+    )
+    latest_reading = aliased(SensorData, latest)
     
-    total_health = 0.0
-    for machine in machines:
-        status_key = machine.status.value
-        status_summary[status_key] = status_summary.get(status_key, 0) + 1
-        total_health += machine.health_score
-        status_summary["machines"].append({
-            "machine_id": machine.machine_id,
-            "name": machine.name,
-            "status": machine.status.value,
-            "health_score": machine.health_score,
-            "fault_probability": machine.fault_probability
-        })
-    
-    if machines:
-        status_summary["average_health_score"] = total_health / len(machines)
-    
-    return status_summary
+    query = (
+        select(Machine, latest_reading)
+        .outerjoin(latest_reading, true())
+        .order_by(Machine.id)
+        .limit(limit)
+    )
+    if machine_ids:
+        query = query.where(Machine.machine_id.in_(machine_ids))
+    if status:
+        try:
+            query = query.where(Machine.status == MachineStatus(status))
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid status: {status}")
+    if location:
+        query = query.where(Machine.location == location)
+    if department:
+        query = query.where(Machine.department == department)
+    
+    result = await db.execute(query)
+    
+    machines = []
+    for machine, sensor in result.all():
+        machine_dict = MachineResponse.model_validate(machine).model_dump()
+        machine_dict["latest_sensor_data"] = _sensor_payload(sensor) if sensor else None
+        machines.append(machine_dict)
+    
+    return {"count": len(machines), "machines": machines}
 
+@router.get("/status/stream")
+async def stream_machine_status(
+    request: Request,
+    machine_ids: Optional[List[str]] = Query(None),
+    status: Optional[List[str]] = Query(None)
+):
+    """Server-Sent Events: machine_status events on committed status transitions"""
+    subscriber = event_hub.subscribe(MACHINES, {"machine_id": machine_ids, "status": status})
+    
+    return StreamingResponse(
+        event_hub.stream(subscriber, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -3,16 +3,22 @@ Maintenance Routes
 Handles maintenance scheduling and logs
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
-from typing import Optional
-from pydantic import BaseModel
-from datetime import datetime
+from sqlalchemy import select, desc, or_
+from typing import List, Optional
+from pydantic import BaseModel, Field
+from datetime import datetime, timedelta
 
 from database.connection import get_db
 from models.maintenance_log import MaintenanceLog, MaintenanceType, MaintenanceStatus
-from models.machine import Machine
+from models.machine import Machine, MachineType
+from models.spare_part import SparePart
+from services.consumption_index import consumption_index
+from services.stock_ledger import stock_ledger, InsufficientStockError
+from services.maintenance_optimizer import maintenance_optimizer, PlanSettings
+from services.booking_index import booking_index, DEFAULT_JOB_HOURS
+from services.reliability_kpis import reliability_kpis
 
 router = APIRouter()
 
@@ -39,6 +45,35 @@ class MaintenanceScheduleRequest(BaseModel):
     scheduled_date: datetime
     technician: Optional[str] = None
     sop_reference: Optional[str] = None
+    duration_hours: Optional[float] = Field(None, gt=0)
+    allow_conflicts: bool = False  # true: book even if the technician or machine is already booked
+
+class TechnicianAvailability(BaseModel):
+    name: str
+    available_from: Optional[datetime] = None
+    available_until: Optional[datetime] = None
+
+class MaintenanceOptimizeRequest(BaseModel):
+    technicians: List[TechnicianAvailability] = []  # empty: everyone with maintenance in the last 90 days
+    machine_ids: Optional[List[str]] = None
+    horizon_days: float = Field(14, gt=0, le=90)
+    job_hours: float = Field(4.0, gt=0)
+    failure_downtime_hours: float = Field(24.0, gt=0)
+    min_fault_probability: float = Field(30.0, ge=0, le=100)
+    shift_start_hour: int = Field(8, ge=0, le=24)
+    shift_end_hour: int = Field(16, ge=0, le=24)
+    apply: bool = True  # false: return the plan without writing maintenance logs
+
+class PartUsage(BaseModel):
+    part_id: Optional[int] = None
+    part_number: Optional[str] = None
+    quantity: float = 1
+
+class MaintenanceCompleteRequest(BaseModel):
+    spare_parts_used: List[PartUsage] = []
+    cost: Optional[float] = None
+    duration_hours: Optional[float] = None
+    notes: Optional[str] = None
 
 @router.post("/schedule")
 async def schedule_maintenance(
@@ -62,12 +97,34 @@ async def schedule_maintenance(
     except ValueError:
         raise HTTPException(status_code=400, detail=f"Invalid maintenance type: {request.maintenance_type}")
     
+    duration = timedelta(hours=request.duration_hours or DEFAULT_JOB_HOURS)
+    
+    # Advisory locks keep other requests and workers off both calendars until the commit
+    await booking_index.lock_calendars(db, request.technician, machine.id)
+    conflicts = booking_index.conflicts(
+        request.scheduled_date,
+        request.scheduled_date + duration,
+        technician=request.technician,
+        machine_pk=machine.id
+    )
+    if conflicts and not request.allow_conflicts:
+        next_free = booking_index.next_free_slot(
+            request.scheduled_date, duration, technician=request.technician, machine_pk=machine.id
+        )
+        raise HTTPException(status_code=409, detail={
+            "message": "Technician or machine is already booked for this slot",
+            "conflicts": [{**conflict, "start": conflict["start"].isoformat(), "end": conflict["end"].isoformat()}
+                          for conflict in conflicts],
+            "next_free_slot": next_free.isoformat()
+        })
+    
     new_maintenance = MaintenanceLog(
         machine_id=machine.id,
         maintenance_type=maintenance_type_enum,
         title=request.title,
         description=request.description,
         scheduled_date=request.scheduled_date,
+        duration_hours=request.duration_hours,
         technician=request.technician,
         sop_reference=request.sop_reference,
         status=MaintenanceStatus.SCHEDULED
@@ -77,11 +134,82 @@ async def schedule_maintenance(
     machine.next_maintenance_date = request.scheduled_date
     
     db.add(new_maintenance)
+    await reliability_kpis.record_scheduled({machine.id: 1}, db)
     await db.commit()
+    
     await db.refresh(new_maintenance)
     
     return MaintenanceLogResponse.model_validate(new_maintenance)
 
+@router.get("/availability")
+async def get_availability(
+    start: datetime,
+    duration_hours: float = Query(DEFAULT_JOB_HOURS, gt=0),
+    technician: Optional[str] = None,
+    machine_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Conflicting bookings and the next free slot for a technician and/or machine
+    Answered from the in-memory booking calendars
+    """
+    if not technician and not machine_id:
+        raise HTTPException(status_code=400, detail="Provide technician, machine_id or both")
+    
+    machine_pk = None
+    if machine_id:
+        machine_pk = await db.scalar(select(Machine.id).where(Machine.machine_id == machine_id))
+        if machine_pk is None:
+            raise HTTPException(status_code=404, detail=f"Machine {machine_id} not found")
+    
+    duration = timedelta(hours=duration_hours)
+    await booking_index.ensure_built(db)
+    conflicts = booking_index.conflicts(start, start + duration, technician=technician, machine_pk=machine_pk)
+    
+    return {
+        "start": start,
+        "duration_hours": duration_hours,
+        "available": not conflicts,
+        "conflicts": conflicts,
+        "next_free_slot": booking_index.next_free_slot(start, duration, technician=technician, machine_pk=machine_pk)
+    }
+
+@router.post("/optimize")
+async def optimize_maintenance(
+    request: MaintenanceOptimizeRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Plan predictive maintenance for every at-risk machine - SOP-MAINT-02 at fleet scale
+    Weighs fault probability, failure window and downtime cost against
+    technician and spare part availability, and writes the plan as
+    scheduled maintenance logs in one insert, reserving in-stock parts
+    """
+    settings = PlanSettings(**request.model_dump(include={
+        "horizon_days", "job_hours", "failure_downtime_hours", "min_fault_probability",
+        "shift_start_hour", "shift_end_hour"
+    }))
+    
+    if request.apply:
+        # Excludes other plans and single bookings, in any worker, until the plan is committed
+        await booking_index.lock_all_calendars(db)
+    
+    try:
+        result = await maintenance_optimizer.optimize(
+            db,
+            [tech.model_dump() for tech in request.technicians],
+            settings,
+            machine_ids=request.machine_ids,
+            apply=request.apply
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if request.apply:
+        await db.commit()
+    
+    return result
+
 @router.get("/logs")
 async def get_maintenance_logs(
     machine_id: Optional[str] = None,
@@ -114,13 +242,217 @@ async def get_maintenance_logs(
     
     return [MaintenanceLogResponse.model_validate(log) for log in logs]
 
+@router.get("/logs/by-part/{part_id}")
+async def get_maintenance_logs_by_part(
+    part_id: int,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_db)
+):
+    """Maintenance logs that used a spare part (GIN containment lookup on spare_parts_used)"""
+    result = await db.execute(
+        select(SparePart.part_number).where(SparePart.id == part_id)
+    )
+    part_number = result.scalar_one_or_none()
+    
+    if part_number is None:
+        raise HTTPException(status_code=404, detail=f"Spare part {part_id} not found")
+    
+    used = MaintenanceLog.spare_parts_used
+    result = await db.execute(
+        select(MaintenanceLog)
+        .where(or_(
+            used.contains([{"part_id": part_id}]),
+            used.contains([{"part_number": part_number}]),
+            used.contains([part_id]),
+            used.contains([part_number])
+        ))
+        .order_by(desc(MaintenanceLog.scheduled_date))
+        .limit(limit)
+    )
+    logs = result.scalars().all()
+    
+    return [MaintenanceLogResponse.model_validate(log) for log in logs]
 
+@router.post("/logs/{log_id}/start")
+async def start_maintenance(
+    log_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """Mark a scheduled maintenance activity as in progress"""
+    result = await db.execute(
+        select(MaintenanceLog).where(MaintenanceLog.id == log_id).with_for_update()
+    )
+    log = result.scalar_one_or_none()
+    
+    if not log:
+        raise HTTPException(status_code=404, detail=f"Maintenance log {log_id} not found")
+    
+    if log.status != MaintenanceStatus.SCHEDULED:
+        raise HTTPException(status_code=400, detail=f"Maintenance log {log_id} is {log.status.value}, not scheduled")
+    
+    log.status = MaintenanceStatus.IN_PROGRESS
+    log.started_at = datetime.utcnow()
+    await reliability_kpis.record_transition(log, MaintenanceStatus.SCHEDULED, db)
+    
+    await db.commit()
+    
+    return {
+        "message": "Maintenance started",
+        "log_id": log_id,
+        "started_at": log.started_at
+    }
 
+@router.post("/logs/{log_id}/complete")
+async def complete_maintenance(
+    log_id: int,
+    request: MaintenanceCompleteRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Mark a maintenance activity as completed and record the spare parts it used"""
+    # Row lock: the reliability aggregates must count each completion once
+    result = await db.execute(
+        select(MaintenanceLog).where(MaintenanceLog.id == log_id).with_for_update()
+    )
+    log = result.scalar_one_or_none()
+    
+    if not log:
+        raise HTTPException(status_code=404, detail=f"Maintenance log {log_id} not found")
+    
+    # Only open work can be completed; a cancelled or completed log must not feed the KPIs again
+    if log.status not in (MaintenanceStatus.SCHEDULED, MaintenanceStatus.IN_PROGRESS):
+        raise HTTPException(status_code=409, detail=f"Maintenance log {log_id} is {log.status.value}")
+    
+    previous_status = log.status
+    log.status = MaintenanceStatus.COMPLETED
+    log.completed_at = datetime.utcnow()
+    
+    # Parts reserved for the job (e.g. by the optimizer) leave stock with it
+    try:
+        consumed = await stock_ledger.settle_reservations(
+            log_id, db, consume=True, reference="Maintenance completed", performed_by=log.technician
+        )
+    except InsufficientStockError as e:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    if request.spare_parts_used:
+        log.spare_parts_used = [
+            usage.model_dump(exclude_none=True) for usage in request.spare_parts_used
+        ]
+    elif not log.spare_parts_used:
+        # Fall back to what was consumed through the stock ledger for this job
+        ledger_usage = await stock_ledger.log_consumption(log_id, db)
+        if ledger_usage:
+            log.spare_parts_used = ledger_usage
+    if request.cost is not None:
+        log.cost = request.cost
+    if request.duration_hours is not None:
+        log.duration_hours = request.duration_hours
+    if request.notes:
+        log.notes = request.notes
+    
+    # Parse the parts used once, into the consumption aggregates
+    parts_updated = await consumption_index.record_log(log, db)
+    await reliability_kpis.record_transition(log, previous_status, db)
+    
+    await db.commit()
+    
+    return {
+        "message": "Maintenance completed",
+        "log_id": log_id,
+        "parts_consumption_updated": parts_updated,
+        "reservations_consumed": len(consumed)
+    }
 
+@router.post("/logs/{log_id}/cancel")
+async def cancel_maintenance(
+    log_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """Cancel a scheduled or in-progress maintenance activity and release the parts reserved for it"""
+    result = await db.execute(
+        select(MaintenanceLog).where(MaintenanceLog.id == log_id).with_for_update()
+    )
+    log = result.scalar_one_or_none()
+    
+    if not log:
+        raise HTTPException(status_code=404, detail=f"Maintenance log {log_id} not found")
+    
+    if log.status not in (MaintenanceStatus.SCHEDULED, MaintenanceStatus.IN_PROGRESS):
+        raise HTTPException(status_code=409, detail=f"Maintenance log {log_id} is {log.status.value}")
+    
+    previous_status = log.status
+    log.status = MaintenanceStatus.CANCELLED
+    try:
+        released = await stock_ledger.settle_reservations(
+            log_id, db, consume=False, reference="Maintenance cancelled", performed_by=log.technician
+        )
+    except InsufficientStockError as e:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    await reliability_kpis.record_transition(log, previous_status, db)
+    
+    await db.commit()
+    
+    return {
+        "message": "Maintenance cancelled",
+        "log_id": log_id,
+        "reservations_released": len(released)
+    }
 
+@router.get("/consumption/{part_id}")
+async def get_part_consumption(
+    part_id: int,
+    weeks: int = 12,
+    db: AsyncSession = Depends(get_db)
+):
+    """Weekly consumption history and current daily rate for a spare part"""
+    part_exists = await db.scalar(select(SparePart.id).where(SparePart.id == part_id))
+    if part_exists is None:
+        raise HTTPException(status_code=404, detail=f"Spare part {part_id} not found")
+    
+    rates = await consumption_index.daily_rates(db, [part_id])
+    history = await consumption_index.weekly_history(part_id, db, weeks=weeks)
+    
+    return {
+        "part_id": part_id,
+        "daily_rate": round(rates.get(part_id, 0.0), 4),
+        "weekly": history
+    }
 
+@router.post("/consumption/rebuild")
+async def rebuild_consumption_index(
+    db: AsyncSession = Depends(get_db)
+):
+    """Recompute the consumption aggregates from all completed maintenance logs"""
+    return await consumption_index.rebuild(db)
 
+@router.get("/kpis")
+async def get_reliability_kpis(
+    group_by: str = "machine_type",
+    machine_type: Optional[str] = None,
+    machine_id: Optional[List[str]] = Query(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    MTBF, MTTR and maintenance cost for the fleet, grouped by machine type or machine
+    Read from the per-machine reliability aggregates, not the maintenance history
+    """
+    if group_by not in ("machine_type", "machine"):
+        raise HTTPException(status_code=400, detail=f"Invalid group_by: {group_by}")
+    
+    type_enum = None
+    if machine_type:
+        try:
+            type_enum = MachineType(machine_type)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid machine type: {machine_type}")
+    
+    return await reliability_kpis.kpis(db, group_by=group_by, machine_type=type_enum, machine_ids=machine_id)
 
-
-
-
+@router.post("/kpis/rebuild")
+async def rebuild_reliability_kpis(
+    db: AsyncSession = Depends(get_db)
+):
+    """Recompute the reliability aggregates from the full maintenance history"""
+    return await reliability_kpis.rebuild(db)
@@ -13,6 +13,9 @@ from pydantic import BaseModel
 from database.connection import get_db
 from models.sensor_data import SensorData
 from models.machine import Machine
+from monitoring.reprediction_scheduler import reprediction_scheduler
+from services.alert_engine import alert_engine
+from services.resource_versions import resource_versions, conditional_get
 
 router = APIRouter()
 
@@ -70,9 +73,13 @@ async def push_sensor_data(
     db.add(sensor_data)
     await db.commit()
     await db.refresh(sensor_data)
+    resource_versions.bump("sensor_data", machine.machine_id)
     
-    # Trigger anomaly detection (async background task would be better in production)
-    # For now, we'll call it synchronously
+    # Evaluate temperature/vibration alert rules
+    alert_engine.evaluate_reading(machine, sensor_data)
+    
+    # Count the reading towards the machine's next re-prediction
+    reprediction_scheduler.record_reading(machine.machine_id, machine.status.value if machine.status else None)
     
     return {
         "message": "Sensor data stored successfully",
@@ -80,7 +87,7 @@ async def push_sensor_data(
         "timestamp": sensor_data.timestamp
     }
 
-@router.get("/latest/{machine_id}")
+@router.get("/latest/{machine_id}", dependencies=[Depends(conditional_get("sensor_data:key", key_param="machine_id"))])
 async def get_latest_sensor_data(
     machine_id: str,
     limit: int = 100,
@@ -3,16 +3,17 @@ SOP (Standard Operating Procedure) Routes
 Handles SOP workflow management and task tracking
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, desc
-from typing import Optional
+from typing import Any, List, Optional
 from pydantic import BaseModel
 from datetime import datetime
 
 from database.connection import get_db
 from models.sop_task import SOPTask, SOPTaskStatus, SOPCode
 from models.machine import Machine
+from services.delta_sync import delta_sync, delta_response, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
 router = APIRouter()
 
@@ -40,15 +41,19 @@ class SOPTaskCreate(BaseModel):
     due_date: Optional[datetime] = None
     assigned_to: Optional[str] = None
     priority: str = "medium"
+    checklist: Optional[List[Any]] = None
 
 @router.get("/tasks")
 async def get_sop_tasks(
     status: Optional[str] = None,
     sop_code: Optional[str] = None,
+    since: Optional[str] = Query(None, description="Sync cursor; 0 starts from the beginning"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size with since"),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Get all SOP tasks with optional filtering
+    With since, only tasks created, changed or deleted after the cursor
     """
     query = select(SOPTask).order_by(desc(SOPTask.scheduled_date))
     
@@ -66,6 +71,10 @@ async def get_sop_tasks(
         except ValueError:
             raise HTTPException(status_code=400, detail=f"Invalid SOP code: {sop_code}")
     
+    if since is not None:
+        rows, deleted, cursor, has_more = await delta_sync.fetch(db, query, SOPTask, since, limit)
+        return delta_response([SOPTaskResponse.model_validate(t) for t, in rows], deleted, cursor, has_more)
+    
     result = await db.execute(query)
     tasks = result.scalars().all()
     
@@ -104,6 +113,7 @@ async def create_sop_task(
         due_date=task.due_date,
         assigned_to=task.assigned_to,
         priority=task.priority,
+        checklist=task.checklist,
         status=SOPTaskStatus.PENDING
     )
     
@@ -3,10 +3,11 @@ Supply Chain Risk Routes
 Handles supply chain continuity, risk assessment, and delay prediction
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import Optional
+from fastapi.responses import Response
+from typing import Dict, List, Optional
 from pydantic import BaseModel
 
 from database.connection import get_db
@@ -14,6 +15,10 @@ from models.supply_chain_risk import SupplyChainRisk, RiskLevel
 from models.spare_part import SparePart
 from models.supplier import Supplier
 from services.supply_chain_service import SupplyChainService
+from services.impact_graph import impact_graph
+from services.resource_versions import conditional_get
+from services.delta_sync import delta_response, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from services.reorder_planner import reorder_planner, load_catalog_arrays, plan_lines, plan_summary, plan_to_csv
 
 router = APIRouter()
 
@@ -29,6 +34,49 @@ class SupplyChainRiskResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class SupplierLimit(BaseModel):
+    max_spend: Optional[float] = None
+    min_order_value: Optional[float] = None
+
+class ReorderPlanRequest(BaseModel):
+    budget: Optional[float] = None
+    service_level: float = 0.95
+    supplier_limits: Dict[int, SupplierLimit] = {}
+    include_all: bool = False
+
+@router.get("/risk/all", dependencies=[Depends(conditional_get("risks", skip_query="since"))])
+async def get_all_supply_chain_risks(
+    since: Optional[str] = Query(None, description="Sync cursor; 0 starts from the beginning"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size with since"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get supply chain risk assessment for all parts
+    Read-only: the precomputed supply_chain_risk rows, kept current by the
+    background risk refresher, are read in one query; with since, only
+    assessments rewritten or deleted after the cursor
+    """
+    supply_chain_service = SupplyChainService()
+    
+    if since is not None:
+        risks, deleted, cursor, has_more = await supply_chain_service.get_risk_changes(db, since, limit)
+        return delta_response(risks, deleted, cursor, has_more)
+    
+    risks = await supply_chain_service.get_all_risks(db)
+    
+    return {"risks": risks}
+
+@router.post("/risk/refresh")
+async def refresh_supply_chain_risks(
+    full: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    """Run the risk job: reassess dirty/expired parts, or every part with full=true"""
+    supply_chain_service = SupplyChainService()
+    reassessed = await supply_chain_service.refresh_risks(db, full=full)
+    
+    return {"reassessed_parts": reassessed, "full": full}
+
 @router.get("/risk/{part_id}")
 async def get_supply_chain_risk(
     part_id: int,
@@ -67,42 +115,6 @@ async def get_supply_chain_risk(
     
     return risk_assessment
 
-@router.get("/risk/all")
-async def get_all_supply_chain_risks(
-    db: AsyncSession = Depends(get_db)
-):
-    """Get supply chain risk assessment for all parts"""
-    result = await db.execute(select(SparePart))
-    spare_parts = result.scalars().all()
-    
-    risks = []
-    supply_chain_service = SupplyChainService()
-    
-    for part in spare_parts:
-        supplier = None
-        if part.primary_supplier_id:
-            result = await db.execute(
-                select(Supplier).where(Supplier.id == part.primary_supplier_id)
-            )
-            supplier = result.scalar_one_or_none()
-        
-        risk_assessment = await supply_chain_service.assess_risk(
-            spare_part=part,
-            supplier=supplier,
-            db=db
-        )
-        
-        risks.append({
-            "part_id": part.id,
-            "part_number": part.part_number,
-            "part_name": part.name,
-            "current_quantity": part.current_quantity,
-            "min_quantity": part.min_quantity,
-            **risk_assessment
-        })
-    
-    return {"risks": risks}
-
 @router.get("/delay-prediction/{supplier_id}")
 async def predict_delivery_delay(
     supplier_id: int,
@@ -128,13 +140,53 @@ async def predict_delivery_delay(
     
     return delay_prediction
 
+@router.get("/impact")
+async def get_supplier_disruption_impact(
+    supplier_ids: List[int] = Query(...),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Machines exposed if one or more suppliers fail, with summed downtime cost
+    Answered from the in-memory supplier -> part -> machine graph
+    """
+    await impact_graph.ensure_built(db)
+    
+    return impact_graph.exposure(supplier_ids)
 
-
-
-
-
-
-
-
-
-
+@router.post("/reorder-plan")
+async def create_reorder_plan(
+    request: ReorderPlanRequest,
+    format: str = Query("json", pattern="^(json|csv)$"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Purchase plan for the whole catalog: reorder points, safety stock and
+    order quantities, trimmed to the budget and supplier limits
+    """
+    if request.budget is not None and request.budget < 0:
+        raise HTTPException(status_code=400, detail="Budget must not be negative")
+    if not 0.5 <= request.service_level < 1:
+        raise HTTPException(status_code=400, detail="Service level must be in [0.5, 1)")
+    
+    arrays = await load_catalog_arrays(db)
+    plan = reorder_planner.plan(
+        arrays,
+        budget=request.budget,
+        service_level=request.service_level,
+        supplier_limits={
+            supplier_id: limit.model_dump() for supplier_id, limit in request.supplier_limits.items()
+        }
+    )
+    lines = plan_lines(arrays, plan, include_all=request.include_all)
+    
+    if format == "csv":
+        return Response(
+            content=plan_to_csv(lines),
+            media_type="text/csv",
+            headers={"Content-Disposition": "attachment; filename=reorder_plan.csv"}
+        )
+    
+    return {
+        "summary": plan_summary(arrays, plan, request.budget),
+        "lines": lines
+    }
@@ -0,0 +1,120 @@
+"""
+Alert Counters
+In-memory counts of open alerts by status, severity and type, kept current
+from the committed alert events
+"""
+
+import asyncio
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.events import on_commit
+from models.alert import Alert, AlertStatus, AlertSeverity, AlertType
+from services.event_hub import ALERT_EVENTS
+
+OPEN_STATUSES = (AlertStatus.ACTIVE, AlertStatus.ACKNOWLEDGED)
+
+CounterKey = Tuple[str, str, str]  # (status, severity, alert_type) values
+
+class AlertCounters:
+    """
+    Built once with a GROUP BY over the open-alert partial index, then moved
+    by the same committed events the live stream publishes (creations,
+    single and bulk status changes), so the summary never reads the alerts
+    table. Resolved and dismissed alerts are not counted.
+    """
+
+    def __init__(self):
+        self._counts: Counter = Counter()
+        self._built = False
+        self._version = 0
+        self._lock = asyncio.Lock()
+        self.rebuilds = 0
+
+    def invalidate(self, rows: Optional[List[Any]] = None):
+        """Force a rebuild on the next read"""
+        self._built = False
+        self._version += 1
+
+    async def ensure_built(self, db: AsyncSession, attempts: int = 3):
+        """Count open alerts if the counters were never built or were invalidated"""
+        if self._built:
+            return
+
+        async with self._lock:
+            for attempt in range(attempts):
+                if self._built:
+                    return
+                version = self._version
+
+                result = await db.execute(
+                    select(Alert.status, Alert.severity, Alert.alert_type, func.count())
+                    .where(Alert.status.in_(OPEN_STATUSES))
+                    .group_by(Alert.status, Alert.severity, Alert.alert_type)
+                )
+                counts = Counter({
+                    (status.value, severity.value, alert_type.value): count
+                    for status, severity, alert_type, count in result.all()
+                })
+
+                # A commit that landed while counting may be missing; recount unless out of attempts
+                stale = version != self._version
+                if stale and attempt < attempts - 1:
+                    continue
+
+                # Out of attempts: serve these counts, but stay unbuilt so the next read recounts
+                self._counts = counts
+                self._built = not stale
+                self.rebuilds += 1
+
+    def events_committed(self, rows: List[Any]):
+        """Apply committed alert events (event type, payload) to the counters"""
+        if not self._built:
+            self._version += 1
+            return
+
+        for event_type, payload in rows:
+            count = payload.get("count", 1)
+            severity, alert_type = payload.get("severity"), payload.get("alert_type")
+            if event_type != "alert_created":
+                self._move(payload.get("previous_status"), severity, alert_type, -count)
+            self._move(payload.get("status"), severity, alert_type, count)
+
+    def _move(self, status: Optional[str], severity: str, alert_type: str, delta: int):
+        if status not in (AlertStatus.ACTIVE.value, AlertStatus.ACKNOWLEDGED.value):
+            return
+        key = (status, severity, alert_type)
+        self._counts[key] += delta
+        if self._counts[key] <= 0:
+            del self._counts[key]
+
+    def active_total(self) -> int:
+        return sum(count for (status, _, _), count in self._counts.items() if status == AlertStatus.ACTIVE.value)
+
+    def summary(self) -> Dict[str, Any]:
+        """Active counts by severity and type, plus the acknowledged backlog"""
+        by_severity = {severity.value: 0 for severity in AlertSeverity}
+        by_type = {alert_type.value: 0 for alert_type in AlertType}
+        acknowledged = 0
+        for (status, severity, alert_type), count in self._counts.items():
+            if status == AlertStatus.ACKNOWLEDGED.value:
+                acknowledged += count
+                continue
+            by_severity[severity] = by_severity.get(severity, 0) + count
+            by_type[alert_type] = by_type.get(alert_type, 0) + count
+
+        return {
+            "active": sum(by_severity.values()),
+            "acknowledged": acknowledged,
+            "active_by_severity": by_severity,
+            "active_by_type": by_type
+        }
+
+
+# Shared counters, moved by committed alert events
+alert_counters = AlertCounters()
+
+on_commit(ALERT_EVENTS)(alert_counters.events_committed)
@@ -0,0 +1,270 @@
+"""
+Alert Engine
+Evaluates alert rules as sensor readings and predictions arrive and writes
+new alerts to the database in batches
+"""
+
+import asyncio
+import os
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+from sqlalchemy import insert, select
+
+from database.connection import AsyncSessionLocal
+from database.events import mark_changed
+from services.event_hub import ALERT_EVENTS, alert_event_payload
+from services.alert_incidents import incident_grouper
+from models.alert import Alert, AlertType, AlertSeverity, AlertStatus
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class ThresholdRule:
+    """
+    Hysteresis rule: raises at `raise_at`, only clears again below `clear_at`
+    Values are ratios of the machine limit, or absolute for predictions
+    """
+    alert_type: AlertType
+    raise_at: float
+    clear_at: float
+    critical_at: float
+
+TEMPERATURE_RULE = ThresholdRule(AlertType.TEMPERATURE_HIGH, raise_at=0.95, clear_at=0.85, critical_at=1.05)
+VIBRATION_RULE = ThresholdRule(AlertType.VIBRATION_HIGH, raise_at=0.95, clear_at=0.85, critical_at=1.10)
+FAULT_RULE = ThresholdRule(AlertType.FAULT_PREDICTED, raise_at=70.0, clear_at=55.0, critical_at=85.0)
+
+@dataclass
+class _RuleState:
+    in_excursion: bool = False
+    alert_open: bool = False
+    last_raised_at: float = float("-inf")
+    incident_id: Optional[int] = None
+
+class AlertEngine:
+    """
+    Streaming alert evaluation with:
+    - hysteresis, so values hovering around a limit do not flap
+    - per machine/type cooldown between raised alerts
+    - an in-memory index of open alerts for deduplication
+    - batched inserts, flushed by size or interval
+    - grouping of each batch into incidents, with repeats of open alerts
+      counted on the incident instead of written as rows
+    """
+
+    def __init__(
+        self,
+        cooldown_seconds: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        flush_interval_seconds: Optional[float] = None
+    ):
+        self.cooldown_seconds = cooldown_seconds if cooldown_seconds is not None else float(os.getenv("ALERT_COOLDOWN_SECONDS", "600"))
+        self.batch_size = batch_size if batch_size is not None else int(os.getenv("ALERT_BATCH_SIZE", "100"))
+        self.flush_interval_seconds = flush_interval_seconds if flush_interval_seconds is not None else float(os.getenv("ALERT_FLUSH_SECONDS", "2"))
+        # A zero cooldown is valid (a new excursion raises as soon as the last alert is closed); a zero batch or flush interval is not
+        if self.cooldown_seconds < 0:
+            raise ValueError(f"cooldown_seconds (ALERT_COOLDOWN_SECONDS) must not be negative, got {self.cooldown_seconds}")
+        if self.batch_size < 1:
+            raise ValueError(f"batch_size (ALERT_BATCH_SIZE) must be at least 1, got {self.batch_size}")
+        if self.flush_interval_seconds <= 0:
+            raise ValueError(f"flush_interval_seconds (ALERT_FLUSH_SECONDS) must be positive, got {self.flush_interval_seconds}")
+
+        self._index: Dict[Tuple[int, AlertType], _RuleState] = {}
+        self._pending: List[Dict[str, Any]] = []
+        self._repeats: Dict[int, int] = defaultdict(int)  # incident id -> suppressed re-triggers
+        self._locations: Dict[int, Optional[str]] = {}
+        self._flush_requested = asyncio.Event()
+        self.running = False
+
+        self.evaluations = 0
+        self.alerts_raised = 0
+        self.alerts_suppressed = 0
+        self.alerts_written = 0
+
+    # ------------------------------
+    # Rule evaluation
+    # ------------------------------
+    def evaluate_reading(self, machine: Any, reading: Any):
+        """Check one sensor reading against the machine's temperature and vibration limits"""
+        self._locations[machine.id] = machine.location
+        if machine.max_temperature:
+            ratio = reading.temperature / machine.max_temperature
+            self._evaluate(
+                machine.id, TEMPERATURE_RULE, ratio,
+                title=f"High temperature on {machine.machine_id}",
+                message=(
+                    f"Temperature {reading.temperature:.1f}°C reached {ratio * 100:.0f}% "
+                    f"of the {machine.max_temperature:.1f}°C limit"
+                )
+            )
+
+        if machine.max_vibration:
+            ratio = reading.vibration / machine.max_vibration
+            self._evaluate(
+                machine.id, VIBRATION_RULE, ratio,
+                title=f"High vibration on {machine.machine_id}",
+                message=(
+                    f"Vibration {reading.vibration:.2f} reached {ratio * 100:.0f}% "
+                    f"of the {machine.max_vibration:.2f} limit"
+                )
+            )
+
+    def evaluate_prediction(self, machine: Any, prediction: Any):
+        """Check a fault prediction result for the machine"""
+        self._locations[machine.id] = machine.location
+        self._evaluate(
+            machine.id, FAULT_RULE, prediction.fault_probability,
+            title=f"Fault predicted on {machine.machine_id}",
+            message=(
+                f"Fault probability {prediction.fault_probability:.1f}%"
+                + (f", expected failure window {prediction.predicted_failure_window}"
+                   if prediction.predicted_failure_window else "")
+            ),
+            fault_probability=prediction.fault_probability,
+            predicted_failure_window=prediction.predicted_failure_window,
+            anomaly_score=prediction.anomaly_score
+        )
+
+    def _evaluate(self, machine_pk: int, rule: ThresholdRule, value: float, **alert_fields):
+        self.evaluations += 1
+        state = self._index.setdefault((machine_pk, rule.alert_type), _RuleState())
+
+        if state.in_excursion:
+            if value <= rule.clear_at:
+                state.in_excursion = False
+            return
+
+        if value < rule.raise_at:
+            return
+
+        state.in_excursion = True
+        now = time.monotonic()
+        if state.alert_open or now - state.last_raised_at < self.cooldown_seconds:
+            self.alerts_suppressed += 1
+            if state.alert_open and state.incident_id is not None:
+                self._repeats[state.incident_id] += 1
+            return
+
+        state.alert_open = True
+        state.last_raised_at = now
+        self.alerts_raised += 1
+        # Every row carries the same keys so the batch is one multi-row INSERT
+        row = {
+            "machine_id": machine_pk,
+            "alert_type": rule.alert_type,
+            "severity": AlertSeverity.CRITICAL if value >= rule.critical_at else AlertSeverity.WARNING,
+            "status": AlertStatus.ACTIVE,
+            "fault_probability": None,
+            "predicted_failure_window": None,
+            "anomaly_score": None
+        }
+        row.update(alert_fields)
+        self._pending.append(row)
+        if len(self._pending) >= self.batch_size:
+            self._flush_requested.set()
+
+    def release(self, machine_pk: Optional[int], alert_type: Any):
+        """Forget an open alert once it is resolved or dismissed"""
+        if machine_pk is None:
+            return
+        state = self._index.get((machine_pk, AlertType(alert_type)))
+        if state:
+            state.alert_open = False
+            state.incident_id = None
+
+    # ------------------------------
+    # Persistence
+    # ------------------------------
+    async def load_open_alerts(self):
+        """Seed the deduplication index from alerts still open in the database"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Alert.machine_id, Alert.alert_type, Alert.incident_id)
+                .where(
+                    Alert.machine_id.is_not(None),
+                    Alert.status.in_([AlertStatus.ACTIVE, AlertStatus.ACKNOWLEDGED])
+                )
+                .order_by(Alert.id)
+            )
+            for machine_pk, alert_type, incident_id in result.all():
+                state = self._index.setdefault((machine_pk, alert_type), _RuleState())
+                state.alert_open = True
+                state.in_excursion = True
+                state.incident_id = incident_id
+
+            await incident_grouper.load(db)
+
+    async def flush(self):
+        """Write all pending alerts with one multi-row INSERT, grouped into incidents"""
+        if not self._pending and not self._repeats:
+            return
+
+        batch, self._pending = self._pending, []
+        repeats, self._repeats = self._repeats, defaultdict(int)
+        try:
+            async with AsyncSessionLocal() as db:
+                if batch:
+                    await incident_grouper.assign(db, batch, self._locations)
+                    result = await db.execute(insert(Alert).returning(Alert.id, sort_by_parameter_order=True), batch)
+                    mark_changed(db, "alerts", batch)
+                    mark_changed(db, ALERT_EVENTS, [
+                        ("alert_created", alert_event_payload({**row, "id": alert_id}))
+                        for row, alert_id in zip(batch, result.scalars().all())
+                    ])
+                await incident_grouper.count_repeats(db, repeats)
+                await db.commit()
+            self.alerts_written += len(batch)
+            for row in batch:
+                state = self._index.get((row["machine_id"], row["alert_type"]))
+                if state and state.alert_open:
+                    state.incident_id = row["incident_id"]
+        except Exception as e:
+            incident_grouper.forget()
+            # Lost alerts must be able to fire again
+            for row in batch:
+                state = self._index.get((row["machine_id"], row["alert_type"]))
+                if state:
+                    state.alert_open = False
+                    state.in_excursion = False
+                    state.last_raised_at = float("-inf")
+            logger.error(f"Failed to write {len(batch)} alerts: {e}", exc_info=True)
+
+    async def run(self):
+        """Flush loop: writes pending alerts when a batch fills or the interval elapses"""
+        self.running = True
+        await self.load_open_alerts()
+
+        while self.running:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            await self.flush()
+
+        await self.flush()
+
+    def stop(self):
+        """Stop the flush loop after writing what is pending"""
+        self.running = False
+        self._flush_requested.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Engine counters"""
+        return {
+            "running": self.running,
+            "open_alerts_indexed": sum(1 for s in self._index.values() if s.alert_open),
+            "pending_writes": len(self._pending),
+            "evaluations": self.evaluations,
+            "alerts_raised": self.alerts_raised,
+            "alerts_suppressed": self.alerts_suppressed,
+            "alerts_written": self.alerts_written,
+            "incidents": incident_grouper.stats()
+        }
+
+
+# Fed by the sensor and prediction routes, flushed from the application lifespan
+alert_engine = AlertEngine()
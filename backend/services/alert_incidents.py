@@ -0,0 +1,211 @@
+"""
+Alert Incidents
+Correlates new alerts by location and type within a time window into
+incidents, and keeps incident counters in step with member alerts
+"""
+
+import os
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select, update, insert, func, case, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.events import mark_changed
+from models.alert import Alert, AlertType, AlertSeverity, AlertStatus
+from models.alert_incident import AlertIncident, IncidentStatus
+
+UNASSIGNED = "unassigned"
+
+OPEN_ALERT_STATUSES = (AlertStatus.ACTIVE, AlertStatus.ACKNOWLEDGED)
+
+SEVERITY_RANK = {severity: rank for rank, severity in enumerate(AlertSeverity)}
+
+GroupKey = Tuple[str, AlertType]
+
+@dataclass
+class _OpenIncident:
+    """Latest incident of a group, while new alerts can still join it"""
+    id: int
+    severity: AlertSeverity
+    last_alert_at: datetime
+    machines: Set[int] = field(default_factory=set)
+
+class IncidentGrouper:
+    """
+    The alert engine hands every batch to assign() before inserting it. Alerts
+    whose (location, type) group had an alert within the window join that
+    group's incident; the rest open new incidents. Per batch this is one
+    multi-row INSERT for new incidents and one executemany UPDATE of the
+    counters of existing ones, whatever the number of alerts.
+    Repeats of an alert that is still open never become rows; they are
+    counted on the alert's incident instead.
+    """
+
+    def __init__(self, window_seconds: Optional[float] = None):
+        self.window = timedelta(seconds=window_seconds if window_seconds is not None else float(os.getenv("ALERT_INCIDENT_WINDOW_SECONDS", "900")))
+        # Zero is valid: only alerts raised at the same instant share an incident
+        if self.window < timedelta(0):
+            raise ValueError(f"window_seconds (ALERT_INCIDENT_WINDOW_SECONDS) must not be negative, got {self.window.total_seconds()}")
+        self._groups: Dict[GroupKey, _OpenIncident] = {}
+
+    async def load(self, db: AsyncSession):
+        """Seed groups from incidents that can still take alerts"""
+        cutoff = datetime.now(timezone.utc) - self.window
+        result = await db.execute(
+            select(AlertIncident.id, AlertIncident.location, AlertIncident.alert_type,
+                   AlertIncident.severity, AlertIncident.last_alert_at)
+            .where(AlertIncident.status == IncidentStatus.OPEN, AlertIncident.last_alert_at >= cutoff)
+            .order_by(AlertIncident.last_alert_at)
+        )
+        groups = {
+            (location, alert_type): _OpenIncident(incident_id, severity, last_alert_at)
+            for incident_id, location, alert_type, severity, last_alert_at in result.all()
+        }
+        if groups:
+            by_id = {incident.id: incident for incident in groups.values()}
+            members = await db.execute(
+                select(Alert.incident_id, Alert.machine_id)
+                .where(Alert.incident_id.in_(list(by_id)), Alert.machine_id.is_not(None))
+                .distinct()
+            )
+            for incident_id, machine_pk in members.all():
+                by_id[incident_id].machines.add(machine_pk)
+        self._groups = groups
+
+    def forget(self):
+        """Drop in-memory groups after a failed write; later alerts start new incidents"""
+        self._groups = {}
+
+    async def assign(
+        self,
+        db: AsyncSession,
+        rows: List[Dict[str, Any]],
+        locations: Dict[int, Optional[str]]
+    ):
+        """Set incident_id on pending alert rows, creating or updating incidents (caller commits)"""
+        now = datetime.now(timezone.utc)
+        by_group: Dict[GroupKey, List[Dict[str, Any]]] = defaultdict(list)
+        for row in rows:
+            location = locations.get(row["machine_id"]) or UNASSIGNED
+            by_group[(location, AlertType(row["alert_type"]))].append(row)
+
+        new_groups, counter_updates = [], []
+        for key, members in by_group.items():
+            severity = max((AlertSeverity(row["severity"]) for row in members), key=SEVERITY_RANK.get)
+            machines = {row["machine_id"] for row in members if row["machine_id"] is not None}
+            incident = self._groups.get(key)
+
+            if incident is None or now - incident.last_alert_at > self.window:
+                new_groups.append((key, members, severity, machines))
+                continue
+
+            incident.machines |= machines
+            incident.severity = max(incident.severity, severity, key=SEVERITY_RANK.get)
+            incident.last_alert_at = now
+            counter_updates.append({
+                "b_id": incident.id,
+                "b_alerts": len(members),
+                "b_machines": len(incident.machines),
+                "b_severity": incident.severity,
+                "b_last": now
+            })
+            for row in members:
+                row["incident_id"] = incident.id
+
+        if new_groups:
+            result = await db.execute(
+                insert(AlertIncident).returning(AlertIncident.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "location": location,
+                        "alert_type": alert_type,
+                        "severity": severity,
+                        "status": IncidentStatus.OPEN,
+                        "alert_count": len(members),
+                        "open_alert_count": len(members),
+                        "machine_count": len(machines),
+                        "repeat_count": 0,
+                        "first_alert_at": now,
+                        "last_alert_at": now
+                    }
+                    for (location, alert_type), members, severity, machines in new_groups
+                ]
+            )
+            for ((key, members, severity, machines), incident_id) in zip(new_groups, result.scalars().all()):
+                self._groups[key] = _OpenIncident(incident_id, severity, now, set(machines))
+                for row in members:
+                    row["incident_id"] = incident_id
+
+        if counter_updates:
+            table = AlertIncident.__table__
+            await db.execute(
+                update(table)
+                .where(table.c.id == bindparam("b_id"))
+                .values(
+                    alert_count=table.c.alert_count + bindparam("b_alerts"),
+                    open_alert_count=table.c.open_alert_count + bindparam("b_alerts"),
+                    machine_count=bindparam("b_machines"),
+                    severity=bindparam("b_severity"),
+                    last_alert_at=bindparam("b_last"),
+                    status=IncidentStatus.OPEN,
+                    resolved_at=None
+                ),
+                counter_updates
+            )
+
+        for row in rows:
+            row.setdefault("incident_id", None)
+        mark_changed(db, "alert_incidents")
+
+    async def count_repeats(self, db: AsyncSession, repeats: Dict[int, int]):
+        """Add re-triggers of open alerts to their incidents' counters (caller commits)"""
+        if not repeats:
+            return
+        table = AlertIncident.__table__
+        await db.execute(
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values(repeat_count=table.c.repeat_count + bindparam("b_repeats")),
+            [{"b_id": incident_id, "b_repeats": count} for incident_id, count in repeats.items()]
+        )
+        mark_changed(db, "alert_incidents")
+
+    async def refresh_open_counts(self, db: AsyncSession, incident_ids: Iterable[Optional[int]]):
+        """
+        Recount open member alerts after alerts were resolved, dismissed or
+        reopened, resolving incidents that have none left (caller commits)
+        """
+        incident_ids = {incident_id for incident_id in incident_ids if incident_id is not None}
+        if not incident_ids:
+            return
+
+        open_alerts = (
+            select(func.count())
+            .where(Alert.incident_id == AlertIncident.id, Alert.status.in_(OPEN_ALERT_STATUSES))
+            .scalar_subquery()
+        )
+        await db.execute(
+            update(AlertIncident)
+            .where(AlertIncident.id.in_(incident_ids))
+            .values(
+                open_alert_count=open_alerts,
+                status=case((open_alerts == 0, IncidentStatus.RESOLVED.name), else_=IncidentStatus.OPEN.name)
+                    .cast(AlertIncident.status.type),
+                resolved_at=case((open_alerts == 0, func.coalesce(AlertIncident.resolved_at, func.now())), else_=None)
+            )
+            .execution_options(synchronize_session=False)
+        )
+        mark_changed(db, "alert_incidents")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_seconds": self.window.total_seconds(),
+            "groups_tracked": len(self._groups)
+        }
+
+
+# Used by the alert engine's flush and the alert routes
+incident_grouper = IncidentGrouper()
@@ -0,0 +1,224 @@
+"""
+Alert Retention
+Purges old resolved and dismissed alerts from the hot alerts table into
+compact daily counts, and serves alert-rate history from both
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select, delete, func, exists, union_all, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.connection import AsyncSessionLocal
+from database.events import mark_changed
+from models.alert import Alert, AlertStatus, AlertType
+from models.alert_daily_count import AlertDailyCount
+from models.alert_incident import AlertIncident, IncidentStatus
+from services.delta_sync import delta_sync
+
+logger = logging.getLogger(__name__)
+
+CLOSED_STATUSES = (AlertStatus.RESOLVED, AlertStatus.DISMISSED)
+
+def _utc_day(column):
+    return func.date(func.timezone("UTC", column))
+
+class AlertRetention:
+    """
+    Each batch is a single statement: a DELETE ... RETURNING CTE removes up
+    to batch_size closed alerts last changed before the cutoff, and an
+    INSERT ... SELECT ... GROUP BY ... ON CONFLICT DO UPDATE CTE adds them to
+    alert_daily_counts, so rows can never be purged without being counted.
+    Batches keep lock time and WAL bursts bounded; SKIP LOCKED lets the job
+    run next to bulk alert updates.
+    """
+
+    def __init__(
+        self,
+        retention_days: Optional[float] = None,
+        interval_seconds: Optional[float] = None,
+        batch_size: Optional[int] = None
+    ):
+        self.retention_days = retention_days if retention_days is not None else float(os.getenv("ALERT_RETENTION_DAYS", "90"))
+        self.interval_seconds = interval_seconds if interval_seconds is not None else float(os.getenv("ALERT_RETENTION_INTERVAL_SECONDS", "3600"))
+        self.batch_size = batch_size if batch_size is not None else int(os.getenv("ALERT_RETENTION_BATCH_SIZE", "5000"))
+        # Zero retention is valid (compact every closed alert); the interval and batch size must be positive
+        if self.retention_days < 0:
+            raise ValueError(f"retention_days (ALERT_RETENTION_DAYS) must not be negative, got {self.retention_days}")
+        if self.interval_seconds <= 0:
+            raise ValueError(f"interval_seconds (ALERT_RETENTION_INTERVAL_SECONDS) must be positive, got {self.interval_seconds}")
+        if self.batch_size < 1:
+            raise ValueError(f"batch_size (ALERT_RETENTION_BATCH_SIZE) must be at least 1, got {self.batch_size}")
+        self._wakeup = asyncio.Event()
+        self.running = False
+        self.alerts_compacted = 0
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    def cutoff(self) -> datetime:
+        return datetime.now(timezone.utc) - timedelta(days=self.retention_days)
+
+    def _compact_batch_statement(self, cutoff: datetime):
+        candidates = (
+            select(Alert.id)
+            .where(Alert.status.in_(CLOSED_STATUSES), Alert.updated_at < cutoff)
+            .order_by(Alert.updated_at, Alert.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        moved = (
+            delete(Alert)
+            .where(Alert.id.in_(candidates.scalar_subquery()))
+            .returning(Alert.created_at, Alert.machine_id, Alert.alert_type, Alert.severity)
+            .cte("moved")
+        )
+
+        # Group on subquery columns: bound parameters inside grouped expressions are not matched
+        keyed = select(
+            _utc_day(moved.c.created_at).label("day"),
+            func.coalesce(moved.c.machine_id, 0).label("machine_id"),
+            moved.c.alert_type,
+            moved.c.severity
+        ).subquery()
+        counts = (
+            select(keyed.c.day, keyed.c.machine_id, keyed.c.alert_type, keyed.c.severity, func.count())
+            .group_by(keyed.c.day, keyed.c.machine_id, keyed.c.alert_type, keyed.c.severity)
+        )
+        upsert = pg_insert(AlertDailyCount).from_select(
+            ["day", "machine_id", "alert_type", "severity", "alert_count"], counts
+        )
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[AlertDailyCount.day, AlertDailyCount.machine_id,
+                            AlertDailyCount.alert_type, AlertDailyCount.severity],
+            set_={
+                "alert_count": AlertDailyCount.alert_count + upsert.excluded.alert_count,
+                "updated_at": func.now()
+            }
+        )
+        return select(func.count()).select_from(moved).add_cte(upsert.cte("counted"))
+
+    async def compact(self, max_batches: Optional[int] = None) -> Dict[str, Any]:
+        """Purge everything past the cutoff, one committed batch at a time"""
+        cutoff = self.cutoff()
+        statement = self._compact_batch_statement(cutoff)
+        compacted, batches = 0, 0
+
+        while max_batches is None or batches < max_batches:
+            async with AsyncSessionLocal() as db:
+                moved = await db.scalar(statement)
+                if moved:
+                    mark_changed(db, "alerts")
+                await db.commit()
+            compacted += moved
+            batches += 1
+            # A short or empty batch means nothing is left past the cutoff
+            if not moved or moved < self.batch_size:
+                break
+
+        # Resolved incidents whose alerts are all gone
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                delete(AlertIncident)
+                .where(
+                    AlertIncident.status == IncidentStatus.RESOLVED,
+                    AlertIncident.resolved_at < cutoff,
+                    ~exists().where(Alert.incident_id == AlertIncident.id)
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount:
+                mark_changed(db, "alert_incidents")
+            # Delta sync delete markers, including the ones this run left behind, age out here too
+            tombstones_removed = await delta_sync.prune_tombstones(db)
+            await db.commit()
+
+        self.alerts_compacted += compacted
+        self.last_run = {
+            "cutoff": cutoff.isoformat(),
+            "alerts_compacted": compacted,
+            "batches": batches,
+            "incidents_removed": result.rowcount,
+            "tombstones_removed": tombstones_removed,
+            "finished_at": datetime.now(timezone.utc).isoformat()
+        }
+        return self.last_run
+
+    async def daily_counts(
+        self,
+        db: AsyncSession,
+        days: int = 30,
+        machine_id: Optional[int] = None,
+        alert_type: Optional[AlertType] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Alerts raised per UTC day, type and severity: compacted days from
+        alert_daily_counts plus the alerts still in the hot table, summed in
+        one GROUP BY
+        """
+        start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days - 1)
+
+        hot = (
+            select(_utc_day(Alert.created_at).label("day"), Alert.alert_type, Alert.severity, literal_column("1").label("alert_count"))
+            .where(Alert.created_at >= start)
+        )
+        cold = (
+            select(AlertDailyCount.day, AlertDailyCount.alert_type, AlertDailyCount.severity, AlertDailyCount.alert_count)
+            .where(AlertDailyCount.day >= start.date())
+        )
+        if machine_id is not None:
+            hot = hot.where(Alert.machine_id == machine_id)
+            cold = cold.where(AlertDailyCount.machine_id == machine_id)
+        if alert_type is not None:
+            hot = hot.where(Alert.alert_type == alert_type)
+            cold = cold.where(AlertDailyCount.alert_type == alert_type)
+
+        combined = union_all(hot, cold).subquery()
+        result = await db.execute(
+            select(combined.c.day, combined.c.alert_type, combined.c.severity, func.sum(combined.c.alert_count))
+            .group_by(combined.c.day, combined.c.alert_type, combined.c.severity)
+            .order_by(combined.c.day)
+        )
+        return [
+            {
+                "day": day.isoformat(),
+                "alert_type": getattr(row_type, "value", row_type),
+                "severity": getattr(severity, "value", severity),
+                "count": int(count)
+            }
+            for day, row_type, severity, count in result.all()
+        ]
+
+    async def run(self):
+        """Periodic retention loop"""
+        self.running = True
+        while self.running:
+            try:
+                await self.compact()
+            except Exception as e:
+                logger.error(f"Alert retention failed: {e}", exc_info=True)
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def stop(self):
+        self.running = False
+        self._wakeup.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "retention_days": self.retention_days,
+            "batch_size": self.batch_size,
+            "alerts_compacted": self.alerts_compacted,
+            "last_run": self.last_run
+        }
+
+
+# Run from the application lifespan
+alert_retention = AlertRetention()
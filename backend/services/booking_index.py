@@ -0,0 +1,348 @@
+"""
+Booking Index
+In-memory interval trees of scheduled and in-progress maintenance, per
+technician and per machine, for conflict checks and next-free-slot search
+"""
+
+import asyncio
+import os
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select, inspect, or_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.events import on_commit
+from models.maintenance_log import MaintenanceLog, MaintenanceStatus
+
+DEFAULT_JOB_HOURS = float(os.getenv("MAINTENANCE_DEFAULT_JOB_HOURS", "4"))
+
+OPEN_STATUSES = (MaintenanceStatus.SCHEDULED, MaintenanceStatus.IN_PROGRESS)
+
+# Advisory lock namespace: shared by single bookings, exclusive for fleet plans
+BOOKING_LOCK = "maintenance_booking"
+
+def _advisory_lock(key: str, shared: bool = False):
+    lock = func.pg_advisory_xact_lock_shared if shared else func.pg_advisory_xact_lock
+    return select(lock(func.hashtext(key)))
+
+class _Node:
+    __slots__ = ("start", "log_id", "end", "max_end", "priority", "left", "right")
+
+    def __init__(self, start: datetime, log_id: int, end: datetime):
+        self.start = start
+        self.log_id = log_id
+        self.end = end
+        self.max_end = end
+        self.priority = random.random()
+        self.left: Optional["_Node"] = None
+        self.right: Optional["_Node"] = None
+
+    @property
+    def key(self) -> Tuple[datetime, int]:
+        return self.start, self.log_id
+
+    def update(self):
+        self.max_end = self.end
+        for child in (self.left, self.right):
+            if child is not None and child.max_end > self.max_end:
+                self.max_end = child.max_end
+
+class IntervalTree:
+    """
+    Treap ordered by (start, log id), each node carrying the latest end in
+    its subtree. Insert and remove are O(log n) expected; finding the
+    intervals that overlap a range is O(log n + k), because subtrees whose
+    latest end is before the range, or whose starts are all after it, are
+    skipped whole.
+    """
+
+    def __init__(self):
+        self._root: Optional[_Node] = None
+        self.size = 0
+
+    def insert(self, start: datetime, end: datetime, log_id: int):
+        self._root = self._insert(self._root, _Node(start, log_id, end))
+        self.size += 1
+
+    def remove(self, start: datetime, log_id: int):
+        self._root, removed = self._remove(self._root, (start, log_id))
+        if removed:
+            self.size -= 1
+
+    def log_ids(self) -> List[int]:
+        ids, stack = [], [self._root] if self._root else []
+        while stack:
+            node = stack.pop()
+            ids.append(node.log_id)
+            stack.extend(child for child in (node.left, node.right) if child is not None)
+        return ids
+
+    def overlapping(self, start: datetime, end: datetime) -> Iterator[Tuple[datetime, datetime, int]]:
+        """Intervals [s, e) with s < end and e > start, in start order"""
+        stack: List[Tuple[_Node, bool]] = [(self._root, False)] if self._root else []
+        while stack:
+            node, expanded = stack.pop()
+            if expanded:
+                if node.start < end and node.end > start:
+                    yield node.start, node.end, node.log_id
+                continue
+            if node.max_end <= start:
+                continue
+            if node.right is not None and node.start < end:
+                stack.append((node.right, False))
+            stack.append((node, True))
+            if node.left is not None:
+                stack.append((node.left, False))
+
+    def _insert(self, root: Optional[_Node], node: _Node) -> _Node:
+        if root is None:
+            return node
+        if node.key < root.key:
+            root.left = self._insert(root.left, node)
+            if root.left.priority > root.priority:
+                root = self._rotate_right(root)
+        else:
+            root.right = self._insert(root.right, node)
+            if root.right.priority > root.priority:
+                root = self._rotate_left(root)
+        root.update()
+        return root
+
+    def _remove(self, root: Optional[_Node], key: Tuple[datetime, int]) -> Tuple[Optional[_Node], bool]:
+        if root is None:
+            return None, False
+        if key < root.key:
+            root.left, removed = self._remove(root.left, key)
+        elif key > root.key:
+            root.right, removed = self._remove(root.right, key)
+        else:
+            return self._merge(root.left, root.right), True
+        root.update()
+        return root, removed
+
+    def _merge(self, left: Optional[_Node], right: Optional[_Node]) -> Optional[_Node]:
+        if left is None or right is None:
+            return left or right
+        if left.priority > right.priority:
+            left.right = self._merge(left.right, right)
+            left.update()
+            return left
+        right.left = self._merge(left, right.left)
+        right.update()
+        return right
+
+    @staticmethod
+    def _rotate_right(node: _Node) -> _Node:
+        pivot = node.left
+        node.left, pivot.right = pivot.right, node
+        node.update()
+        pivot.update()
+        return pivot
+
+    @staticmethod
+    def _rotate_left(node: _Node) -> _Node:
+        pivot = node.right
+        node.right, pivot.left = pivot.left, node
+        node.update()
+        pivot.update()
+        return pivot
+
+Booking = Tuple[Optional[str], int, datetime, datetime]  # technician, machine pk, start, end
+
+class BookingIndex:
+    """
+    One interval tree per technician and per machine, built once from the
+    open maintenance logs and then kept current from committed log writes
+    (ORM changes and the optimizer's bulk insert), so a conflict check never
+    scans maintenance_logs however long the history grows.
+    Commits made by other workers never reach this process's callbacks, so
+    writers go through lock_calendars(): transaction-scoped advisory locks on
+    the technician and machine, then a reload of just those two calendars
+    from the database before the check.
+    """
+
+    def __init__(self):
+        self._technicians: Dict[str, IntervalTree] = {}
+        self._machines: Dict[int, IntervalTree] = {}
+        self._bookings: Dict[int, Booking] = {}
+        self._built = False
+        self._version = 0
+        self._build_lock = asyncio.Lock()
+
+    def invalidate(self, rows: Optional[List[Any]] = None):
+        """Force a rebuild on the next check"""
+        self._built = False
+        self._version += 1
+
+    async def ensure_built(self, db: AsyncSession, attempts: int = 3):
+        """Load open bookings if the index was never built or was invalidated"""
+        if self._built:
+            return
+
+        async with self._build_lock:
+            for attempt in range(attempts):
+                if self._built:
+                    return
+                version = self._version
+
+                result = await db.execute(
+                    select(MaintenanceLog.id, MaintenanceLog.technician, MaintenanceLog.machine_id,
+                           MaintenanceLog.scheduled_date, MaintenanceLog.duration_hours)
+                    .where(MaintenanceLog.status.in_(OPEN_STATUSES))
+                )
+                rows = result.all()
+
+                # A commit that landed while loading may be missing; reload unless out of attempts
+                stale = version != self._version
+                if stale and attempt < attempts - 1:
+                    continue
+
+                # Out of attempts: serve this load, but stay unbuilt so the next read reloads
+                self._technicians, self._machines, self._bookings = {}, {}, {}
+                for log_id, technician, machine_pk, scheduled_date, duration_hours in rows:
+                    self._add(log_id, technician, machine_pk, scheduled_date, duration_hours)
+                self._built = not stale
+
+    async def lock_calendars(self, db: AsyncSession, technician: Optional[str], machine_pk: int):
+        """
+        Serialize bookings of the technician and machine across workers until
+        the caller's transaction ends, and bring both calendars up to date
+        """
+        # Always technician before machine, so two bookers cannot deadlock
+        await db.execute(_advisory_lock(BOOKING_LOCK, shared=True))
+        if technician:
+            await db.execute(_advisory_lock(f"{BOOKING_LOCK}:technician:{technician}"))
+        await db.execute(_advisory_lock(f"{BOOKING_LOCK}:machine:{machine_pk}"))
+
+        if not self._built:
+            await self.ensure_built(db)
+            return
+
+        condition = MaintenanceLog.machine_id == machine_pk
+        if technician:
+            condition = or_(condition, MaintenanceLog.technician == technician)
+        result = await db.execute(
+            select(MaintenanceLog.id, MaintenanceLog.technician, MaintenanceLog.machine_id,
+                   MaintenanceLog.scheduled_date, MaintenanceLog.duration_hours)
+            .where(MaintenanceLog.status.in_(OPEN_STATUSES), condition)
+        )
+        for _, tree in self._trees(technician, machine_pk):
+            for log_id in tree.log_ids():
+                self._remove(log_id)
+        for log_id, row_technician, row_machine_pk, scheduled_date, duration_hours in result.all():
+            self._remove(log_id)
+            self._add(log_id, row_technician, row_machine_pk, scheduled_date, duration_hours)
+
+    async def lock_all_calendars(self, db: AsyncSession):
+        """Exclusive booking lock for fleet-wide planning, held until the caller's transaction ends"""
+        await db.execute(_advisory_lock(BOOKING_LOCK))
+
+    def logs_changed(self, rows: List[Any]):
+        """Move, add or drop bookings of committed maintenance log writes"""
+        if not self._built:
+            self._version += 1
+            return
+
+        for row in rows:
+            if isinstance(row, dict):
+                fields, deleted = row, False
+            else:
+                state = inspect(row, raiseerr=False)
+                if state is None or state.key is None:
+                    self.invalidate()
+                    return
+                fields, deleted = {name: getattr(row, name) for name in
+                                   ("id", "technician", "machine_id", "scheduled_date", "duration_hours", "status")}, state.was_deleted
+
+            if fields.get("id") is None or "scheduled_date" not in fields:
+                self.invalidate()
+                return
+            self._remove(fields["id"])
+            if not deleted and MaintenanceStatus(fields.get("status") or MaintenanceStatus.SCHEDULED) in OPEN_STATUSES:
+                self._add(fields["id"], fields.get("technician"), fields["machine_id"],
+                          fields["scheduled_date"], fields.get("duration_hours"))
+
+    def conflicts(
+        self,
+        start: datetime,
+        end: datetime,
+        technician: Optional[str] = None,
+        machine_pk: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Open bookings of the technician or machine that overlap [start, end)"""
+        start, end = _utc(start), _utc(end)
+        found = []
+        for kind, tree in self._trees(technician, machine_pk):
+            for booked_start, booked_end, log_id in tree.overlapping(start, end):
+                found.append({
+                    "conflict_with": kind,
+                    "maintenance_log_id": log_id,
+                    "technician": self._bookings[log_id][0],
+                    "start": booked_start,
+                    "end": booked_end
+                })
+        return found
+
+    def next_free_slot(
+        self,
+        start: datetime,
+        duration: timedelta,
+        technician: Optional[str] = None,
+        machine_pk: Optional[int] = None
+    ) -> datetime:
+        """Earliest start at or after start when both calendars are free for duration"""
+        start = _utc(start)
+        trees = [tree for _, tree in self._trees(technician, machine_pk)]
+        while True:
+            blocking_end = max(
+                (booked_end for tree in trees for _, booked_end, _ in tree.overlapping(start, start + duration)),
+                default=None
+            )
+            if blocking_end is None:
+                return start
+            start = blocking_end
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "built": self._built,
+            "open_bookings": len(self._bookings),
+            "technicians": len(self._technicians),
+            "machines": len(self._machines)
+        }
+
+    def _trees(self, technician: Optional[str], machine_pk: Optional[int]) -> List[Tuple[str, IntervalTree]]:
+        trees = []
+        if technician and technician in self._technicians:
+            trees.append(("technician", self._technicians[technician]))
+        if machine_pk is not None and machine_pk in self._machines:
+            trees.append(("machine", self._machines[machine_pk]))
+        return trees
+
+    def _add(self, log_id: int, technician: Optional[str], machine_pk: int,
+             scheduled_date: datetime, duration_hours: Optional[float]):
+        start = _utc(scheduled_date)
+        end = start + timedelta(hours=duration_hours or DEFAULT_JOB_HOURS)
+        self._bookings[log_id] = (technician, machine_pk, start, end)
+        self._machines.setdefault(machine_pk, IntervalTree()).insert(start, end, log_id)
+        if technician:
+            self._technicians.setdefault(technician, IntervalTree()).insert(start, end, log_id)
+
+    def _remove(self, log_id: int):
+        booking = self._bookings.pop(log_id, None)
+        if booking is None:
+            return
+        technician, machine_pk, start, _ = booking
+        self._machines[machine_pk].remove(start, log_id)
+        if technician:
+            self._technicians[technician].remove(start, log_id)
+
+def _utc(moment: datetime) -> datetime:
+    return moment.replace(tzinfo=timezone.utc) if moment.tzinfo is None else moment
+
+
+# Shared index, kept current on committed maintenance log writes
+booking_index = BookingIndex()
+
+on_commit("maintenance_logs")(booking_index.logs_changed)
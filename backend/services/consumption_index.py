@@ -0,0 +1,302 @@
+"""
+Consumption Index
+Parses spare parts usage from maintenance logs once, when a log is completed,
+and keeps per-part daily and weekly consumption aggregates
+"""
+
+import json
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from sqlalchemy import select, update, delete, func, exists, any_, bindparam, Integer
+from sqlalchemy.dialects.postgresql import insert as pg_insert, ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.part_consumption import PartConsumption, ConsumptionPeriod
+from models.maintenance_log import MaintenanceLog, MaintenanceStatus
+from models.spare_part import SparePart
+from models.stock_movement import StockMovement, MovementType
+from database.events import mark_changed
+
+# Window used for the daily consumption rate
+RATE_WINDOW_DAYS = 28
+
+# Completed logs processed per batch during a rebuild
+REBUILD_BATCH_SIZE = 1000
+
+# Aggregate rows per upsert statement (5 bind parameters each)
+UPSERT_CHUNK_SIZE = 5000
+
+PartRef = Union[int, str]
+
+def parse_parts_used(raw: Any) -> List[Tuple[PartRef, float]]:
+    """
+    Parse MaintenanceLog.spare_parts_used into (part reference, quantity) pairs
+    Accepts a list (JSONB or legacy JSON text) of {"part_id"|"part_number", "quantity"} objects,
+    a list of bare ids/part numbers (quantity 1) or a {part_number: quantity} map
+    """
+    if not raw:
+        return []
+    try:
+        data = json.loads(raw) if isinstance(raw, str) else raw
+    except ValueError:
+        return []
+
+    if isinstance(data, dict):
+        data = [{"part_number": key, "quantity": value} for key, value in data.items()]
+    if not isinstance(data, list):
+        return []
+
+    usage = []
+    for item in data:
+        if isinstance(item, (int, str)):
+            usage.append((item, 1.0))
+        elif isinstance(item, dict):
+            ref = item.get("part_id", item.get("spare_part_id", item.get("part_number")))
+            try:
+                quantity = float(item.get("quantity", item.get("qty", 1)))
+            except (TypeError, ValueError):
+                continue
+            if ref is not None and quantity > 0:
+                usage.append((ref, quantity))
+    return usage
+
+def _week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+class ConsumptionIndex:
+    """
+    Maintains the part_consumption table
+    Each completed log is parsed exactly once (tracked by consumption_indexed);
+    readers only touch the compact aggregate rows.
+    """
+
+    async def record_log(self, log: MaintenanceLog, db: AsyncSession) -> int:
+        """
+        Add a completed log's parts usage to the aggregates (caller commits)
+        Returns the number of parts whose consumption changed
+        """
+        if log.status != MaintenanceStatus.COMPLETED or log.consumption_indexed:
+            return 0
+
+        day = (log.completed_at or log.scheduled_date or datetime.utcnow()).date()
+        totals = await self._aggregate([(day, parse_parts_used(log.spare_parts_used))], db)
+        await self._add(totals, db)
+        log.consumption_indexed = True
+
+        return await self._mark_parts_dirty({part_id for part_id, _, _ in totals}, db)
+
+    async def record_usage(self, part_id: int, quantity: float, db: AsyncSession, day: Optional[date] = None):
+        """Add usage recorded outside a maintenance log, e.g. a stock consumption (caller commits)"""
+        day = day or date.today()
+        await self._add({
+            (part_id, ConsumptionPeriod.DAY, day): (quantity, 1),
+            (part_id, ConsumptionPeriod.WEEK, _week_start(day)): (quantity, 1)
+        }, db)
+
+    async def daily_rates(
+        self,
+        db: AsyncSession,
+        part_ids: Optional[Iterable[int]] = None
+    ) -> Dict[int, float]:
+        """
+        Average daily consumption over the last RATE_WINDOW_DAYS
+        Parts without any recorded usage are absent from the result. Parts
+        first used inside the window are still averaged over the whole
+        window, so a single recent use does not read as a daily rate.
+        """
+        since = date.today() - timedelta(days=RATE_WINDOW_DAYS - 1)
+        daily = (PartConsumption.spare_part_id == SparePart.id, PartConsumption.period == ConsumptionPeriod.DAY)
+
+        # Both are (part, period, period_start) primary key lookups: a range scan
+        # over the window and a probe for any earlier usage, never the full history
+        window_quantity = (
+            select(func.sum(PartConsumption.quantity))
+            .where(*daily, PartConsumption.period_start >= since)
+            .scalar_subquery()
+        )
+        query = select(SparePart.id, window_quantity).where(exists().where(*daily))
+        if part_ids is not None:
+            # One array parameter, however many parts a risk refresh passes in
+            query = query.where(SparePart.id == any_(
+                bindparam("part_ids", list(part_ids), type_=ARRAY(Integer))
+            ))
+
+        result = await db.execute(query)
+        return {
+            part_id: float(window_quantity or 0.0) / RATE_WINDOW_DAYS
+            for part_id, window_quantity in result.all()
+        }
+
+    async def weekly_history(
+        self,
+        part_id: int,
+        db: AsyncSession,
+        weeks: int = 12
+    ) -> List[Dict[str, Any]]:
+        """Weekly consumption buckets for one part, oldest first"""
+        since = _week_start(date.today()) - timedelta(weeks=weeks - 1)
+        result = await db.execute(
+            select(PartConsumption)
+            .where(
+                PartConsumption.spare_part_id == part_id,
+                PartConsumption.period == ConsumptionPeriod.WEEK,
+                PartConsumption.period_start >= since
+            )
+            .order_by(PartConsumption.period_start)
+        )
+        return [
+            {"week_start": row.period_start.isoformat(), "quantity": row.quantity, "log_count": row.log_count}
+            for row in result.scalars().all()
+        ]
+
+    async def rebuild(self, db: AsyncSession) -> Dict[str, int]:
+        """Recompute all aggregates from the completed maintenance history and the stock ledger"""
+        await db.execute(delete(PartConsumption))
+        await db.execute(
+            update(MaintenanceLog)
+            .values(consumption_indexed=False, updated_at=MaintenanceLog.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+
+        logs_indexed = 0
+        parts = set()
+        last_id = 0
+        while True:
+            result = await db.execute(
+                select(MaintenanceLog.id, MaintenanceLog.completed_at,
+                       MaintenanceLog.scheduled_date, MaintenanceLog.spare_parts_used)
+                .where(
+                    MaintenanceLog.status == MaintenanceStatus.COMPLETED,
+                    MaintenanceLog.id > last_id
+                )
+                .order_by(MaintenanceLog.id)
+                .limit(REBUILD_BATCH_SIZE)
+            )
+            batch = result.all()
+            if not batch:
+                break
+
+            totals = await self._aggregate(
+                [((completed_at or scheduled_date).date(), parse_parts_used(raw))
+                 for _, completed_at, scheduled_date, raw in batch],
+                db
+            )
+            await self._add(totals, db)
+            await db.execute(
+                update(MaintenanceLog)
+                .where(MaintenanceLog.id.in_([row[0] for row in batch]))
+                .values(consumption_indexed=True, updated_at=MaintenanceLog.updated_at)
+                .execution_options(synchronize_session=False)
+            )
+
+            logs_indexed += len(batch)
+            parts.update(part_id for part_id, _, _ in totals)
+            last_id = batch[-1][0]
+
+        # Stock consumed through the ledger without a maintenance log
+        used_on = func.date(StockMovement.created_at)
+        result = await db.execute(
+            select(StockMovement.spare_part_id, used_on, func.sum(StockMovement.quantity), func.count())
+            .where(
+                StockMovement.movement_type == MovementType.CONSUME,
+                StockMovement.maintenance_log_id.is_(None)
+            )
+            .group_by(StockMovement.spare_part_id, used_on)
+        )
+        ledger_totals: Dict[Tuple[int, ConsumptionPeriod, date], List[float]] = defaultdict(lambda: [0.0, 0])
+        for part_id, day, quantity, count in result.all():
+            for key in ((part_id, ConsumptionPeriod.DAY, day), (part_id, ConsumptionPeriod.WEEK, _week_start(day))):
+                ledger_totals[key][0] += float(quantity)
+                ledger_totals[key][1] += count
+        await self._add({key: (quantity, count) for key, (quantity, count) in ledger_totals.items()}, db)
+        parts.update(part_id for part_id, _, _ in ledger_totals)
+
+        await self._mark_parts_dirty(parts, db)
+        await db.commit()
+
+        return {"logs_indexed": logs_indexed, "parts": len(parts)}
+
+    async def _aggregate(
+        self,
+        usage_by_day: List[Tuple[date, List[Tuple[PartRef, float]]]],
+        db: AsyncSession
+    ) -> Dict[Tuple[int, ConsumptionPeriod, date], Tuple[float, int]]:
+        """Resolve part references and sum quantities per (part, period, bucket)"""
+        refs = {ref for _, usage in usage_by_day for ref, _ in usage}
+        part_ids = await self._resolve_part_ids(refs, db)
+
+        totals: Dict[Tuple[int, ConsumptionPeriod, date], List[float]] = defaultdict(lambda: [0.0, 0])
+        for day, usage in usage_by_day:
+            for ref, quantity in usage:
+                part_id = part_ids.get(ref)
+                if part_id is None:
+                    continue
+                for key in ((part_id, ConsumptionPeriod.DAY, day), (part_id, ConsumptionPeriod.WEEK, _week_start(day))):
+                    totals[key][0] += quantity
+                    totals[key][1] += 1
+        return {key: (quantity, count) for key, (quantity, count) in totals.items()}
+
+    async def _resolve_part_ids(self, refs: Iterable[PartRef], db: AsyncSession) -> Dict[PartRef, int]:
+        """Map ids and part numbers to spare_parts.id with one query"""
+        refs = set(refs)
+        ids = {ref for ref in refs if isinstance(ref, int)}
+        numbers = {ref for ref in refs if isinstance(ref, str)}
+        if not refs:
+            return {}
+
+        result = await db.execute(
+            select(SparePart.id, SparePart.part_number)
+            .where(SparePart.id.in_(ids) | SparePart.part_number.in_(numbers))
+        )
+        resolved = {}
+        for part_id, part_number in result.all():
+            if part_id in ids:
+                resolved[part_id] = part_id
+            if part_number in numbers:
+                resolved[part_number] = part_id
+        return resolved
+
+    async def _add(
+        self,
+        totals: Dict[Tuple[int, ConsumptionPeriod, date], Tuple[float, int]],
+        db: AsyncSession
+    ):
+        """Increment aggregate rows with one upsert (chunked for large rebuilds)"""
+        if not totals:
+            return
+
+        rows = [
+            {"spare_part_id": part_id, "period": period, "period_start": start,
+             "quantity": quantity, "log_count": count}
+            for (part_id, period, start), (quantity, count) in totals.items()
+        ]
+        for chunk_start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+            stmt = pg_insert(PartConsumption).values(rows[chunk_start:chunk_start + UPSERT_CHUNK_SIZE])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[PartConsumption.spare_part_id, PartConsumption.period, PartConsumption.period_start],
+                set_={
+                    "quantity": PartConsumption.quantity + stmt.excluded.quantity,
+                    "log_count": PartConsumption.log_count + stmt.excluded.log_count,
+                    "updated_at": func.now()
+                }
+            )
+            await db.execute(stmt)
+
+    async def _mark_parts_dirty(self, part_ids: Iterable[int], db: AsyncSession) -> int:
+        """New usage changes the demand forecast, so the parts' risk must be recomputed"""
+        part_ids = list(part_ids)
+        if part_ids:
+            await db.execute(
+                update(SparePart)
+                .where(SparePart.id.in_(part_ids))
+                .values(risk_dirty=True, updated_at=SparePart.updated_at)
+                .execution_options(synchronize_session=False)
+            )
+            mark_changed(db, "spare_parts")
+        return len(part_ids)
+
+
+# Shared by the maintenance and supply chain services
+consumption_index = ConsumptionIndex()
@@ -0,0 +1,136 @@
+"""
+Delta Sync
+Opaque change cursors in commit order, so polling clients fetch only the
+rows created, changed or deleted since their last poll
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import select, delete, func, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.sync_tombstone import SyncTombstone
+
+# Cursor that starts a sync from the beginning of a table
+INITIAL_CURSOR = "0"
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+
+# Changes at the same sequence are listed rows first, then deletes
+ROW, DELETED = 0, 1
+
+Position = Tuple[int, int, int]  # change_seq, ROW or DELETED, row key
+
+def encode_cursor(position: Position) -> str:
+    """Position after an item: change sequence, item kind and row key"""
+    return ".".join(str(part) for part in position)
+
+def decode_cursor(cursor: str) -> Position:
+    """Inverse of encode_cursor; raises 400 for malformed cursors"""
+    if cursor == INITIAL_CURSOR:
+        return 0, ROW, 0
+    try:
+        seq, kind, key = (int(part) for part in cursor.split("."))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
+    if kind not in (ROW, DELETED):
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
+    return seq, kind, key
+
+class DeltaSync:
+    """
+    Every synced row carries change_seq, the id of the transaction that last
+    wrote it (set by the sync_stamp trigger), and deletes leave a tombstone
+    with the deleting transaction's id. A poll only returns changes of
+    transactions below the snapshot xmin, i.e. older than every transaction
+    still running, so any change committed later has a higher sequence than
+    the cursor and cannot land behind it however long its transaction ran.
+    Rows and tombstones are read as (change_seq, key) range scans on
+    composite indexes, so a poll costs the number of changes rather than the
+    table size.
+    Tombstones are kept for DELTA_SYNC_TOMBSTONE_DAYS; a client that has not
+    polled for longer should restart from cursor 0 and replace its copy.
+    """
+
+    def __init__(self, tombstone_days: Optional[float] = None):
+        if tombstone_days is None:
+            tombstone_days = float(os.getenv("DELTA_SYNC_TOMBSTONE_DAYS", "30"))
+        if tombstone_days < 0:
+            raise ValueError(f"tombstone_days (DELTA_SYNC_TOMBSTONE_DAYS) must not be negative, got {tombstone_days}")
+        self.tombstone_retention = timedelta(days=tombstone_days)
+
+    async def fetch(
+        self,
+        db: AsyncSession,
+        query,
+        model,
+        since: str,
+        limit: int = DEFAULT_PAGE_SIZE
+    ) -> Tuple[List[Any], List[int], str, bool]:
+        """
+        One page of a query's changes after the cursor
+        Returns the changed rows (as the query's own column tuples), the keys
+        of deleted rows, the cursor to send next time and whether more
+        changes are already waiting.
+        """
+        seq, kind, key = decode_cursor(since)
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        # Every transaction below the horizon has finished, and its changes are visible to both reads
+        horizon = await db.scalar(select(func.txid_snapshot_xmin(func.txid_current_snapshot())))
+
+        after = tuple_(model.change_seq, model.id) > tuple_(seq, key) if kind == ROW else model.change_seq > seq
+        page = (
+            query
+            .add_columns(model.change_seq, model.id)
+            .where(after, model.change_seq < horizon)
+            .order_by(None)
+            .order_by(model.change_seq, model.id)
+            .limit(limit + 1)
+        )
+        rows = (await db.execute(page)).all()
+
+        tombstone = SyncTombstone
+        after = (
+            tombstone.change_seq >= seq if kind == ROW
+            else tuple_(tombstone.change_seq, tombstone.row_key) > tuple_(seq, key)
+        )
+        result = await db.execute(
+            select(tombstone.change_seq, tombstone.row_key)
+            .where(tombstone.table_name == model.__tablename__, after, tombstone.change_seq < horizon)
+            .order_by(tombstone.change_seq, tombstone.row_key)
+            .limit(limit + 1)
+        )
+        deletes = result.all()
+
+        # Merge both streams in (sequence, kind, key) order and keep the first page
+        changes = sorted(
+            [((row[-2], ROW, row[-1]), row[:-2]) for row in rows]
+            + [((change_seq, DELETED, row_key), row_key) for change_seq, row_key in deletes],
+            key=lambda change: change[0]
+        )
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+
+        cursor = encode_cursor(changes[-1][0]) if changes else since
+        changed = [item for (_, item_kind, _), item in changes if item_kind == ROW]
+        deleted = [item for (_, item_kind, _), item in changes if item_kind == DELETED]
+        return changed, deleted, cursor, has_more
+
+    async def prune_tombstones(self, db: AsyncSession) -> int:
+        """Drop tombstones older than the retention (caller commits)"""
+        cutoff = datetime.now(timezone.utc) - self.tombstone_retention
+        result = await db.execute(delete(SyncTombstone).where(SyncTombstone.deleted_at < cutoff))
+        return result.rowcount
+
+def delta_response(items: List[Any], deleted: List[int], cursor: str, has_more: bool) -> dict:
+    """Body shared by every listing route when called with ?since="""
+    return {"items": items, "deleted": deleted, "cursor": cursor, "has_more": has_more}
+
+
+# Shared by the machine, alert, risk and SOP listing routes
+delta_sync = DeltaSync()
@@ -0,0 +1,207 @@
+"""
+Event Hub
+In-process pub/sub for alert and machine status events, streamed to
+clients as Server-Sent Events
+"""
+
+import asyncio
+import json
+import logging
+import os
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from database.events import on_commit, mark_changed
+from models.alert import Alert
+from models.machine import Machine
+
+logger = logging.getLogger(__name__)
+
+ALERTS = "alerts"
+MACHINES = "machines"
+
+# Pseudo tables for mark_changed(): events are published only once their transaction commits
+ALERT_EVENTS = "alert_events"
+MACHINE_EVENTS = "machine_events"
+
+@dataclass(eq=False)
+class Subscriber:
+    """One connected client: a topic, field filters and a bounded queue"""
+    topic: str
+    filters: Dict[str, Set[str]]
+    queue: asyncio.Queue
+    dropped: bool = False
+
+    def matches(self, payload: Dict[str, Any]) -> bool:
+        return all(str(payload.get(name)) in allowed for name, allowed in self.filters.items())
+
+class EventHub:
+    """
+    Fan-out to per-client queues of bounded size
+    publish() never blocks: a client whose queue is full is dropped (its
+    stream ends and the browser's EventSource reconnects), so one slow
+    consumer cannot hold up the others or grow memory.
+    """
+
+    def __init__(self, queue_size: Optional[int] = None, heartbeat_seconds: Optional[float] = None):
+        self.queue_size = queue_size if queue_size is not None else int(os.getenv("SSE_QUEUE_SIZE", "100"))
+        self.heartbeat_seconds = heartbeat_seconds if heartbeat_seconds is not None else float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+        # asyncio.Queue(maxsize=0) is unbounded, which would disable slow-client backpressure
+        if self.queue_size < 1:
+            raise ValueError(f"queue_size (SSE_QUEUE_SIZE) must be at least 1, got {self.queue_size}")
+        if self.heartbeat_seconds <= 0:
+            raise ValueError(f"heartbeat_seconds (SSE_HEARTBEAT_SECONDS) must be positive, got {self.heartbeat_seconds}")
+        self._subscribers: Dict[str, Set[Subscriber]] = {ALERTS: set(), MACHINES: set()}
+        self.published = 0
+        self.dropped_clients = 0
+
+    def subscribe(self, topic: str, filters: Optional[Dict[str, Iterable[str]]] = None) -> Subscriber:
+        subscriber = Subscriber(
+            topic=topic,
+            filters={name: {str(v) for v in values} for name, values in (filters or {}).items() if values},
+            queue=asyncio.Queue(maxsize=self.queue_size)
+        )
+        self._subscribers[topic].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers[subscriber.topic].discard(subscriber)
+
+    def publish(self, topic: str, event_type: str, payload: Dict[str, Any]):
+        """Queue an event for every matching subscriber of the topic"""
+        self.published += 1
+        for subscriber in list(self._subscribers[topic]):
+            if not subscriber.matches(payload):
+                continue
+            try:
+                subscriber.queue.put_nowait((event_type, payload))
+            except asyncio.QueueFull:
+                self._drop(subscriber)
+
+    async def stream(self, subscriber: Subscriber, is_disconnected) -> AsyncIterator[str]:
+        """SSE frames for one subscriber, with heartbeats, until it disconnects or is dropped"""
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    item = await asyncio.wait_for(subscriber.queue.get(), timeout=self.heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    if await is_disconnected():
+                        return
+                    yield ": keepalive\n\n"
+                    continue
+
+                if item is None:
+                    # Dropped for falling behind
+                    return
+                event_type, payload = item
+                yield f"event: {event_type}\ndata: {json.dumps(payload, default=str)}\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": {topic: len(subscribers) for topic, subscribers in self._subscribers.items()},
+            "published": self.published,
+            "dropped_clients": self.dropped_clients
+        }
+
+    def _drop(self, subscriber: Subscriber):
+        """Disconnect a subscriber whose queue is full; the sentinel ends its stream"""
+        self.unsubscribe(subscriber)
+        subscriber.dropped = True
+        self.dropped_clients += 1
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+        logger.warning(f"Dropped slow {subscriber.topic} stream client")
+
+def alert_event_payload(alert: Any) -> Dict[str, Any]:
+    """Event body for an Alert object or an inserted alert row"""
+    get = alert.get if isinstance(alert, dict) else lambda name: getattr(alert, name, None)
+    return {
+        "id": get("id"),
+        "machine_id": get("machine_id"),
+        "incident_id": get("incident_id"),
+        "alert_type": _value(get("alert_type")),
+        "severity": _value(get("severity")),
+        "status": _value(get("status")),
+        "title": get("title"),
+        "message": get("message"),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+def alert_bulk_status_events(rows: Iterable[Any]) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Events for a bulk status change: one per machine, type, severity and
+    previous status, listing the alert ids, so subscriber filters still apply
+    and a change to thousands of alerts does not overflow client queues
+    """
+    groups = defaultdict(list)
+    for row in rows:
+        key = (row.machine_id, _value(row.alert_type), _value(row.severity), _value(row.previous_status), _value(row.status))
+        groups[key].append(row.id)
+
+    timestamp = datetime.utcnow().isoformat()
+    return [
+        ("alert_status_bulk", {
+            "machine_id": machine_id,
+            "alert_type": alert_type,
+            "severity": severity,
+            "previous_status": previous_status,
+            "status": status,
+            "alert_ids": alert_ids,
+            "count": len(alert_ids),
+            "timestamp": timestamp
+        })
+        for (machine_id, alert_type, severity, previous_status, status), alert_ids in groups.items()
+    ]
+
+def _value(value: Any) -> Any:
+    return getattr(value, "value", value)
+
+
+# Shared hub; streams are served by the alert and machine routes
+event_hub = EventHub()
+
+@event.listens_for(Session, "after_flush")
+def _collect_transitions(session, flush_context):
+    """Record alert creation and alert/machine status changes while attribute history is still available"""
+    for obj in session.new:
+        if isinstance(obj, Alert):
+            mark_changed(session, ALERT_EVENTS, [("alert_created", alert_event_payload(obj))])
+
+    for obj in session.dirty:
+        if not isinstance(obj, (Alert, Machine)):
+            continue
+        history = inspect(obj).attrs.status.history
+        if not history.has_changes():
+            continue
+        previous = _value(history.deleted[0]) if history.deleted else None
+        if isinstance(obj, Alert):
+            payload = {**alert_event_payload(obj), "previous_status": previous}
+            mark_changed(session, ALERT_EVENTS, [("alert_status", payload)])
+        else:
+            mark_changed(session, MACHINE_EVENTS, [("machine_status", {
+                "machine_id": obj.machine_id,
+                "status": _value(obj.status),
+                "previous_status": previous,
+                "health_score": obj.health_score,
+                "fault_probability": obj.fault_probability,
+                "timestamp": datetime.utcnow().isoformat()
+            })])
+
+@on_commit(ALERT_EVENTS)
+def _publish_alert_events(rows: List[Any]):
+    for event_type, payload in rows:
+        event_hub.publish(ALERTS, event_type, payload)
+
+@on_commit(MACHINE_EVENTS)
+def _publish_machine_events(rows: List[Any]):
+    for event_type, payload in rows:
+        event_hub.publish(MACHINES, event_type, payload)
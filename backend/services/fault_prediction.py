@@ -10,6 +10,31 @@ from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
 from datetime import datetime, timedelta
 import json
+import re
+
+def failure_window(fault_probability: float) -> Optional[str]:
+    """Expected time to failure band for a fault probability (0-100)"""
+    if fault_probability < 30:
+        return None
+    elif fault_probability < 50:
+        return "1-2 weeks"
+    elif fault_probability < 70:
+        return "3-7 days"
+    elif fault_probability < 85:
+        return "24-48 hours"
+    else:
+        return "0-24 hours"
+
+_WINDOW_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*-\s*(\d+(?:\.\d+)?)\s*(hour|day|week)")
+_UNIT_HOURS = {"hour": 1, "day": 24, "week": 168}
+
+def failure_window_hours(window: Optional[str]) -> Optional[tuple]:
+    """Parse a window such as "24-48 hours" into (from_hours, to_hours)"""
+    match = _WINDOW_PATTERN.search(window or "")
+    if not match:
+        return None
+    low, high, unit = match.groups()
+    return float(low) * _UNIT_HOURS[unit], float(high) * _UNIT_HOURS[unit]
 
 class FaultPredictionService:
     """
@@ -17,6 +42,10 @@ class FaultPredictionService:
     Combines multiple ML approaches for robust anomaly detection
     """
     
+    # Bump whenever feature extraction or scoring changes so cached
+    # predictions from the previous model are not served
+    MODEL_VERSION = "1.0.0"
+    
     def __init__(self):
         self.isolation_forest = IsolationForest(
             contamination=0.1,  # Expect 10% anomalies
@@ -275,16 +304,7 @@ class FaultPredictionService:
         sensor_data: List[Dict[str, float]]
     ) -> Optional[str]:
         """Predict time window for potential failure"""
-        if fault_probability < 30:
-            return None
-        elif fault_probability < 50:
-            return "1-2 weeks"
-        elif fault_probability < 70:
-            return "3-7 days"
-        elif fault_probability < 85:
-            return "24-48 hours"
-        else:
-            return "0-24 hours"
+        return failure_window(fault_probability)
     
     def _determine_alert_level(
         self,
@@ -0,0 +1,185 @@
+"""
+Supplier Impact Graph
+In-memory supplier -> spare part -> machine adjacency for disruption analysis
+"""
+
+import asyncio
+import json
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.events import on_commit
+from models.machine import Machine
+from models.spare_part import SparePart
+
+def parse_compatible_machines(raw: Any) -> List[Any]:
+    """SparePart.compatible_machines as a list of machine ids (string codes or integer keys)"""
+    if not raw:
+        return []
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except ValueError:
+            # Plain comma-separated list
+            return [item.strip() for item in raw.split(",") if item.strip()]
+    return list(raw) if isinstance(raw, (list, tuple)) else [raw]
+
+def _part_inputs(part_number: str, name: str, supplier_id: Optional[int], compatible: Any) -> Tuple[Any, ...]:
+    return part_number, name, supplier_id, tuple(parse_compatible_machines(compatible))
+
+class SupplierImpactGraph:
+    """
+    Bipartite adjacency built once from primary_supplier_id and compatible_machines
+    Invalidated by committed part writes that add or remove parts or change
+    those inputs, and by machine writes that change membership or cost;
+    quantity, status and risk bookkeeping writes leave it alone. Rebuilt
+    lazily on the next query, so lookups never parse part JSON.
+    """
+
+    def __init__(self):
+        self._supplier_parts: Dict[int, Set[int]] = {}
+        self._part_machines: Dict[int, Set[int]] = {}
+        self._parts: Dict[int, Dict[str, Any]] = {}
+        self._part_inputs: Dict[int, Tuple[Any, ...]] = {}  # fields the adjacency was built from
+        self._machines: Dict[int, Dict[str, Any]] = {}
+        self._version = 0
+        self._built_version = -1
+        self._lock = asyncio.Lock()
+
+    @property
+    def is_current(self) -> bool:
+        return self._built_version == self._version
+
+    def invalidate(self, rows: Optional[List[Any]] = None):
+        """Drop the adjacency; the next query rebuilds it"""
+        self._version += 1
+
+    async def ensure_built(self, db: AsyncSession):
+        """Rebuild the adjacency if a write invalidated it"""
+        if self.is_current:
+            return
+
+        async with self._lock:
+            if self.is_current:
+                return
+            version = self._version
+
+            result = await db.execute(
+                select(Machine.id, Machine.machine_id, Machine.name, Machine.downtime_cost_per_hour)
+            )
+            machines = {
+                pk: {"id": pk, "machine_id": code, "name": name, "downtime_cost_per_hour": cost or 0.0}
+                for pk, code, name, cost in result.all()
+            }
+            pk_by_code = {info["machine_id"]: pk for pk, info in machines.items()}
+
+            result = await db.execute(
+                select(SparePart.id, SparePart.part_number, SparePart.name,
+                       SparePart.primary_supplier_id, SparePart.compatible_machines)
+            )
+            supplier_parts: Dict[int, Set[int]] = defaultdict(set)
+            part_machines: Dict[int, Set[int]] = {}
+            parts = {}
+            part_inputs = {}
+            for part_id, part_number, name, supplier_id, compatible in result.all():
+                parts[part_id] = {"id": part_id, "part_number": part_number, "name": name}
+                part_inputs[part_id] = _part_inputs(part_number, name, supplier_id, compatible)
+                if supplier_id is not None:
+                    supplier_parts[supplier_id].add(part_id)
+
+                linked = set()
+                for ref in parse_compatible_machines(compatible):
+                    pk = ref if isinstance(ref, int) and ref in machines else pk_by_code.get(str(ref))
+                    if pk is not None:
+                        linked.add(pk)
+                part_machines[part_id] = linked
+
+            self._machines = machines
+            self._parts = parts
+            self._part_inputs = part_inputs
+            self._supplier_parts = dict(supplier_parts)
+            self._part_machines = part_machines
+            self._built_version = version
+
+    def parts_changed(self, rows: List[Any]):
+        """Part writes only matter if they add/remove parts or change supplier, machines or labels"""
+        for part in rows:
+            if not isinstance(part, SparePart):
+                # Core statement rows: the change is unknown
+                self.invalidate()
+                return
+            known = self._part_inputs.get(part.id)
+            if (
+                known is None
+                or inspect(part).was_deleted
+                or known != _part_inputs(part.part_number, part.name, part.primary_supplier_id, part.compatible_machines)
+            ):
+                self.invalidate()
+                return
+
+    def machines_changed(self, rows: List[Any]):
+        """Machine writes only matter if they add/remove machines or change their cost"""
+        for machine in rows:
+            known = self._machines.get(getattr(machine, "id", None))
+            if (
+                known is None
+                or inspect(machine).was_deleted
+                or known["machine_id"] != machine.machine_id
+                or known["downtime_cost_per_hour"] != (machine.downtime_cost_per_hour or 0.0)
+            ):
+                self.invalidate()
+                return
+
+    def exposure(self, supplier_ids: Iterable[int]) -> Dict[str, Any]:
+        """Parts and machines exposed if the given suppliers fail"""
+        supplier_ids = sorted(set(supplier_ids))
+
+        exposed_parts: Set[int] = set()
+        for supplier_id in supplier_ids:
+            exposed_parts |= self._supplier_parts.get(supplier_id, set())
+
+        parts_by_machine: Dict[int, List[int]] = defaultdict(list)
+        for part_id in exposed_parts:
+            for machine_pk in self._part_machines.get(part_id, ()):
+                parts_by_machine[machine_pk].append(part_id)
+
+        machines = sorted(
+            (
+                {
+                    **self._machines[pk],
+                    "exposed_parts": [self._parts[part_id]["part_number"] for part_id in sorted(part_ids)]
+                }
+                for pk, part_ids in parts_by_machine.items()
+            ),
+            key=lambda machine: machine["downtime_cost_per_hour"],
+            reverse=True
+        )
+
+        return {
+            "supplier_ids": supplier_ids,
+            "exposed_part_count": len(exposed_parts),
+            "exposed_parts": [self._parts[part_id] for part_id in sorted(exposed_parts)],
+            "exposed_machine_count": len(machines),
+            "total_downtime_cost_per_hour": round(sum(m["downtime_cost_per_hour"] for m in machines), 2),
+            "machines": machines
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "current": self.is_current,
+            "suppliers": len(self._supplier_parts),
+            "parts": len(self._parts),
+            "machines": len(self._machines),
+            "part_machine_edges": sum(len(m) for m in self._part_machines.values())
+        }
+
+
+# Shared graph, invalidated on committed writes
+impact_graph = SupplierImpactGraph()
+
+# Supplier rows are not read: the graph keys suppliers by the parts' primary_supplier_id
+on_commit("spare_parts")(impact_graph.parts_changed)
+on_commit("machines")(impact_graph.machines_changed)
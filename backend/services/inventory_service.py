@@ -0,0 +1,132 @@
+"""
+Inventory Service
+Set-based maintenance of spare part status and stock value, and the
+aggregate queries behind the inventory check
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import select, update, func, case, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.connection import AsyncSessionLocal
+from database.events import mark_changed
+from models.spare_part import SparePart, PartStatus
+
+logger = logging.getLogger(__name__)
+
+def stock_status_expression(quantity=SparePart.current_quantity, min_quantity=SparePart.min_quantity):
+    """SQL counterpart of models.spare_part.stock_status"""
+    return case(
+        (quantity <= 0, PartStatus.OUT_OF_STOCK.name),
+        (quantity <= min_quantity, PartStatus.LOW_STOCK.name),
+        else_=PartStatus.IN_STOCK.name
+    ).cast(SparePart.status.type)
+
+def _low_stock_condition():
+    return SparePart.current_quantity <= SparePart.min_quantity
+
+class InventoryService:
+    """
+    Status and total_value are derived from quantity, minimum and unit cost.
+    ORM writes keep them current through a model listener; Core writes and
+    imported data are reconciled by one UPDATE ... CASE that only touches
+    rows whose stored values are stale, run periodically from the lifespan.
+    """
+
+    def __init__(self, interval_seconds: Optional[float] = None):
+        self.interval_seconds = interval_seconds if interval_seconds is not None else float(os.getenv("INVENTORY_REFRESH_SECONDS", "300"))
+        if self.interval_seconds <= 0:
+            raise ValueError(f"interval_seconds (INVENTORY_REFRESH_SECONDS) must be positive, got {self.interval_seconds}")
+        self._wakeup = asyncio.Event()
+        self.running = False
+        self.last_updated_rows = 0
+
+    async def refresh_stock_fields(self, db: AsyncSession, part_ids: Optional[Iterable[int]] = None) -> int:
+        """Recompute status and total_value where they are stale (caller commits)"""
+        status = stock_status_expression()
+        value = SparePart.current_quantity * SparePart.unit_cost
+
+        stmt = (
+            update(SparePart)
+            .where(or_(
+                SparePart.status.is_distinct_from(status),
+                SparePart.total_value.is_distinct_from(value)
+            ))
+            .values(
+                status=status,
+                total_value=value,
+                # Status feeds the risk score
+                risk_dirty=SparePart.risk_dirty | SparePart.status.is_distinct_from(status)
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if part_ids is not None:
+            stmt = stmt.where(SparePart.id.in_(list(part_ids)))
+
+        result = await db.execute(stmt)
+        if result.rowcount:
+            mark_changed(db, "spare_parts")
+        return result.rowcount
+
+    async def summary(self, db: AsyncSession, low_stock_only: bool = False) -> Dict[str, Any]:
+        """Inventory totals in one aggregate query"""
+        query = select(
+            func.count(),
+            func.count().filter(_low_stock_condition()),
+            func.count().filter(SparePart.current_quantity <= 0),
+            func.coalesce(func.sum(SparePart.current_quantity * SparePart.unit_cost), 0.0)
+        )
+        if low_stock_only:
+            query = query.where(_low_stock_condition())
+
+        total, low_stock, out_of_stock, value = (await db.execute(query)).one()
+        return {
+            "total_parts": total,
+            "low_stock_count": low_stock,
+            "out_of_stock_count": out_of_stock,
+            "total_inventory_value": float(value)
+        }
+
+    async def list_parts(
+        self,
+        db: AsyncSession,
+        low_stock_only: bool = False,
+        offset: int = 0,
+        limit: int = 100
+    ) -> List[SparePart]:
+        """One page of parts, ordered by id"""
+        query = select(SparePart).order_by(SparePart.id).offset(offset).limit(limit)
+        if low_stock_only:
+            query = query.where(_low_stock_condition())
+
+        result = await db.execute(query)
+        return result.scalars().all()
+
+    async def run(self):
+        """Periodic reconciliation loop"""
+        self.running = True
+        while self.running:
+            try:
+                async with AsyncSessionLocal() as db:
+                    self.last_updated_rows = await self.refresh_stock_fields(db)
+                    await db.commit()
+            except Exception as e:
+                logger.error(f"Inventory refresh failed: {e}", exc_info=True)
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def stop(self):
+        self.running = False
+        self._wakeup.set()
+
+
+# Reconciled from the application lifespan
+inventory_service = InventoryService()
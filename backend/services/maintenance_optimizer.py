@@ -0,0 +1,422 @@
+"""
+Maintenance Optimizer
+Cost-aware fleet maintenance planning: orders at-risk machines by expected
+failure cost and urgency, and assigns them to technicians and parts with
+priority queues
+"""
+
+import heapq
+import math
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, insert, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.events import mark_changed
+from models.machine import Machine
+from models.maintenance_log import MaintenanceLog, MaintenanceType, MaintenanceStatus
+from models.spare_part import SparePart
+from services.fault_prediction import failure_window, failure_window_hours
+from services.impact_graph import parse_compatible_machines
+from services.reliability_kpis import reliability_kpis
+from services.stock_ledger import stock_ledger, InsufficientStockError
+
+OPEN_LOG_STATUSES = (MaintenanceStatus.SCHEDULED, MaintenanceStatus.IN_PROGRESS)
+
+@dataclass
+class PlanSettings:
+    """Planning horizon, working hours and cost assumptions"""
+    horizon_days: float = 14
+    job_hours: float = 4.0                # planned downtime per predictive job
+    failure_downtime_hours: float = 24.0  # downtime of an unplanned failure
+    min_fault_probability: float = 30.0
+    shift_start_hour: int = 8             # UTC working hours of every technician
+    shift_end_hour: int = 16
+    lookahead: float = 2.0                # ATC urgency scaling (k)
+
+@dataclass
+class Job:
+    machine_pk: int
+    machine_code: str
+    name: str
+    fault_probability: float
+    failure_window: str
+    downtime_cost_per_hour: float
+    deadline: datetime               # expected failure: middle of the failure window
+    expected_failure_cost: float     # probability x unplanned downtime cost
+    part_candidates: List[int] = field(default_factory=list)
+
+@dataclass
+class Technician:
+    name: str
+    free_at: datetime
+    available_until: Optional[datetime] = None
+
+class MaintenanceOptimizer:
+    """
+    List scheduling with the apparent tardiness cost (ATC) rule: jobs are
+    popped from a max-heap keyed by expected failure cost per hour of work,
+    discounted by how much slack remains before the expected failure, and
+    each is given to the technician who frees up first (a min-heap on free
+    time). A job whose parts are all out of stock is held in a third heap
+    until the shortest lead time has passed, so technicians are not left idle
+    waiting for deliveries. O(jobs x log(technicians)), so thousands of
+    machines and technicians plan in well under a second.
+    """
+
+    async def load_jobs(
+        self,
+        db: AsyncSession,
+        settings: PlanSettings,
+        now: datetime,
+        machine_ids: Optional[List[str]] = None
+    ) -> List[Job]:
+        """At-risk machines without open maintenance, with their failure deadlines"""
+        open_log = (
+            select(MaintenanceLog.id)
+            .where(MaintenanceLog.machine_id == Machine.id, MaintenanceLog.status.in_(OPEN_LOG_STATUSES))
+            .exists()
+        )
+        query = (
+            select(Machine.id, Machine.machine_id, Machine.name, Machine.fault_probability, Machine.downtime_cost_per_hour)
+            .where(Machine.fault_probability >= settings.min_fault_probability, ~open_log)
+        )
+        if machine_ids:
+            query = query.where(Machine.machine_id.in_(machine_ids))
+
+        jobs = []
+        for pk, code, name, probability, downtime_cost in (await db.execute(query)).all():
+            window = failure_window(probability or 0.0)
+            hours = failure_window_hours(window)
+            if hours is None:
+                continue
+            downtime_cost = downtime_cost or 0.0
+            jobs.append(Job(
+                machine_pk=pk,
+                machine_code=code,
+                name=name,
+                fault_probability=probability,
+                failure_window=window,
+                downtime_cost_per_hour=downtime_cost,
+                deadline=now + timedelta(hours=sum(hours) / 2),
+                expected_failure_cost=probability / 100 * downtime_cost * settings.failure_downtime_hours
+            ))
+        return jobs
+
+    async def load_parts(self, db: AsyncSession, jobs: List[Job]) -> Dict[int, Dict[str, Any]]:
+        """Unreserved stock and lead time of parts compatible with the jobs' machines"""
+        by_ref: Dict[Any, Job] = {}
+        for job in jobs:
+            by_ref[job.machine_pk] = job
+            by_ref[job.machine_code] = job
+
+        result = await db.execute(
+            select(SparePart.id, SparePart.part_number, SparePart.current_quantity,
+                   SparePart.reserved_quantity, SparePart.lead_time_days, SparePart.compatible_machines)
+            .where(SparePart.compatible_machines.is_not(None))
+        )
+        parts = {}
+        for part_id, part_number, quantity, reserved, lead_time, compatible in result.all():
+            matched = {by_ref[ref].machine_pk: by_ref[ref] for ref in parse_compatible_machines(compatible) if ref in by_ref}
+            if not matched:
+                continue
+            parts[part_id] = {
+                "part_number": part_number,
+                "available": max((quantity or 0) - (reserved or 0), 0),
+                "lead_time_days": lead_time or 0.0
+            }
+            for job in matched.values():
+                job.part_candidates.append(part_id)
+        return parts
+
+    async def load_technicians(
+        self,
+        db: AsyncSession,
+        requested: List[Dict[str, Any]],
+        settings: PlanSettings,
+        now: datetime
+    ) -> List[Technician]:
+        """
+        Requested technicians, or everyone with maintenance in the last 90
+        days; each starts once their already scheduled work is finished
+        """
+        if not requested:
+            result = await db.execute(
+                select(MaintenanceLog.technician)
+                .where(MaintenanceLog.technician.is_not(None), MaintenanceLog.scheduled_date >= now - timedelta(days=90))
+                .distinct()
+            )
+            requested = [{"name": name} for name in result.scalars().all()]
+
+        names = [tech["name"] for tech in requested]
+        duration = func.coalesce(MaintenanceLog.duration_hours, settings.job_hours) * 3600
+        result = await db.execute(
+            select(MaintenanceLog.technician, func.max(MaintenanceLog.scheduled_date + func.make_interval(0, 0, 0, 0, 0, 0, duration)))
+            .where(MaintenanceLog.technician.in_(names), MaintenanceLog.status.in_(OPEN_LOG_STATUSES))
+            .group_by(MaintenanceLog.technician)
+        )
+        busy_until = dict(result.all())
+
+        technicians = []
+        for tech in requested:
+            starts = [now, _utc(tech.get("available_from")), busy_until.get(tech["name"])]
+            technicians.append(Technician(
+                name=tech["name"],
+                free_at=max(start for start in starts if start is not None),
+                available_until=_utc(tech.get("available_until"))
+            ))
+        return technicians
+
+    def plan(
+        self,
+        jobs: List[Job],
+        technicians: List[Technician],
+        parts: Dict[int, Dict[str, Any]],
+        settings: PlanSettings,
+        now: datetime
+    ) -> List[Dict[str, Any]]:
+        """Assign jobs to technicians in ATC priority order"""
+        horizon_end = now + timedelta(days=settings.horizon_days)
+        job_hours = settings.job_hours
+
+        def atc(job: Job) -> float:
+            # All jobs share one duration, which is then also ATC's mean processing time
+            slack = max((job.deadline - now).total_seconds() / 3600 - job_hours, 0.0)
+            return job.expected_failure_cost / job_hours * math.exp(-slack / (settings.lookahead * job_hours))
+
+        queue = [(-atc(job), index) for index, job in enumerate(jobs)]
+        heapq.heapify(queue)
+        crew = [(tech.free_at, index) for index, tech in enumerate(technicians)]
+        heapq.heapify(crew)
+
+        plan = []
+        waiting: List[Tuple[datetime, float, int, Dict[str, Any]]] = []  # jobs held for a part delivery
+        while queue or waiting:
+            next_free = crew[0][0] if crew else None
+            if waiting and (not queue or next_free is None or waiting[0][0] <= next_free):
+                ready_at, _, _, entry = heapq.heappop(waiting)
+                self._place(entry, crew, technicians, ready_at, settings, horizon_end)
+                continue
+
+            neg_priority, index = heapq.heappop(queue)
+            job = jobs[index]
+            part_id, ready_at = self._pick_part(job, parts, now)
+            entry = {
+                "machine_pk": job.machine_pk,
+                "machine_id": job.machine_code,
+                "machine_name": job.name,
+                "fault_probability": round(job.fault_probability, 2),
+                "failure_window": job.failure_window,
+                "expected_failure_at": job.deadline,
+                "priority": round(-neg_priority, 4),
+                "expected_failure_cost": round(job.expected_failure_cost, 2),
+                "planned_downtime_cost": round(job.downtime_cost_per_hour * job_hours, 2),
+                "part_id": part_id,
+                "part_number": parts[part_id]["part_number"] if part_id is not None else None,
+                "part_status": None if part_id is None else ("in_stock" if ready_at <= now else "awaiting_delivery"),
+                "part_reserved": False,
+                "technician": None,
+                "start": None,
+                "end": None,
+                "status": "unscheduled"
+            }
+            plan.append(entry)
+
+            if next_free is not None and ready_at > next_free:
+                # Keep technicians on work they can start now; place this job when its part arrives
+                heapq.heappush(waiting, (ready_at, neg_priority, index, entry))
+                continue
+            if self._place(entry, crew, technicians, now, settings, horizon_end) and part_id is not None:
+                parts[part_id]["available"] -= 1
+        return plan
+
+    def _place(
+        self,
+        entry: Dict[str, Any],
+        crew: List[Tuple[datetime, int]],
+        technicians: List[Technician],
+        earliest: datetime,
+        settings: PlanSettings,
+        horizon_end: datetime
+    ) -> bool:
+        """Book a plan entry on the first technician who can take it"""
+        slot = self._assign(crew, technicians, earliest, settings, horizon_end)
+        if slot is None:
+            return False
+        tech, start = slot
+        end = start + timedelta(hours=settings.job_hours)
+        entry.update({
+            "technician": tech.name,
+            "start": start,
+            "end": end,
+            "status": "scheduled" if end <= entry["expected_failure_at"] else "late"
+        })
+        return True
+
+    def _pick_part(self, job: Job, parts: Dict[int, Dict[str, Any]], now: datetime) -> Tuple[Optional[int], datetime]:
+        """The compatible part with most stock, else the one delivered soonest"""
+        if not job.part_candidates:
+            return None, now
+        in_stock = [part_id for part_id in job.part_candidates if parts[part_id]["available"] > 0]
+        if in_stock:
+            return max(in_stock, key=lambda part_id: parts[part_id]["available"]), now
+        part_id = min(job.part_candidates, key=lambda part_id: parts[part_id]["lead_time_days"])
+        return part_id, now + timedelta(days=parts[part_id]["lead_time_days"])
+
+    def _assign(
+        self,
+        crew: List[Tuple[datetime, int]],
+        technicians: List[Technician],
+        earliest: datetime,
+        settings: PlanSettings,
+        horizon_end: datetime
+    ) -> Optional[Tuple[Technician, datetime]]:
+        """Earliest-free technician who can fit the job inside their availability and the horizon"""
+        while crew:
+            free_at, index = heapq.heappop(crew)
+            tech = technicians[index]
+            start = self._shift_start(max(free_at, earliest), settings)
+            end = start + timedelta(hours=settings.job_hours)
+            if end > horizon_end:
+                # Everyone else frees up no earlier, so nobody can take the job
+                heapq.heappush(crew, (free_at, index))
+                return None
+            if tech.available_until is not None and end > tech.available_until:
+                # Out of availability for good: leave them off the heap
+                continue
+            tech.free_at = end
+            heapq.heappush(crew, (end, index))
+            return tech, start
+        return None
+
+    def _shift_start(self, moment: datetime, settings: PlanSettings) -> datetime:
+        """First start at or after moment where the job fits in a shift"""
+        shift_hours = settings.shift_end_hour - settings.shift_start_hour
+        if shift_hours <= 0 or shift_hours >= 24:
+            return moment
+        day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        shift_start = day + timedelta(hours=settings.shift_start_hour)
+        shift_end = day + timedelta(hours=settings.shift_end_hour)
+        if moment < shift_start:
+            moment = shift_start
+        if moment + timedelta(hours=settings.job_hours) > shift_end and settings.job_hours <= shift_hours:
+            moment = shift_start + timedelta(days=1)
+        elif moment >= shift_end:
+            moment = shift_start + timedelta(days=1)
+        return moment
+
+    async def write_plan(self, db: AsyncSession, plan: List[Dict[str, Any]], settings: PlanSettings) -> List[int]:
+        """
+        Insert the scheduled jobs as maintenance logs in one statement and
+        reserve their in-stock parts through the stock ledger, so later plans
+        and manual bookings see the stock as taken (caller commits)
+        """
+        entries = [entry for entry in plan if entry["start"] is not None]
+        rows = [
+            {
+                "machine_id": entry["machine_pk"],
+                "maintenance_type": MaintenanceType.PREDICTIVE,
+                "status": MaintenanceStatus.SCHEDULED,
+                "title": f"Predictive maintenance: {entry['machine_id']}",
+                "description": (
+                    f"Fault probability {entry['fault_probability']:.1f}%, expected failure window "
+                    f"{entry['failure_window']}"
+                    + (f"; part {entry['part_number']} ({entry['part_status'].replace('_', ' ')})"
+                       if entry["part_number"] else "")
+                ),
+                "scheduled_date": entry["start"],
+                "duration_hours": settings.job_hours,
+                "technician": entry["technician"],
+                "sop_reference": "SOP-MAINT-02"
+            }
+            for entry in entries
+        ]
+        if not rows:
+            return []
+
+        result = await db.execute(
+            insert(MaintenanceLog).returning(MaintenanceLog.id, sort_by_parameter_order=True), rows
+        )
+        log_ids = result.scalars().all()
+        mark_changed(db, "maintenance_logs", [{**row, "id": log_id} for row, log_id in zip(rows, log_ids)])
+        await reliability_kpis.record_scheduled(Counter(row["machine_id"] for row in rows), db)
+
+        for entry, log_id in zip(entries, log_ids):
+            if entry["part_status"] != "in_stock":
+                continue
+            try:
+                await stock_ledger.reserve(
+                    entry["part_id"], 1, db,
+                    maintenance_log_id=log_id,
+                    reference="Maintenance plan",
+                    performed_by="maintenance optimizer"
+                )
+                entry["part_reserved"] = True
+            except InsufficientStockError:
+                # Taken since the parts were loaded; the job keeps its slot and waits for stock
+                entry["part_status"] = "awaiting_delivery"
+
+        await db.execute(
+            update(Machine),
+            [{"id": row["machine_id"], "next_maintenance_date": row["scheduled_date"]} for row in rows]
+        )
+        mark_changed(db, "machines")
+        return log_ids
+
+    async def optimize(
+        self,
+        db: AsyncSession,
+        technicians: List[Dict[str, Any]],
+        settings: PlanSettings,
+        machine_ids: Optional[List[str]] = None,
+        apply: bool = True
+    ) -> Dict[str, Any]:
+        """Load, plan and (optionally) write the fleet plan (caller commits)"""
+        started = time.perf_counter()
+        now = datetime.now(timezone.utc)
+
+        jobs = await self.load_jobs(db, settings, now, machine_ids)
+        parts = await self.load_parts(db, jobs)
+        crew = await self.load_technicians(db, technicians, settings, now)
+        if not crew:
+            raise ValueError("No technicians given and none found in recent maintenance logs")
+        plan = self.plan(jobs, crew, parts, settings, now)
+
+        log_ids = await self.write_plan(db, plan, settings) if apply else []
+        for entry, log_id in zip((entry for entry in plan if entry["start"] is not None), log_ids):
+            entry["maintenance_log_id"] = log_id
+
+        by_status = {status: [entry for entry in plan if entry["status"] == status]
+                     for status in ("scheduled", "late", "unscheduled")}
+        return {
+            "summary": {
+                "machines_considered": len(jobs),
+                "technicians": len(crew),
+                "scheduled": len(by_status["scheduled"]),
+                "late": len(by_status["late"]),
+                "unscheduled": len(by_status["unscheduled"]),
+                "expected_failure_cost_covered": round(sum(e["expected_failure_cost"] for e in by_status["scheduled"]), 2),
+                "expected_failure_cost_at_risk": round(
+                    sum(e["expected_failure_cost"] for e in by_status["late"] + by_status["unscheduled"]), 2
+                ),
+                "planned_downtime_cost": round(
+                    sum(e["planned_downtime_cost"] for e in by_status["scheduled"] + by_status["late"]), 2
+                ),
+                "applied": apply,
+                "planning_ms": round((time.perf_counter() - started) * 1000, 1)
+            },
+            "plan": plan
+        }
+
+def _utc(moment: Optional[datetime]) -> Optional[datetime]:
+    if moment is not None and moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment
+
+
+# Used by the maintenance routes
+maintenance_optimizer = MaintenanceOptimizer()
@@ -0,0 +1,262 @@
+"""
+Plant Rollups
+Precomputed plant -> department -> location -> machine aggregates of health,
+fault risk and downtime exposure, updated incrementally on machine commits.
+The plant root also serves the fleet status summary.
+"""
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select, func, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.events import on_commit
+from models.machine import Machine, MachineStatus
+
+UNASSIGNED = "unassigned"
+
+# Per-machine fields of the fleet status summary
+FLEET_MACHINE_FIELDS = ("machine_id", "name", "status", "health_score", "fault_probability")
+
+Path = Tuple[str, ...]  # () plant, (department,), (department, location)
+
+@dataclass
+class _Rollup:
+    """Running sums for one node; averages are derived on read"""
+    machine_count: int = 0
+    status_counts: Dict[str, int] = field(default_factory=dict)
+    health_total: float = 0.0
+    fault_probability_total: float = 0.0
+    downtime_cost_per_hour: float = 0.0
+    downtime_exposure_per_hour: float = 0.0  # downtime cost weighted by fault probability
+
+    def apply(self, machine: Dict[str, Any], sign: int):
+        self.add(machine["status"], sign, sign * machine["health_score"], sign * machine["fault_probability"],
+                 sign * machine["downtime_cost_per_hour"], sign * machine["downtime_exposure_per_hour"])
+
+    def add(self, status: str, count: int, health: float, fault_probability: float,
+            downtime_cost: float, downtime_exposure: float):
+        """Fold in a group of machines with the same status"""
+        self.machine_count += count
+        self.status_counts[status] = self.status_counts.get(status, 0) + count
+        self.health_total += health
+        self.fault_probability_total += fault_probability
+        self.downtime_cost_per_hour += downtime_cost
+        self.downtime_exposure_per_hour += downtime_exposure
+
+    def to_dict(self) -> Dict[str, Any]:
+        count = self.machine_count
+        return {
+            "machine_count": count,
+            "status_counts": {status.value: self.status_counts.get(status.value, 0) for status in MachineStatus},
+            "average_health_score": round(self.health_total / count, 2) if count else None,
+            "average_fault_probability": round(self.fault_probability_total / count, 2) if count else None,
+            "downtime_cost_per_hour": round(self.downtime_cost_per_hour, 2),
+            "downtime_exposure_per_hour": round(self.downtime_exposure_per_hour, 2)
+        }
+
+class PlantRollups:
+    """
+    Every machine contributes to exactly three nodes (plant, its department and
+    its location), so a machine change is three subtractions and three
+    additions, and reading a subtree is a dictionary lookup plus its children.
+    The fleet summary is the plant node plus the machine list, cached until
+    the next change.
+    """
+
+    def __init__(self):
+        self._machines: Dict[int, Dict[str, Any]] = {}
+        self._nodes: Dict[Path, _Rollup] = {}
+        self._children: Dict[Path, Set[str]] = {}
+        self._location_machines: Dict[Path, Set[int]] = {}
+        self._fleet_payload: Optional[Dict[str, Any]] = None
+        self._built = False
+        self._version = 0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self, rows: Optional[List[Any]] = None):
+        """Force a rebuild on the next read"""
+        self._built = False
+        self._version += 1
+
+    async def ensure_built(self, db: AsyncSession, attempts: int = 3):
+        """
+        Build the tree if it has never been built or was invalidated
+        Node aggregates come from one GROUP BY per department, location and
+        status; machine rows are read only for the location and fleet lists.
+        """
+        if self._built:
+            return
+
+        async with self._lock:
+            for attempt in range(attempts):
+                if self._built:
+                    return
+                version = self._version
+
+                fault_probability = func.coalesce(Machine.fault_probability, 0.0)
+                downtime_cost = func.coalesce(Machine.downtime_cost_per_hour, 0.0)
+                result = await db.execute(
+                    select(
+                        Machine.department, Machine.location, Machine.status, func.count(),
+                        func.sum(func.coalesce(Machine.health_score, 100.0)),
+                        func.sum(fault_probability),
+                        func.sum(downtime_cost),
+                        func.sum(downtime_cost * fault_probability / 100)
+                    )
+                    .group_by(Machine.department, Machine.location, Machine.status)
+                )
+                groups = result.all()
+
+                result = await db.execute(
+                    select(Machine.id, Machine.machine_id, Machine.name, Machine.department,
+                           Machine.location, Machine.status, Machine.health_score,
+                           Machine.fault_probability, Machine.downtime_cost_per_hour)
+                )
+                rows = result.all()
+
+                # A commit that landed while loading may be missing; reload unless out of attempts
+                stale = version != self._version
+                if stale and attempt < attempts - 1:
+                    continue
+
+                # Out of attempts: serve this load, but stay unbuilt so the next read reloads
+                self._machines, self._nodes, self._children, self._location_machines = {}, {(): _Rollup()}, {}, {}
+                self._fleet_payload = None
+                for department, location, status, count, *totals in groups:
+                    path: Path = (department or UNASSIGNED, location or UNASSIGNED)
+                    for depth in range(3):
+                        self._nodes.setdefault(path[:depth], _Rollup()).add(
+                            self._status_key(status), count, *(float(total or 0.0) for total in totals)
+                        )
+                        if depth < 2:
+                            self._children.setdefault(path[:depth], set()).add(path[depth])
+                for pk, *values in rows:
+                    machine = self._entry(*values)
+                    self._machines[pk] = machine
+                    self._location_machines.setdefault((machine["department"], machine["location"]), set()).add(pk)
+                self._built = not stale
+
+    def machines_changed(self, rows: List[Any]):
+        """Move changed machines' contributions; deleted machines are removed"""
+        if not self._built:
+            self._version += 1
+            return
+
+        for machine in rows:
+            state = inspect(machine, raiseerr=False)
+            if state is None or state.key is None:
+                # Core write: fall back to a rebuild
+                self.invalidate()
+                return
+
+            self._remove(machine.id)
+            if not state.was_deleted:
+                self._add(machine.id, self._entry(
+                    machine.machine_id, machine.name, machine.department, machine.location,
+                    machine.status, machine.health_score, machine.fault_probability,
+                    machine.downtime_cost_per_hour
+                ))
+
+    def subtree(self, department: Optional[str] = None, location: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Aggregates for a node and its direct children (machines for a location); None if unknown"""
+        path: Path = tuple(part for part in (department, location) if part is not None)
+        node = self._nodes.get(path)
+        if node is None:
+            return None
+
+        response = {"level": ("plant", "department", "location")[len(path)], "path": list(path), **node.to_dict()}
+        if len(path) < 2:
+            child_level = "departments" if not path else "locations"
+            response[child_level] = [
+                {"name": name, **self._nodes[path + (name,)].to_dict()}
+                for name in sorted(self._children.get(path, ()))
+            ]
+        else:
+            response["machines"] = sorted(
+                (self._machines[pk] for pk in self._location_machines.get(path, ())),
+                key=lambda machine: machine["downtime_exposure_per_hour"],
+                reverse=True
+            )
+        return response
+
+    def fleet_summary(self) -> Dict[str, Any]:
+        """The /machines/status/all response, from the plant node; rebuilt from memory only after changes"""
+        if self._fleet_payload is None:
+            plant = self._nodes[()]
+            total = plant.machine_count
+            payload = {"total_machines": total}
+            payload.update({status.value: plant.status_counts.get(status.value, 0) for status in MachineStatus})
+            payload["average_health_score"] = plant.health_total / total if total else 0.0
+            payload["machines"] = [
+                {key: self._machines[pk][key] for key in FLEET_MACHINE_FIELDS}
+                for pk in sorted(self._machines)
+            ]
+            self._fleet_payload = payload
+        return self._fleet_payload
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "built": self._built,
+            "machines": len(self._machines),
+            "nodes": len(self._nodes)
+        }
+
+    def _add(self, pk: int, machine: Dict[str, Any]):
+        self._fleet_payload = None
+        self._machines[pk] = machine
+        path: Path = (machine["department"], machine["location"])
+        for depth in range(3):
+            node_path = path[:depth]
+            self._nodes.setdefault(node_path, _Rollup()).apply(machine, +1)
+            if depth < 2:
+                self._children.setdefault(node_path, set()).add(path[depth])
+        self._location_machines.setdefault(path, set()).add(pk)
+
+    def _remove(self, pk: int):
+        machine = self._machines.pop(pk, None)
+        if machine is None:
+            return
+        self._fleet_payload = None
+        path: Path = (machine["department"], machine["location"])
+        self._location_machines[path].discard(pk)
+        for depth in (2, 1, 0):
+            node_path = path[:depth]
+            node = self._nodes[node_path]
+            node.apply(machine, -1)
+            # Drop empty departments/locations, keep the plant node
+            if node.machine_count == 0 and depth > 0:
+                del self._nodes[node_path]
+                self._children[path[:depth - 1]].discard(path[depth - 1])
+                self._children.pop(node_path, None)
+                self._location_machines.pop(node_path, None)
+
+    @staticmethod
+    def _status_key(status: Any) -> str:
+        return status.value if isinstance(status, MachineStatus) else (status or MachineStatus.OPERATIONAL.value)
+
+    @classmethod
+    def _entry(cls, machine_id, name, department, location, status, health_score,
+               fault_probability, downtime_cost_per_hour) -> Dict[str, Any]:
+        health_score = health_score if health_score is not None else 100.0
+        fault_probability = fault_probability if fault_probability is not None else 0.0
+        downtime_cost_per_hour = downtime_cost_per_hour or 0.0
+        return {
+            "machine_id": machine_id,
+            "name": name,
+            "department": department or UNASSIGNED,
+            "location": location or UNASSIGNED,
+            "status": cls._status_key(status),
+            "health_score": health_score,
+            "fault_probability": fault_probability,
+            "downtime_cost_per_hour": downtime_cost_per_hour,
+            "downtime_exposure_per_hour": downtime_cost_per_hour * fault_probability / 100
+        }
+
+
+# Shared rollups, updated on committed machine writes
+plant_rollups = PlantRollups()
+
+on_commit("machines")(plant_rollups.machines_changed)
@@ -0,0 +1,85 @@
+"""
+Prediction Cache
+LRU cache of fault prediction responses keyed by the newest sensor reading
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache for fault predictions
+    Entries are keyed by (machine, model version, reading watermark), so a
+    prediction stays valid until a newer sensor reading arrives or the model
+    changes. Only the latest watermark is kept per machine.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[str, str, Hashable], Any]" = OrderedDict()
+        self._latest_key: Dict[str, Tuple[str, str, Hashable]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(machine_id: str, model_version: str, watermark: Hashable) -> Tuple[str, str, Hashable]:
+        return (machine_id, model_version, watermark)
+
+    def get(self, machine_id: str, model_version: str, watermark: Hashable) -> Optional[Any]:
+        """Return the cached prediction for this watermark, or None"""
+        key = self.make_key(machine_id, model_version, watermark)
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, machine_id: str, model_version: str, watermark: Hashable, value: Any):
+        """Store a prediction, replacing any older watermark for the same machine"""
+        key = self.make_key(machine_id, model_version, watermark)
+
+        stale_key = self._latest_key.get(machine_id)
+        if stale_key is not None and stale_key != key:
+            self._entries.pop(stale_key, None)
+
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        self._latest_key[machine_id] = key
+
+        while len(self._entries) > self.max_size:
+            evicted_key, _ = self._entries.popitem(last=False)
+            if self._latest_key.get(evicted_key[0]) == evicted_key:
+                del self._latest_key[evicted_key[0]]
+            self.evictions += 1
+
+    def invalidate(self, machine_id: Optional[str] = None):
+        """Drop one machine's entry, or the whole cache"""
+        if machine_id is None:
+            self._entries.clear()
+            self._latest_key.clear()
+            return
+
+        key = self._latest_key.pop(machine_id, None)
+        if key is not None:
+            self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache size and hit rate"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups * 100, 2) if lookups else 0.0
+        }
+
+
+# Shared by the prediction routes for the lifetime of the process
+prediction_cache = PredictionCache()
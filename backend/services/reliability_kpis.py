@@ -0,0 +1,271 @@
+"""
+Reliability KPIs
+Keeps per-machine maintenance aggregates current as logs move from scheduled
+to in progress to completed, and derives MTBF, MTTR and maintenance cost for
+machines, machine types and the fleet
+"""
+
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy import select, delete, func, and_, case, extract
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.machine import Machine, MachineType
+from models.machine_reliability import MachineReliability
+from models.maintenance_log import MaintenanceLog, MaintenanceType, MaintenanceStatus
+
+# Completed maintenance of these types counts as a failure and its repair
+FAILURE_TYPES = (MaintenanceType.CORRECTIVE, MaintenanceType.EMERGENCY)
+
+OPEN_COUNT_COLUMNS = {
+    MaintenanceStatus.SCHEDULED: "scheduled_count",
+    MaintenanceStatus.IN_PROGRESS: "in_progress_count"
+}
+
+SUMMED_COLUMNS = (
+    "scheduled_count", "in_progress_count", "completed_count", "maintenance_hours", "total_cost",
+    "failure_count", "repair_count", "repair_hours", "failure_cost"
+)
+
+def _utc(moment: Optional[datetime]) -> Optional[datetime]:
+    if moment is None or moment.tzinfo is not None:
+        return moment
+    return moment.replace(tzinfo=timezone.utc)
+
+def work_hours(log: MaintenanceLog) -> Optional[float]:
+    """Recorded duration, else the time from start to completion; None when unknown"""
+    if log.duration_hours is not None:
+        return log.duration_hours
+    if log.started_at and log.completed_at:
+        return max((_utc(log.completed_at) - _utc(log.started_at)).total_seconds() / 3600, 0.0)
+    return None
+
+class ReliabilityKPIs:
+    """
+    Maintains the machine_reliability table
+    Every status change adds its delta to the machine's aggregate row with a
+    single-row upsert in the caller's transaction, so KPI reads touch one
+    compact row per machine instead of the maintenance history. rebuild()
+    recomputes all rows from maintenance_logs with one INSERT ... SELECT.
+    """
+
+    async def record_scheduled(self, machine_logs: Dict[int, int], db: AsyncSession):
+        """Count newly scheduled logs per machine pk (caller commits)"""
+        if not machine_logs:
+            return
+
+        stmt = pg_insert(MachineReliability).values([
+            {"machine_id": machine_pk, "scheduled_count": count}
+            for machine_pk, count in machine_logs.items()
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[MachineReliability.machine_id],
+            set_={
+                "scheduled_count": MachineReliability.scheduled_count + stmt.excluded.scheduled_count,
+                "updated_at": func.now()
+            }
+        )
+        await db.execute(stmt)
+
+    async def record_transition(
+        self,
+        log: MaintenanceLog,
+        previous_status: Optional[MaintenanceStatus],
+        db: AsyncSession
+    ):
+        """Move a log's contribution after its status changed (caller commits)"""
+        if previous_status == log.status:
+            return
+
+        deltas: Dict[str, float] = defaultdict(int)
+        if previous_status in OPEN_COUNT_COLUMNS:
+            deltas[OPEN_COUNT_COLUMNS[previous_status]] -= 1
+        if log.status in OPEN_COUNT_COLUMNS:
+            deltas[OPEN_COUNT_COLUMNS[log.status]] += 1
+
+        last_failure_at = None
+        if log.status == MaintenanceStatus.COMPLETED:
+            hours = work_hours(log)
+            cost = log.cost or 0.0
+            deltas["completed_count"] += 1
+            deltas["maintenance_hours"] += hours or 0.0
+            deltas["total_cost"] += cost
+            if log.maintenance_type in FAILURE_TYPES:
+                deltas["failure_count"] += 1
+                deltas["failure_cost"] += cost
+                if hours is not None:
+                    deltas["repair_count"] += 1
+                    deltas["repair_hours"] += hours
+                last_failure_at = _utc(log.completed_at or log.scheduled_date)
+
+        await self._apply(log.machine_id, deltas, last_failure_at, db)
+
+    async def _apply(
+        self,
+        machine_pk: int,
+        deltas: Dict[str, float],
+        last_failure_at: Optional[datetime],
+        db: AsyncSession
+    ):
+        """
+        Single-row upsert of one log's deltas
+        Deltas are bound into the update, not read back from EXCLUDED, so open
+        counts can be decremented while the inserted row starts at zero
+        """
+        if not deltas:
+            return
+
+        values = {column: max(delta, 0) for column, delta in deltas.items()}
+        set_ = {
+            column: func.greatest(getattr(MachineReliability, column) + delta, 0)
+            for column, delta in deltas.items()
+        }
+        if last_failure_at is not None:
+            values["last_failure_at"] = last_failure_at
+            set_["last_failure_at"] = func.greatest(MachineReliability.last_failure_at, last_failure_at)
+        set_["updated_at"] = func.now()
+
+        stmt = pg_insert(MachineReliability).values(machine_id=machine_pk, **values)
+        await db.execute(stmt.on_conflict_do_update(index_elements=[MachineReliability.machine_id], set_=set_))
+
+    async def rebuild(self, db: AsyncSession) -> Dict[str, int]:
+        """Recompute every machine's aggregates from the full maintenance history"""
+        log = MaintenanceLog
+        completed = log.status == MaintenanceStatus.COMPLETED
+        failed = and_(completed, log.maintenance_type.in_(FAILURE_TYPES))
+        # NULL when neither a duration nor both timestamps are known, as in work_hours()
+        timed = and_(log.started_at.is_not(None), log.completed_at.is_not(None))
+        hours = func.coalesce(
+            log.duration_hours,
+            case((timed, func.greatest(extract("epoch", log.completed_at - log.started_at) / 3600, 0)))
+        )
+
+        def total(value, condition):
+            return func.coalesce(func.sum(value).filter(condition), 0)
+
+        aggregates = (
+            select(
+                log.machine_id,
+                func.count().filter(log.status == MaintenanceStatus.SCHEDULED),
+                func.count().filter(log.status == MaintenanceStatus.IN_PROGRESS),
+                func.count().filter(completed),
+                total(func.coalesce(hours, 0), completed),
+                total(func.coalesce(log.cost, 0), completed),
+                func.count().filter(failed),
+                func.count().filter(and_(failed, hours.is_not(None))),
+                total(hours, failed),
+                total(func.coalesce(log.cost, 0), failed),
+                func.max(func.coalesce(log.completed_at, log.scheduled_date)).filter(failed)
+            )
+            .group_by(log.machine_id)
+        )
+
+        await db.execute(delete(MachineReliability))
+        result = await db.execute(
+            pg_insert(MachineReliability).from_select(
+                ["machine_id", "scheduled_count", "in_progress_count", "completed_count", "maintenance_hours",
+                 "total_cost", "failure_count", "repair_count", "repair_hours", "failure_cost", "last_failure_at"],
+                aggregates
+            )
+        )
+        machines = result.rowcount
+        logs = await db.scalar(select(func.count()).select_from(MaintenanceLog))
+        await db.commit()
+
+        return {"machines": machines, "logs": logs}
+
+    async def kpis(
+        self,
+        db: AsyncSession,
+        group_by: str = "machine_type",
+        machine_type: Optional[MachineType] = None,
+        machine_ids: Optional[Iterable[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Fleet KPIs plus one entry per machine type or machine
+        MTBF is operating time (since installation, less maintenance
+        downtime) per failure; MTTR is repair time per timed failure repair
+        """
+        query = (
+            select(Machine.id, Machine.machine_id, Machine.name, Machine.machine_type,
+                   Machine.installation_date, Machine.created_at, MachineReliability)
+            .outerjoin(MachineReliability, MachineReliability.machine_id == Machine.id)
+        )
+        if machine_type is not None:
+            query = query.where(Machine.machine_type == machine_type)
+        if machine_ids is not None:
+            query = query.where(Machine.machine_id.in_(list(machine_ids)))
+        result = await db.execute(query)
+
+        now = datetime.now(timezone.utc)
+        fleet = self._empty_totals()
+        groups: Dict[str, Dict[str, Any]] = {}
+        for _, machine_id, name, row_type, installed, created, aggregate in result.all():
+            observed_from = _utc(installed or created) or now
+            totals = {column: getattr(aggregate, column) if aggregate else 0 for column in SUMMED_COLUMNS}
+            totals["operating_hours"] = max((now - observed_from).total_seconds() / 3600 - totals["maintenance_hours"], 0.0)
+            totals["machines"] = 1
+            totals["last_failure_at"] = aggregate.last_failure_at if aggregate else None
+
+            if group_by == "machine":
+                key = machine_id
+                group = groups.setdefault(key, {"machine_id": machine_id, "name": name,
+                                                "machine_type": row_type.value, **self._empty_totals()})
+            else:
+                key = row_type.value
+                group = groups.setdefault(key, {"machine_type": key, **self._empty_totals()})
+            self._add_totals(group, totals)
+            self._add_totals(fleet, totals)
+
+        return {
+            "generated_at": now.isoformat(),
+            "fleet": self._metrics(fleet),
+            "group_by": group_by,
+            "groups": [self._metrics(group) for _, group in sorted(groups.items())]
+        }
+
+    @staticmethod
+    def _empty_totals() -> Dict[str, Any]:
+        return {**{column: 0 for column in SUMMED_COLUMNS}, "operating_hours": 0.0, "machines": 0, "last_failure_at": None}
+
+    @staticmethod
+    def _add_totals(target: Dict[str, Any], totals: Dict[str, Any]):
+        for column in (*SUMMED_COLUMNS, "operating_hours", "machines"):
+            target[column] += totals[column]
+        if totals["last_failure_at"] and (target["last_failure_at"] is None or totals["last_failure_at"] > target["last_failure_at"]):
+            target["last_failure_at"] = totals["last_failure_at"]
+
+    @staticmethod
+    def _metrics(totals: Dict[str, Any]) -> Dict[str, Any]:
+        failures, repairs = totals["failure_count"], totals["repair_count"]
+        mtbf = totals["operating_hours"] / failures if failures else None
+        mttr = totals["repair_hours"] / repairs if repairs else None
+        labels = {key: value for key, value in totals.items() if key in ("machine_id", "name", "machine_type")}
+
+        return {
+            **labels,
+            "machines": totals["machines"],
+            "mtbf_hours": round(mtbf, 2) if mtbf is not None else None,
+            "mttr_hours": round(mttr, 2) if mttr is not None else None,
+            "availability": round(mtbf / (mtbf + mttr), 4) if mtbf is not None and mttr is not None and mtbf + mttr > 0 else None,
+            "failures": failures,
+            "last_failure_at": totals["last_failure_at"].isoformat() if totals["last_failure_at"] else None,
+            "maintenance": {
+                "scheduled": totals["scheduled_count"],
+                "in_progress": totals["in_progress_count"],
+                "completed": totals["completed_count"],
+                "hours": round(totals["maintenance_hours"], 2)
+            },
+            "cost": {
+                "total": round(totals["total_cost"], 2),
+                "failures": round(totals["failure_cost"], 2),
+                "per_machine": round(totals["total_cost"] / totals["machines"], 2) if totals["machines"] else 0.0
+            }
+        }
+
+
+# Shared by the maintenance routes and the maintenance optimizer
+reliability_kpis = ReliabilityKPIs()
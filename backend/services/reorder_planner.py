@@ -0,0 +1,287 @@
+"""
+Reorder Planner
+Vectorized reorder points, order quantities and budgeted purchase plans
+for the whole spare parts catalog
+"""
+
+import csv
+import io
+import math
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.spare_part import SparePart
+from models.supplier import Supplier
+from services.consumption_index import consumption_index
+from services.stockout_simulation import StockoutSimulator
+from services.supply_chain_service import DEFAULT_DAILY_DEMAND
+
+# Demand coefficient of variation, matches the stockout simulation
+DEMAND_CV = 0.5
+
+# EOQ cost assumptions
+ORDER_COST = 50.0           # fixed cost per purchase order line
+HOLDING_RATE = 0.25         # yearly holding cost as a share of unit cost
+
+# Plan line states
+PLANNED = "planned"
+DEFERRED_BUDGET = "deferred_budget"
+DEFERRED_SUPPLIER_LIMIT = "deferred_supplier_limit"
+BELOW_SUPPLIER_MINIMUM = "below_supplier_minimum"
+NOT_NEEDED = "not_needed"
+
+PLAN_COLUMNS = [
+    "part_id", "part_number", "supplier_id", "current_quantity", "daily_demand",
+    "effective_lead_time_days", "safety_stock", "reorder_point", "order_quantity",
+    "unit_cost", "line_cost", "priority", "state"
+]
+
+class ReorderPlanner:
+    """
+    Computes a purchase plan with array operations only:
+    - reorder point = expected lead-time demand + safety stock, where the lead
+      time includes the forecast supplier delay and safety stock covers both
+      demand and delay variability at the requested service level
+    - order quantity = order-up-to (reorder point + EOQ, capped by max stock)
+      minus current stock
+    - lines are ranked by shortfall against the reorder point, then trimmed to
+      per-supplier spend limits and the budget; supplier orders left under
+      their minimum order value after either trim are dropped
+    """
+
+    def plan(
+        self,
+        arrays: Dict[str, np.ndarray],
+        budget: Optional[float] = None,
+        service_level: float = 0.95,
+        supplier_limits: Optional[Dict[int, Dict[str, float]]] = None
+    ) -> Dict[str, np.ndarray]:
+        current = arrays["current_quantity"]
+        max_quantity = arrays["max_quantity"]
+        min_quantity = arrays["min_quantity"]
+        unit_cost = arrays["unit_cost"]
+        demand = arrays["daily_demand"]
+        supplier_id = arrays["supplier_id"]  # -1 = no supplier
+        n = current.shape[0]
+
+        # Effective lead time and its spread from the delay forecast
+        mean_delay = StockoutSimulator.expected_delay(
+            arrays["supplier_reliability"], arrays["lead_time_days"], arrays["on_time_delivery_rate"]
+        )
+        lead_time = arrays["lead_time_days"] + mean_delay
+        lead_time_std = mean_delay * 0.7  # Gamma(2) delay, CV ~0.7
+
+        # Safety stock and reorder point
+        z = NormalDist().inv_cdf(min(max(service_level, 0.5), 0.9999))
+        safety_stock = z * np.sqrt(lead_time * (DEMAND_CV * demand) ** 2 + (demand * lead_time_std) ** 2)
+        reorder_point = np.maximum(np.ceil(demand * lead_time + safety_stock), min_quantity)
+
+        # Economic order quantity and order-up-to level
+        with np.errstate(divide="ignore", invalid="ignore"):
+            eoq = np.where(
+                unit_cost > 0,
+                np.sqrt(2 * demand * 365 * ORDER_COST / (HOLDING_RATE * unit_cost)),
+                0.0
+            )
+        order_up_to = np.minimum(reorder_point + eoq, np.maximum(max_quantity, reorder_point))
+        needs_order = current <= reorder_point
+        order_quantity = np.where(needs_order, np.maximum(np.ceil(order_up_to - current), 0), 0)
+        line_cost = order_quantity * unit_cost
+
+        # Shortfall against the reorder point; below zero stock ranks first
+        with np.errstate(divide="ignore", invalid="ignore"):
+            priority = np.where(
+                reorder_point > 0,
+                (reorder_point - current) / reorder_point,
+                0.0
+            ) + (current <= 0)
+
+        state = np.full(n, NOT_NEEDED, dtype=object)
+        state[order_quantity > 0] = PLANNED
+
+        # Highest priority first, stable for equal priorities
+        order = np.argsort(-priority, kind="stable")
+
+        if supplier_limits:
+            self._apply_supplier_limits(order, supplier_id, line_cost, state, supplier_limits)
+
+        if budget is not None:
+            ranked = order[state[order] == PLANNED]
+            cumulative = np.cumsum(line_cost[ranked])
+            over_budget = cumulative > budget
+            if over_budget.any():
+                # Fill the first line that crosses the budget partially
+                position = int(np.argmax(over_budget))
+                first = ranked[position]
+                remaining = budget - (cumulative[position] - line_cost[first])
+                partial = math.floor(remaining / unit_cost[first]) if unit_cost[first] > 0 else 0
+                state[ranked[over_budget]] = DEFERRED_BUDGET
+                if partial > 0:
+                    order_quantity[first] = partial
+                    line_cost[first] = partial * unit_cost[first]
+                    state[first] = PLANNED
+            if supplier_limits:
+                # Deferred and partially filled lines can leave an order under its supplier's minimum
+                self._drop_below_minimum(supplier_id, line_cost, state, supplier_limits)
+
+        return {
+            "effective_lead_time_days": lead_time,
+            "safety_stock": safety_stock,
+            "reorder_point": reorder_point,
+            "order_quantity": order_quantity,
+            "line_cost": line_cost,
+            "priority": priority,
+            "state": state,
+            "rank": order
+        }
+
+    def _apply_supplier_limits(
+        self,
+        order: np.ndarray,
+        supplier_id: np.ndarray,
+        line_cost: np.ndarray,
+        state: np.ndarray,
+        supplier_limits: Dict[int, Dict[str, float]]
+    ):
+        """Per-supplier spend caps (in priority order) and minimum order values"""
+        known = np.array(sorted(supplier_limits), dtype=np.int64)
+        max_spend = np.array([
+            np.inf if supplier_limits[s].get("max_spend") is None else supplier_limits[s]["max_spend"]
+            for s in known
+        ], dtype=float)
+
+        planned = order[state[order] == PLANNED]
+        slot = np.minimum(np.searchsorted(known, supplier_id[planned]), known.size - 1)
+        limited = known[slot] == supplier_id[planned]
+        planned, slot = planned[limited], slot[limited]
+        if planned.size == 0:
+            return
+
+        # Running spend per supplier in priority order: group by supplier, keep rank order
+        grouped = np.lexsort((np.arange(planned.size), slot))
+        grouped_cost = line_cost[planned][grouped]
+        cumulative = np.cumsum(grouped_cost)
+        starts = np.r_[0, np.flatnonzero(np.diff(slot[grouped])) + 1]
+        offsets = np.repeat(cumulative[starts] - grouped_cost[starts], np.diff(np.r_[starts, planned.size]))
+        supplier_running = np.empty(planned.size)
+        supplier_running[grouped] = cumulative - offsets
+
+        over_cap = supplier_running > max_spend[slot]
+        state[planned[over_cap]] = DEFERRED_SUPPLIER_LIMIT
+
+        self._drop_below_minimum(supplier_id, line_cost, state, supplier_limits)
+
+    def _drop_below_minimum(
+        self,
+        supplier_id: np.ndarray,
+        line_cost: np.ndarray,
+        state: np.ndarray,
+        supplier_limits: Dict[int, Dict[str, float]]
+    ):
+        """Planned lines of suppliers whose order total does not reach their minimum order value"""
+        known = np.array(sorted(supplier_limits), dtype=np.int64)
+        min_order = np.array([supplier_limits[s].get("min_order_value") or 0.0 for s in known], dtype=float)
+
+        planned = np.flatnonzero(state == PLANNED)
+        slot = np.minimum(np.searchsorted(known, supplier_id[planned]), known.size - 1)
+        limited = known[slot] == supplier_id[planned]
+        planned, slot = planned[limited], slot[limited]
+        if planned.size == 0:
+            return
+
+        totals = np.bincount(slot, weights=line_cost[planned], minlength=known.size)
+        state[planned[totals[slot] < min_order[slot]]] = BELOW_SUPPLIER_MINIMUM
+
+async def load_catalog_arrays(db: AsyncSession) -> Dict[str, np.ndarray]:
+    """Parts joined with their supplier metrics and consumption rate, as arrays"""
+    result = await db.execute(
+        select(
+            SparePart.id, SparePart.part_number, SparePart.current_quantity,
+            SparePart.min_quantity, SparePart.max_quantity, SparePart.unit_cost,
+            SparePart.lead_time_days, SparePart.primary_supplier_id,
+            Supplier.average_lead_time_days, Supplier.reliability_score,
+            Supplier.on_time_delivery_rate
+        )
+        .outerjoin(Supplier, Supplier.id == SparePart.primary_supplier_id)
+        .order_by(SparePart.id)
+    )
+    rows = result.all()
+    rates = await consumption_index.daily_rates(db)
+
+    columns = list(zip(*rows)) if rows else [()] * 11
+    part_id = np.array(columns[0], dtype=np.int64)
+    supplier_lead = np.array([v if v is not None else np.nan for v in columns[8]], dtype=float)
+    part_lead = np.array(columns[6], dtype=float)
+
+    return {
+        "part_id": part_id,
+        "part_number": np.array(columns[1], dtype=object),
+        "current_quantity": np.array(columns[2], dtype=float),
+        "min_quantity": np.array(columns[3], dtype=float),
+        "max_quantity": np.array(columns[4], dtype=float),
+        "unit_cost": np.array(columns[5], dtype=float),
+        "lead_time_days": np.where(np.isnan(supplier_lead), part_lead, supplier_lead),
+        "supplier_id": np.array([v if v is not None else -1 for v in columns[7]], dtype=np.int64),
+        "supplier_reliability": np.array([v if v is not None else 50.0 for v in columns[9]], dtype=float),
+        "on_time_delivery_rate": np.array([v if v is not None else 80.0 for v in columns[10]], dtype=float),
+        "daily_demand": np.array([rates.get(pid, DEFAULT_DAILY_DEMAND) for pid in columns[0]], dtype=float)
+    }
+
+def plan_lines(arrays: Dict[str, np.ndarray], plan: Dict[str, np.ndarray], include_all: bool = False) -> List[Dict[str, Any]]:
+    """Plan rows in priority order; only lines needing an order unless include_all"""
+    lines = []
+    for i in plan["rank"]:
+        state = plan["state"][i]
+        if state == NOT_NEEDED and not include_all:
+            continue
+        lines.append({
+            "part_id": int(arrays["part_id"][i]),
+            "part_number": arrays["part_number"][i],
+            "supplier_id": int(arrays["supplier_id"][i]) if arrays["supplier_id"][i] >= 0 else None,
+            "current_quantity": int(arrays["current_quantity"][i]),
+            "daily_demand": round(float(arrays["daily_demand"][i]), 4),
+            "effective_lead_time_days": round(float(plan["effective_lead_time_days"][i]), 2),
+            "safety_stock": round(float(plan["safety_stock"][i]), 2),
+            "reorder_point": int(plan["reorder_point"][i]),
+            "order_quantity": int(plan["order_quantity"][i]),
+            "unit_cost": float(arrays["unit_cost"][i]),
+            "line_cost": round(float(plan["line_cost"][i]), 2),
+            "priority": round(float(plan["priority"][i]), 4),
+            "state": state
+        })
+    return lines
+
+def plan_summary(arrays: Dict[str, np.ndarray], plan: Dict[str, np.ndarray], budget: Optional[float]) -> Dict[str, Any]:
+    """Totals for the planned lines"""
+    planned = plan["state"] == PLANNED
+    supplier_totals = {}
+    if planned.any():
+        suppliers, inverse = np.unique(arrays["supplier_id"][planned], return_inverse=True)
+        spend = np.bincount(inverse, weights=plan["line_cost"][planned])
+        supplier_totals = {
+            (str(int(s)) if s >= 0 else "none"): round(float(v), 2) for s, v in zip(suppliers, spend)
+        }
+
+    return {
+        "parts_evaluated": int(planned.size),
+        "lines_planned": int(planned.sum()),
+        "lines_deferred": int(np.isin(plan["state"], [DEFERRED_BUDGET, DEFERRED_SUPPLIER_LIMIT, BELOW_SUPPLIER_MINIMUM]).sum()),
+        "total_cost": round(float(plan["line_cost"][planned].sum()), 2),
+        "budget": budget,
+        "spend_by_supplier": supplier_totals
+    }
+
+def plan_to_csv(lines: List[Dict[str, Any]]) -> str:
+    """Export plan rows as CSV"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=PLAN_COLUMNS)
+    writer.writeheader()
+    writer.writerows(lines)
+    return buffer.getvalue()
+
+
+reorder_planner = ReorderPlanner()
@@ -0,0 +1,98 @@
+"""
+Resource Versions
+Per-family version counters advanced by committed writes, used as ETags so
+polled GET endpoints can answer 304 Not Modified without touching the database
+"""
+
+import hashlib
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response
+
+from database.events import on_commit
+
+# Committed writes to these tables change the family's payloads
+FAMILY_TABLES = {
+    "machines": ("machines",),
+    "alerts": ("alerts", "alert_incidents"),
+    "risks": ("supply_chain_risk", "spare_parts", "suppliers", "stock_movements"),
+}
+
+class ResourceVersions:
+    """
+    Versions live in process memory; the boot id in every ETag keeps tags
+    from a previous process (or another worker) from ever matching.
+    """
+
+    def __init__(self):
+        self._boot = uuid.uuid4().hex[:8]
+        self._versions: Dict[Tuple[str, Optional[str]], int] = defaultdict(int)
+
+    def bump(self, family: str, key: Optional[Any] = None):
+        """Advance a family, or one keyed member of it (e.g. sensor data of one machine)"""
+        self._versions[(family, None if key is None else str(key))] += 1
+
+    def version(self, family: str, key: Optional[Any] = None) -> int:
+        return self._versions.get((family, None if key is None else str(key)), 0)
+
+    def etag(self, *members: Tuple[str, Optional[Any]], variant: str = "") -> str:
+        """Weak ETag over one or more (family, key) members, plus the request variant (query string)"""
+        parts = "-".join(str(self.version(family, key)) for family, key in members)
+        if variant:
+            parts += "-" + hashlib.sha1(variant.encode()).hexdigest()[:12]
+        return f'W/"{self._boot}-{parts}"'
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "families": {family: version for (family, key), version in self._versions.items() if key is None},
+            "keyed_members": sum(1 for _, key in self._versions if key is not None)
+        }
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison: W/"x" and "x" match
+    return "*" in candidates or etag.removeprefix("W/") in (tag.removeprefix("W/") for tag in candidates)
+
+def conditional_get(*families: str, key_param: Optional[str] = None, skip_query: Optional[str] = None):
+    """
+    Route dependency: sets ETag/Cache-Control and raises 304 when the client's
+    If-None-Match is current. The query string is part of the tag, so
+    ?limit=10 and ?limit=100 never share one. Families named "<family>:key" are keyed by the
+    path parameter key_param, e.g. conditional_get("machines", "sensor_data:key",
+    key_param="machine_id"). Requests carrying the skip_query parameter get no
+    ETag, e.g. ?since= delta polls, whose answer also depends on the clock.
+    """
+    async def dependency(request: Request, response: Response):
+        if skip_query and skip_query in request.query_params:
+            return
+        key = request.path_params.get(key_param) if key_param else None
+        members = [
+            (family.split(":")[0], key) if family.endswith(":key") else (family, None)
+            for family in families
+        ]
+        # Order-independent: ?a=1&b=2 and ?b=2&a=1 select the same body
+        variant = "&".join(f"{name}={value}" for name, value in sorted(request.query_params.multi_items()))
+        etag = resource_versions.etag(*members, variant=variant)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+        if _matches(request.headers.get("if-none-match"), etag):
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+
+    return dependency
+
+
+# Advanced from the commit hook and the sensor push route
+resource_versions = ResourceVersions()
+
+def _family_bumper(family: str):
+    def bump(rows: List[Any]):
+        resource_versions.bump(family)
+    return bump
+
+for _family, _tables in FAMILY_TABLES.items():
+    on_commit(*_tables)(_family_bumper(_family))
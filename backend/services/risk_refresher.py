@@ -0,0 +1,63 @@
+"""
+Risk Refresher
+Background rescoring of dirty and expired supply chain risk assessments,
+so the risk listing stays a read-only query
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, List, Optional
+
+from database.connection import AsyncSessionLocal
+from database.events import on_commit
+from services.supply_chain_service import SupplyChainService
+
+logger = logging.getLogger(__name__)
+
+class RiskRefresher:
+    """
+    Runs the incremental risk job after committed writes to parts, suppliers
+    or stock (the writes that mark parts dirty), and at least every
+    interval_seconds so assessments past SUPPLY_RISK_TTL_HOURS are renewed.
+    Each rescoring commits new supply_chain_risk rows, which moves the risk
+    listing's ETag.
+    """
+
+    def __init__(self, interval_seconds: Optional[float] = None):
+        self.interval_seconds = interval_seconds if interval_seconds is not None else float(os.getenv("SUPPLY_RISK_REFRESH_SECONDS", "60"))
+        if self.interval_seconds <= 0:
+            raise ValueError(f"interval_seconds (SUPPLY_RISK_REFRESH_SECONDS) must be positive, got {self.interval_seconds}")
+        self._wakeup = asyncio.Event()
+        self.running = False
+        self.last_reassessed = 0
+
+    def inputs_changed(self, rows: List[Any]):
+        """Commit hook: parts may be dirty, rescore them on the next pass"""
+        self._wakeup.set()
+
+    async def run(self):
+        """Refresh loop"""
+        self.running = True
+        while self.running:
+            try:
+                async with AsyncSessionLocal() as db:
+                    self.last_reassessed = await SupplyChainService().refresh_risks(db)
+            except Exception as e:
+                logger.error(f"Supply chain risk refresh failed: {e}", exc_info=True)
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def stop(self):
+        self.running = False
+        self._wakeup.set()
+
+
+# Started in the application lifespan
+risk_refresher = RiskRefresher()
+
+on_commit("spare_parts", "suppliers", "stock_movements")(risk_refresher.inputs_changed)
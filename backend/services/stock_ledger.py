@@ -0,0 +1,241 @@
+"""
+Stock Ledger
+Atomic reserve, consume and receive operations on spare part stock,
+each recorded as an append-only stock movement
+"""
+
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select, update, func, case
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.spare_part import SparePart
+from models.stock_movement import StockMovement, MovementType
+from services.consumption_index import consumption_index
+from services.inventory_service import stock_status_expression
+
+class InsufficientStockError(Exception):
+    """Raised when a movement would oversell or over-release a part"""
+
+    def __init__(self, part_id: int, requested: int, available: int):
+        self.part_id = part_id
+        self.requested = requested
+        self.available = available
+        super().__init__(f"Spare part {part_id}: requested {requested}, available {available}")
+
+class StockLedger:
+    """
+    Every operation is one conditional UPDATE ... RETURNING on the part row:
+    the availability check and the balance change happen in the same
+    statement, so concurrent requests cannot oversell and only contend on
+    the row of the part they touch, for the length of their transaction.
+    on_hand (current_quantity) and reserved_quantity are the materialized
+    balances; status, total_value and the risk flag change with them.
+    Callers commit.
+    """
+
+    async def reserve(self, part_id: int, quantity: int, db: AsyncSession, **details) -> Optional[StockMovement]:
+        """Hold stock for a job; fails if less than quantity is unreserved"""
+        return await self._apply(
+            part_id, MovementType.RESERVE, quantity, db,
+            condition=SparePart.current_quantity - SparePart.reserved_quantity >= quantity,
+            values={"reserved_quantity": SparePart.reserved_quantity + quantity},
+            available=SparePart.current_quantity - SparePart.reserved_quantity,
+            **details
+        )
+
+    async def release(self, part_id: int, quantity: int, db: AsyncSession, **details) -> Optional[StockMovement]:
+        """Return reserved stock without using it"""
+        return await self._apply(
+            part_id, MovementType.RELEASE, quantity, db,
+            condition=SparePart.reserved_quantity >= quantity,
+            values={"reserved_quantity": SparePart.reserved_quantity - quantity},
+            available=SparePart.reserved_quantity,
+            **details
+        )
+
+    async def consume(
+        self,
+        part_id: int,
+        quantity: int,
+        db: AsyncSession,
+        from_reservation: bool = False,
+        **details
+    ) -> Optional[StockMovement]:
+        """
+        Take stock out, either from an existing reservation or from unreserved stock
+        Consumption without a maintenance log is added to the consumption index
+        here; consumption for a log is indexed when the log is completed.
+        """
+        if from_reservation:
+            condition = SparePart.reserved_quantity >= quantity
+            available = SparePart.reserved_quantity
+            values = {"reserved_quantity": SparePart.reserved_quantity - quantity}
+        else:
+            condition = SparePart.current_quantity - SparePart.reserved_quantity >= quantity
+            available = SparePart.current_quantity - SparePart.reserved_quantity
+            values = {}
+
+        movement = await self._apply(
+            part_id, MovementType.CONSUME, quantity, db,
+            condition=condition,
+            values={**values, **self._on_hand_values(-quantity)},
+            available=available,
+            from_reservation=from_reservation,
+            **details
+        )
+        if movement is not None and movement.maintenance_log_id is None:
+            await consumption_index.record_usage(part_id, quantity, db)
+        return movement
+
+    async def receive(self, part_id: int, quantity: int, db: AsyncSession, **details) -> Optional[StockMovement]:
+        """Book a delivery into stock"""
+        return await self._apply(
+            part_id, MovementType.RECEIVE, quantity, db,
+            condition=None,
+            values=self._on_hand_values(quantity),
+            available=None,
+            **details
+        )
+
+    async def open_reservations(self, maintenance_log_id: int, db: AsyncSession) -> Dict[int, int]:
+        """Quantity per part still reserved for a maintenance log: reserved, less released and consumed from it"""
+        held = case(
+            (StockMovement.movement_type == MovementType.RESERVE, StockMovement.quantity),
+            (StockMovement.movement_type == MovementType.RELEASE, -StockMovement.quantity),
+            (StockMovement.from_reservation, -StockMovement.quantity),
+            else_=0
+        )
+        result = await db.execute(
+            select(StockMovement.spare_part_id, func.sum(held))
+            .where(StockMovement.maintenance_log_id == maintenance_log_id)
+            .group_by(StockMovement.spare_part_id)
+        )
+        return {part_id: quantity for part_id, quantity in result.all() if quantity > 0}
+
+    async def settle_reservations(
+        self,
+        maintenance_log_id: int,
+        db: AsyncSession,
+        consume: bool,
+        **details
+    ) -> List[StockMovement]:
+        """
+        Consume (the job was done) or release (it will not be) everything
+        still reserved for a maintenance log
+        Parts are taken in id order, so two settlements cannot deadlock on
+        each other's part rows.
+        """
+        held = await self.open_reservations(maintenance_log_id, db)
+        movements = []
+        for part_id, quantity in sorted(held.items()):
+            if consume:
+                movement = await self.consume(
+                    part_id, quantity, db, from_reservation=True, maintenance_log_id=maintenance_log_id, **details
+                )
+            else:
+                movement = await self.release(part_id, quantity, db, maintenance_log_id=maintenance_log_id, **details)
+            if movement is not None:
+                movements.append(movement)
+        return movements
+
+    async def movements(
+        self,
+        part_id: int,
+        db: AsyncSession,
+        before_id: Optional[int] = None,
+        limit: int = 100
+    ) -> List[StockMovement]:
+        """Ledger entries for a part, newest first (keyset paged by id)"""
+        query = (
+            select(StockMovement)
+            .where(StockMovement.spare_part_id == part_id)
+            .order_by(StockMovement.id.desc())
+            .limit(limit)
+        )
+        if before_id is not None:
+            query = query.where(StockMovement.id < before_id)
+
+        result = await db.execute(query)
+        return result.scalars().all()
+
+    async def log_consumption(self, maintenance_log_id: int, db: AsyncSession) -> List[Dict[str, Any]]:
+        """Parts consumed through the ledger for a maintenance log, as spare_parts_used entries"""
+        result = await db.execute(
+            select(StockMovement.spare_part_id, StockMovement.quantity)
+            .where(
+                StockMovement.maintenance_log_id == maintenance_log_id,
+                StockMovement.movement_type == MovementType.CONSUME
+            )
+        )
+        totals: Dict[int, int] = {}
+        for part_id, quantity in result.all():
+            totals[part_id] = totals.get(part_id, 0) + quantity
+        return [{"part_id": part_id, "quantity": quantity} for part_id, quantity in sorted(totals.items())]
+
+    def _on_hand_values(self, delta: int) -> Dict[str, Any]:
+        """Balance change plus the fields derived from it, in the same statement"""
+        on_hand = SparePart.current_quantity + delta
+        return {
+            "current_quantity": on_hand,
+            "status": stock_status_expression(on_hand),
+            "total_value": on_hand * SparePart.unit_cost,
+            "risk_dirty": True
+        }
+
+    async def _apply(
+        self,
+        part_id: int,
+        movement_type: MovementType,
+        quantity: int,
+        db: AsyncSession,
+        condition: Any,
+        values: Dict[str, Any],
+        available: Any,
+        maintenance_log_id: Optional[int] = None,
+        reference: Optional[str] = None,
+        performed_by: Optional[str] = None,
+        from_reservation: bool = False
+    ) -> Optional[StockMovement]:
+        """Conditional balance update and ledger entry; None if the part does not exist"""
+        if quantity <= 0:
+            raise ValueError("Quantity must be positive")
+
+        stmt = update(SparePart).where(SparePart.id == part_id)
+        if condition is not None:
+            stmt = stmt.where(condition)
+        result = await db.execute(
+            stmt.values(**values)
+            .returning(SparePart.current_quantity, SparePart.reserved_quantity)
+            .execution_options(synchronize_session=False)
+        )
+        balances = result.one_or_none()
+
+        if balances is None:
+            # Either the part is missing or the condition rejected the movement
+            if available is None:
+                return None
+            result = await db.execute(select(available).where(SparePart.id == part_id))
+            remaining = result.scalar_one_or_none()
+            if remaining is None:
+                return None
+            raise InsufficientStockError(part_id, quantity, remaining)
+
+        movement = StockMovement(
+            spare_part_id=part_id,
+            maintenance_log_id=maintenance_log_id,
+            movement_type=movement_type,
+            quantity=quantity,
+            from_reservation=from_reservation,
+            on_hand_after=balances.current_quantity,
+            reserved_after=balances.reserved_quantity,
+            reference=reference,
+            performed_by=performed_by
+        )
+        db.add(movement)
+        await db.flush()
+        return movement
+
+
+# Shared by the inventory and maintenance routes
+stock_ledger = StockLedger()
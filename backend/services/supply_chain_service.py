@@ -3,18 +3,36 @@ Supply Chain Service
 Handles supply chain risk assessment and delay prediction
 """
 
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timedelta
 from models.supply_chain_risk import SupplyChainRisk, RiskLevel
 from models.spare_part import SparePart, PartStatus
 from models.supplier import Supplier
+from sqlalchemy import select, update, func, or_, any_, bindparam, Integer
+from sqlalchemy.dialects.postgresql import insert as pg_insert, ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
+from services.stockout_simulation import stockout_simulator, PERCENTILES, STOCKOUT_HORIZONS_DAYS
+from services.consumption_index import consumption_index
+from services.delta_sync import delta_sync, DEFAULT_PAGE_SIZE
+from database.events import mark_changed
 import numpy as np
+import os
+
+# Assumed usage for parts without consumption history:
+# a typical part reaches its minimum in ~30 days from 50 units
+DEFAULT_DAILY_DEMAND = 50 / 30
+
+# Assessments older than this are recomputed even if no input changed
+RISK_TTL_HOURS = float(os.getenv("SUPPLY_RISK_TTL_HOURS", "24"))
+
+# Rows per upsert statement, keeps bind parameters under the asyncpg limit
+UPSERT_CHUNK_SIZE = 2000
 
 class SupplyChainService:
     """
     Industrial supply chain continuity and risk assessment service
     Uses predictive models for delay forecasting and stockout prediction
+    All scoring is vectorized so one part and the whole catalog share a code path
     """
     
     async def assess_risk(
@@ -27,202 +45,285 @@ class SupplyChainService:
         Comprehensive supply chain risk assessment
         Returns risk level, score, and predictions
         """
+        rates = await consumption_index.daily_rates(db, [spare_part.id])
+        scores = self._score_parts([spare_part], [supplier], rates)
+        
+        # Create or update risk record in database
+        await self._upsert_risk_rows([self._risk_row(scores, 0, spare_part, supplier)], db)
+        await self._clear_risk_dirty([spare_part.id], db)
+        await db.commit()
+        
+        return self._assessment(scores, 0, spare_part)
+    
+    async def refresh_risks(self, db: AsyncSession, full: bool = False) -> int:
+        """
+        Risk job: bulk reassessment of parts whose inputs changed
+        Only dirty parts, parts without an assessment and assessments older than
+        SUPPLY_RISK_TTL_HOURS are rescored, unless `full` is set. Candidates are
+        loaded with their supplier and previous assessment in one query, scored
+        as arrays and written back with one upsert transaction.
+        Returns the number of parts reassessed.
+        """
+        query = (
+            select(SparePart, Supplier)
+            .outerjoin(Supplier, Supplier.id == SparePart.primary_supplier_id)
+            .outerjoin(SupplyChainRisk, SupplyChainRisk.spare_part_id == SparePart.id)
+            .order_by(SparePart.id)
+            # Parts being written concurrently stay dirty for the next run
+            .with_for_update(of=SparePart, skip_locked=True)
+        )
+        if not full:
+            expires_before = datetime.utcnow() - timedelta(hours=RISK_TTL_HOURS)
+            query = query.where(or_(
+                SparePart.risk_dirty.is_(True),
+                SupplyChainRisk.id.is_(None),
+                func.coalesce(SupplyChainRisk.updated_at, SupplyChainRisk.created_at) < expires_before
+            ))
+        
+        result = await db.execute(query)
+        rows = result.all()
+        if not rows:
+            return 0
+        
+        parts = [row[0] for row in rows]
+        suppliers = [row[1] for row in rows]
+        rates = await consumption_index.daily_rates(db, None if full else [part.id for part in parts])
+        scores = self._score_parts(parts, suppliers, rates)
+        
+        await self._upsert_risk_rows(
+            [self._risk_row(scores, i, part, suppliers[i]) for i, part in enumerate(parts)],
+            db
+        )
+        await self._clear_risk_dirty([part.id for part in parts], db)
+        await db.commit()
+        
+        return len(parts)
+    
+    async def get_all_risks(self, db: AsyncSession) -> List[Dict[str, Any]]:
+        """Precomputed assessments for every part, read in one query; unassessed parts have no risk fields"""
+        result = await db.execute(self._risk_query(include_unassessed=True).order_by(SparePart.id))
+        
+        return [self._risk_payload(part, risk) for part, risk in result.all()]
+    
+    async def get_risk_changes(
+        self,
+        db: AsyncSession,
+        since: str,
+        limit: int = DEFAULT_PAGE_SIZE
+    ) -> Tuple[List[Dict[str, Any]], List[int], str, bool]:
+        """Assessments written after a delta sync cursor, part ids of deleted ones, and the next cursor"""
+        rows, deleted, cursor, has_more = await delta_sync.fetch(db, self._risk_query(), SupplyChainRisk, since, limit)
+        
+        return [self._risk_payload(part, risk) for part, risk in rows], deleted, cursor, has_more
+    
+    def _risk_query(self, include_unassessed: bool = False):
+        return (
+            select(SparePart, SupplyChainRisk)
+            .join(SupplyChainRisk, SupplyChainRisk.spare_part_id == SparePart.id, isouter=include_unassessed)
+        )
+    
+    def _risk_payload(self, part: SparePart, risk: Optional[SupplyChainRisk]) -> Dict[str, Any]:
+        payload = {
+            "part_id": part.id,
+            "part_number": part.part_number,
+            "part_name": part.name,
+            "current_quantity": part.current_quantity,
+            "min_quantity": part.min_quantity
+        }
+        if risk is None:
+            # Locked by a concurrent write during the refresh; assessed on the next run
+            return {**payload, "risk_level": None, "assessed_at": None}
+        
+        recommendations = self._generate_supply_chain_recommendations(
+            risk.risk_score,
+            risk.inventory_level or 0.0,
+            risk.stockout_probability or 0.0,
+            risk.predicted_delay_days or 0.0,
+            part
+        )
+        distribution = risk.distribution or {}
+        return {
+            **payload,
+            "risk_level": risk.risk_level.value,
+            "risk_score": round(risk.risk_score, 2),
+            "predicted_delay_days": round(risk.predicted_delay_days or 0.0, 2),
+            "predicted_delay_percentiles": distribution.get("predicted_delay_percentiles"),
+            "stockout_probability": round(risk.stockout_probability or 0.0, 2),
+            "stockout_probability_by_horizon": distribution.get("stockout_probability_by_horizon"),
+            "estimated_stockout_date": risk.estimated_stockout_date.isoformat() if risk.estimated_stockout_date else None,
+            "stockout_date_percentiles": distribution.get("stockout_date_percentiles"),
+            "inventory_level_percent": round(risk.inventory_level or 0.0, 2),
+            "supplier_reliability": round(risk.supplier_reliability or 0.0, 2),
+            "recommended_action": risk.recommended_action or "Monitor inventory levels",
+            "all_recommendations": recommendations,
+            "assessed_at": (risk.updated_at or risk.created_at).isoformat()
+        }
+    
+    def _score_parts(
+        self,
+        parts: List[SparePart],
+        suppliers: List[Optional[Supplier]],
+        daily_rates: Dict[int, float]
+    ) -> Dict[str, np.ndarray]:
+        """Compute every risk input and output for a list of parts as arrays"""
+        current_quantity = np.array([p.current_quantity for p in parts], dtype=float)
+        min_quantity = np.array([p.min_quantity for p in parts], dtype=float)
+        
         # 1. Calculate inventory level percentage
-        inventory_level = (spare_part.current_quantity / spare_part.min_quantity * 100) if spare_part.min_quantity > 0 else 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            inventory_level = np.where(min_quantity > 0, current_quantity / min_quantity * 100, 0.0)
         
         # 2. Get supplier metrics
-        supplier_reliability = supplier.reliability_score if supplier else 50.0
-        average_lead_time = supplier.average_lead_time_days if supplier else spare_part.lead_time_days
-        on_time_delivery = supplier.on_time_delivery_rate if supplier else 80.0
-        
-        # 3. Predict delivery delay
-        delay_prediction = await self._predict_delivery_delay_simple(
-            supplier_reliability,
-            average_lead_time,
-            on_time_delivery
+        supplier_reliability = np.array([s.reliability_score if s else 50.0 for s in suppliers], dtype=float)
+        average_lead_time = np.array(
+            [s.average_lead_time_days if s else p.lead_time_days for p, s in zip(parts, suppliers)],
+            dtype=float
         )
+        on_time_delivery = np.array([s.on_time_delivery_rate if s else 80.0 for s in suppliers], dtype=float)
         
-        # 4. Calculate stockout probability
-        stockout_prob = self._calculate_stockout_probability(
-            spare_part.current_quantity,
-            spare_part.min_quantity,
+        # 3. Simulate lead-time and demand scenarios for every part
+        daily_demand = np.array([daily_rates.get(p.id, DEFAULT_DAILY_DEMAND) for p in parts], dtype=float)
+        simulation = stockout_simulator.simulate(
+            current_quantity,
             average_lead_time,
-            delay_prediction
+            supplier_reliability,
+            on_time_delivery,
+            daily_demand
         )
+        delay_prediction = simulation["mean_delay"]
         
-        # 5. Estimate stockout date
-        stockout_date = self._estimate_stockout_date(
-            spare_part.current_quantity,
-            average_lead_time + delay_prediction
-        )
+        # 4. Stockout probability before replenishment arrives
+        stockout_prob = simulation["stockout_probability"]
+        
+        # 5. Median days until stockout, when it falls before replenishment (NaN otherwise)
+        median_days = simulation["stockout_days_percentiles"][:, PERCENTILES.index(50)]
+        stockout_days = np.where(median_days < simulation["expected_lead_time"], median_days, np.nan)
         
         # 6. Calculate risk score (0-100)
+        status_penalty = np.array([self._status_penalty(p.status) for p in parts], dtype=float)
         risk_score = self._calculate_risk_score(
             inventory_level,
             supplier_reliability,
             delay_prediction,
             stockout_prob,
-            spare_part.status
+            status_penalty
         )
         
-        # 7. Determine risk level
-        risk_level = self._determine_risk_level(risk_score)
+        return {
+            "inventory_level": inventory_level,
+            "supplier_reliability": supplier_reliability,
+            "delay_prediction": delay_prediction,
+            "stockout_probability": stockout_prob,
+            "stockout_days": stockout_days,
+            "stockout_days_percentiles": simulation["stockout_days_percentiles"],
+            "stockout_probability_by_horizon": simulation["stockout_probability_by_horizon"],
+            "delay_percentiles": simulation["delay_percentiles"],
+            "daily_demand": daily_demand,
+            "risk_score": risk_score
+        }
+    
+    def _assessment(
+        self,
+        scores: Dict[str, np.ndarray],
+        i: int,
+        spare_part: SparePart
+    ) -> Dict[str, Any]:
+        """API representation of one scored part"""
+        risk_score = float(scores["risk_score"][i])
+        stockout_date = self._stockout_date(scores["stockout_days"][i])
         
-        # 8. Generate recommendations
+        # Determine risk level and recommendations
+        risk_level = self._determine_risk_level(risk_score)
         recommendations = self._generate_supply_chain_recommendations(
             risk_score,
-            inventory_level,
-            stockout_prob,
-            delay_prediction,
+            float(scores["inventory_level"][i]),
+            float(scores["stockout_probability"][i]),
+            float(scores["delay_prediction"][i]),
             spare_part
         )
         
-        # 9. Create or update risk record in database
-        await self._update_risk_record(
-            spare_part,
-            supplier,
-            risk_level,
-            risk_score,
-            delay_prediction,
-            stockout_prob,
-            stockout_date,
-            inventory_level,
-            supplier_reliability,
-            db
-        )
+        distribution = self._distribution(scores, i)
         
         return {
             "risk_level": risk_level.value,
             "risk_score": round(risk_score, 2),
-            "predicted_delay_days": round(delay_prediction, 2),
-            "stockout_probability": round(stockout_prob, 2),
+            "predicted_delay_days": round(float(scores["delay_prediction"][i]), 2),
+            "predicted_delay_percentiles": distribution["predicted_delay_percentiles"],
+            "stockout_probability": round(float(scores["stockout_probability"][i]), 2),
+            "stockout_probability_by_horizon": distribution["stockout_probability_by_horizon"],
             "estimated_stockout_date": stockout_date.isoformat() if stockout_date else None,
-            "inventory_level_percent": round(inventory_level, 2),
-            "supplier_reliability": round(supplier_reliability, 2),
+            "stockout_date_percentiles": distribution["stockout_date_percentiles"],
+            "inventory_level_percent": round(float(scores["inventory_level"][i]), 2),
+            "supplier_reliability": round(float(scores["supplier_reliability"][i]), 2),
             "recommended_action": recommendations[0] if recommendations else "Monitor inventory levels",
             "all_recommendations": recommendations
         }
     
-    async def _predict_delivery_delay_simple(
-        self,
-        supplier_reliability: float,
-        average_lead_time: float,
-        on_time_delivery_rate: float
-    ) -> float:
-        """
-        Simple delay prediction model
-        In production, use Prophet or regression models with historical data
-        """
-        # Base delay based on reliability (lower reliability = higher delay)
-        reliability_factor = (100 - supplier_reliability) / 100
-        base_delay = reliability_factor * average_lead_time * 0.3
-        
-        # Add variance based on on-time delivery rate
-        delivery_variance = (100 - on_time_delivery_rate) / 100 * average_lead_time * 0.2
-        
-        # Add random component (simulating real-world uncertainty)
-        random_factor = np.random.uniform(-0.5, 1.0)
-        
-        total_delay = base_delay + delivery_variance + random_factor
-        
-        return max(0, total_delay)
+    def _distribution(self, scores: Dict[str, np.ndarray], i: int) -> Dict[str, Dict[str, Any]]:
+        """Simulated percentiles of one scored part, as returned by the API and stored with the assessment"""
+        return {
+            "predicted_delay_percentiles": {
+                f"p{p}": round(float(days), 2)
+                for p, days in zip(PERCENTILES, scores["delay_percentiles"][i])
+            },
+            "stockout_probability_by_horizon": {
+                f"{days}d": round(float(probability), 2)
+                for days, probability in zip(STOCKOUT_HORIZONS_DAYS, scores["stockout_probability_by_horizon"][i])
+            },
+            "stockout_date_percentiles": {
+                f"p{p}": date.isoformat() if date else None
+                for p, date in zip(
+                    PERCENTILES,
+                    (self._stockout_date(days) for days in scores["stockout_days_percentiles"][i])
+                )
+            }
+        }
     
-    def _calculate_stockout_probability(
-        self,
-        current_quantity: int,
-        min_quantity: int,
-        lead_time_days: float,
-        delay_days: float
-    ) -> float:
-        """
-        Calculate probability of stockout
-        Simplified model based on inventory levels and lead time
-        """
-        if current_quantity <= 0:
-            return 100.0
-        
-        if current_quantity <= min_quantity:
-            # Critical: already below minimum
-            days_remaining = (current_quantity / min_quantity) * 7 if min_quantity > 0 else 0
-            total_lead_time = lead_time_days + delay_days
-            
-            if days_remaining < total_lead_time:
-                return min(100, 50 + (total_lead_time - days_remaining) * 10)
-            else:
-                return 30
-        
-        # Normal stock level
-        buffer = (current_quantity - min_quantity) / min_quantity if min_quantity > 0 else 1
-        
-        if buffer < 0.5:  # Less than 50% buffer
-            return 20 + (0.5 - buffer) * 40
-        else:
-            return max(0, 10 - buffer * 5)
+    def _stockout_date(self, stockout_days: float) -> Optional[datetime]:
+        """Convert days until stockout into a date"""
+        if np.isnan(stockout_days):
+            return None
+        return datetime.utcnow() + timedelta(days=float(stockout_days))
     
-    def _estimate_stockout_date(
-        self,
-        current_quantity: int,
-        total_lead_time_days: float
-    ) -> Optional[datetime]:
-        """
-        Estimate when stockout might occur
-        Simplified: assumes constant consumption rate
-        """
-        if current_quantity <= 0:
-            return datetime.utcnow()
-        
-        # Assume average consumption: reaches min_quantity in ~30 days for typical parts
-        # This is a simplification - real models would use historical consumption data
-        days_until_min = (current_quantity * 30) / 50  # Rough estimate
-        
-        if days_until_min < total_lead_time_days:
-            return datetime.utcnow() + timedelta(days=days_until_min)
-        
-        return None
+    def _status_penalty(self, part_status: PartStatus) -> float:
+        """Risk points for a part already flagged low or out of stock"""
+        if part_status == PartStatus.OUT_OF_STOCK:
+            return 20
+        elif part_status == PartStatus.LOW_STOCK:
+            return 10
+        return 0
     
     def _calculate_risk_score(
         self,
-        inventory_level: float,
-        supplier_reliability: float,
-        delay_prediction: float,
-        stockout_probability: float,
-        part_status: PartStatus
-    ) -> float:
+        inventory_level: np.ndarray,
+        supplier_reliability: np.ndarray,
+        delay_prediction: np.ndarray,
+        stockout_probability: np.ndarray,
+        status_penalty: np.ndarray
+    ) -> np.ndarray:
         """
         Calculate overall risk score (0-100)
         Higher score = higher risk
         """
         # Inventory risk component (0-40 points)
-        if inventory_level <= 0:
-            inventory_risk = 40
-        elif inventory_level < 50:
-            inventory_risk = 35
-        elif inventory_level < 100:
-            inventory_risk = 25
-        elif inventory_level < 150:
-            inventory_risk = 15
-        else:
-            inventory_risk = 5
+        inventory_risk = np.select(
+            [inventory_level <= 0, inventory_level < 50, inventory_level < 100, inventory_level < 150],
+            [40, 35, 25, 15],
+            default=5
+        )
         
         # Supplier reliability risk (0-30 points)
         supplier_risk = (100 - supplier_reliability) * 0.3
         
         # Delay risk (0-20 points)
-        delay_risk = min(20, delay_prediction * 2)
+        delay_risk = np.minimum(20, delay_prediction * 2)
         
         # Stockout probability risk (0-10 points)
         stockout_risk = stockout_probability * 0.1
         
-        # Status penalty
-        status_penalty = 0
-        if part_status == PartStatus.OUT_OF_STOCK:
-            status_penalty = 20
-        elif part_status == PartStatus.LOW_STOCK:
-            status_penalty = 10
-        
         total_risk = inventory_risk + supplier_risk + delay_risk + stockout_risk + status_penalty
         
-        return min(100.0, total_risk)
+        return np.minimum(100.0, total_risk)
     
     def _determine_risk_level(self, risk_score: float) -> RiskLevel:
         """Determine risk level from score"""
@@ -272,65 +373,77 @@ class SupplyChainService:
         
         return recommendations
     
-    async def _update_risk_record(
+    def _risk_row(
         self,
+        scores: Dict[str, np.ndarray],
+        i: int,
         spare_part: SparePart,
-        supplier: Optional[Supplier],
-        risk_level: RiskLevel,
-        risk_score: float,
-        delay_prediction: float,
-        stockout_probability: float,
-        stockout_date: Optional[datetime],
-        inventory_level: float,
-        supplier_reliability: float,
-        db: AsyncSession
-    ):
-        """Create or update risk record in database"""
-        from sqlalchemy import select
-        
-        # Check if risk record exists
-        result = await db.execute(
-            select(SupplyChainRisk).where(SupplyChainRisk.spare_part_id == spare_part.id)
-        )
-        risk_record = result.scalar_one_or_none()
-        
+        supplier: Optional[Supplier]
+    ) -> Dict[str, Any]:
+        """supply_chain_risk column values for one scored part"""
+        risk_score = float(scores["risk_score"][i])
         recommendations = self._generate_supply_chain_recommendations(
             risk_score,
-            inventory_level,
-            stockout_probability,
-            delay_prediction,
+            float(scores["inventory_level"][i]),
+            float(scores["stockout_probability"][i]),
+            float(scores["delay_prediction"][i]),
             spare_part
         )
         
-        if risk_record:
-            # Update existing record
-            risk_record.risk_level = risk_level
-            risk_record.risk_score = risk_score
-            risk_record.predicted_delay_days = delay_prediction
-            risk_record.stockout_probability = stockout_probability
-            risk_record.estimated_stockout_date = stockout_date
-            risk_record.inventory_level = inventory_level
-            risk_record.supplier_reliability = supplier_reliability
-            risk_record.recommended_action = recommendations[0] if recommendations else None
-            risk_record.updated_at = datetime.utcnow()
-        else:
-            # Create new record
-            risk_record = SupplyChainRisk(
-                spare_part_id=spare_part.id,
-                supplier_id=supplier.id if supplier else None,
-                risk_level=risk_level,
-                risk_score=risk_score,
-                predicted_delay_days=delay_prediction,
-                stockout_probability=stockout_probability,
-                estimated_stockout_date=stockout_date,
-                inventory_level=inventory_level,
-                supplier_reliability=supplier_reliability,
-                recommended_action=recommendations[0] if recommendations else None,
-                urgency="high" if risk_score >= 70 else "medium" if risk_score >= 50 else "low"
+        return {
+            "spare_part_id": spare_part.id,
+            "supplier_id": supplier.id if supplier else None,
+            "risk_level": self._determine_risk_level(risk_score),
+            "risk_score": risk_score,
+            "predicted_delay_days": float(scores["delay_prediction"][i]),
+            "stockout_probability": float(scores["stockout_probability"][i]),
+            "estimated_stockout_date": self._stockout_date(scores["stockout_days"][i]),
+            "inventory_level": float(scores["inventory_level"][i]),
+            "supplier_reliability": float(scores["supplier_reliability"][i]),
+            "lead_time_variance": float(scores["delay_percentiles"][i][-1] - scores["delay_percentiles"][i][0]),
+            "demand_forecast": float(scores["daily_demand"][i]),
+            "recommended_action": recommendations[0] if recommendations else None,
+            "urgency": "high" if risk_score >= 70 else "medium" if risk_score >= 50 else "low",
+            "distribution": self._distribution(scores, i)
+        }
+    
+    async def _clear_risk_dirty(self, part_ids: List[int], db: AsyncSession):
+        """
+        Reset the dirty flag without touching the parts' updated_at
+        The ids go in as one array parameter: a first run can cover the whole catalog
+        """
+        await db.execute(
+            update(SparePart)
+            .where(SparePart.id == any_(bindparam("part_ids", part_ids, type_=ARRAY(Integer))))
+            .values(risk_dirty=False, updated_at=SparePart.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+    
+    async def _upsert_risk_rows(
+        self,
+        risk_rows: List[Dict[str, Any]],
+        db: AsyncSession
+    ):
+        """
+        INSERT ... ON CONFLICT (spare_part_id) DO UPDATE for a batch of assessments
+        Large catalogs are split into chunks inside the caller's transaction
+        """
+        for start in range(0, len(risk_rows), UPSERT_CHUNK_SIZE):
+            stmt = pg_insert(SupplyChainRisk).values(risk_rows[start:start + UPSERT_CHUNK_SIZE])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[SupplyChainRisk.spare_part_id],
+                set_={
+                    **{
+                        column: stmt.excluded[column]
+                        for column in risk_rows[0]
+                        if column != "spare_part_id"
+                    },
+                    # Assessment time, reported as assessed_at
+                    "updated_at": func.clock_timestamp()
+                }
             )
-            db.add(risk_record)
-        
-        await db.commit()
+            await db.execute(stmt)
+        mark_changed(db, "supply_chain_risk", risk_rows)
     
     async def predict_delivery_delay(
         self,
@@ -341,17 +454,28 @@ class SupplyChainService:
         Predict delivery delay for a supplier
         In production, use Prophet or time-series regression with historical data
         """
-        delay_days = await self._predict_delivery_delay_simple(
-            supplier.reliability_score,
-            supplier.average_lead_time_days,
-            supplier.on_time_delivery_rate
+        simulation = stockout_simulator.simulate(
+            current_quantity=np.zeros(1),
+            average_lead_time=np.array([supplier.average_lead_time_days], dtype=float),
+            supplier_reliability=np.array([supplier.reliability_score], dtype=float),
+            on_time_delivery_rate=np.array([supplier.on_time_delivery_rate], dtype=float),
+            daily_demand=np.zeros(1)
         )
+        delay_days = float(simulation["mean_delay"][0])
+        delay_percentiles = simulation["delay_percentiles"][0]
+        
+        # Narrow scenario spread = confident forecast
+        spread = float(delay_percentiles[-1] - delay_percentiles[0])
+        confidence = "high" if spread < 1 else "medium" if spread < 3 else "low"
         
         return {
             "supplier_id": supplier.id,
             "supplier_name": supplier.name,
             "predicted_delay_days": round(delay_days, 2),
-            "confidence": "medium",  # Would be calculated from model confidence
+            "predicted_delay_percentiles": {
+                f"p{p}": round(float(days), 2) for p, days in zip(PERCENTILES, delay_percentiles)
+            },
+            "confidence": confidence,
             "factors": [
                 f"Reliability score: {supplier.reliability_score:.1f}",
                 f"Average lead time: {supplier.average_lead_time_days:.1f} days",
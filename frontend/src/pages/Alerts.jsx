@@ -5,6 +5,9 @@ import PageLayout from '../components/PageLayout'
 
 const defaultAlerts = []
 
+// Window in which pushed alert events are merged into a single reload
+const RELOAD_COALESCE_MS = 1000
+
 
 function Alerts() {
   const [alerts, setAlerts] = useState([])
@@ -15,8 +18,26 @@ function Alerts() {
 
   useEffect(() => {
     loadAlerts()
-    const interval = setInterval(loadAlerts, 30000) // Refresh every 30 seconds
-    return () => clearInterval(interval)
+    // Reload when the server pushes alert changes; events arriving within
+    // RELOAD_COALESCE_MS share one reload, so an alert storm costs a few GETs
+    let reloadTimer = null
+    const scheduleReload = () => {
+      if (reloadTimer) return
+      reloadTimer = setTimeout(() => {
+        reloadTimer = null
+        loadAlerts()
+      }, RELOAD_COALESCE_MS)
+    }
+    const source = alertsAPI.stream()
+    source.addEventListener('alert_created', scheduleReload)
+    source.addEventListener('alert_status', scheduleReload)
+    source.addEventListener('alert_status_bulk', scheduleReload)
+    const interval = setInterval(loadAlerts, 120000) // Fallback refresh every 2 minutes
+    return () => {
+      source.close()
+      clearInterval(interval)
+      clearTimeout(reloadTimer)
+    }
   }, [filter])
 
   const loadAlerts = async () => {
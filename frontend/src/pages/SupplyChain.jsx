@@ -50,6 +50,7 @@ function SupplyChain() {
 
   // Prepare risk distribution data
   const riskDistribution = risks.reduce((acc, risk) => {
+    if (!risk.risk_level) return acc  // not assessed yet
     acc[risk.risk_level] = (acc[risk.risk_level] || 0) + 1
     return acc
   }, {})
@@ -60,7 +61,8 @@ function SupplyChain() {
   }))
 
   // Top risks
-  const topRisks = [...risks]
+  const topRisks = risks
+    .filter(risk => risk.risk_level)
     .sort((a, b) => b.risk_score - a.risk_score)
     .slice(0, 10)
 
@@ -50,7 +50,14 @@ export const machinesAPI = {
   },
   getById: (machineId) => api.get(`/machines/${machineId}`),
   getStatusAll: () => api.get('/machines/status/all'),
+  getLatestReadings: (filters = {}) =>
+    api.get('/machines/status/latest', {
+      params: filters,
+      paramsSerializer: { indexes: null }, // machine_ids=A&machine_ids=B
+    }),
   create: (machine) => api.post('/machines/', machine),
+  // Delta sync: pass '0' first, then the returned cursor
+  getChanges: (since, limit) => api.get('/machines/', { params: { since, limit } }),
 }
 
 // Faults API
@@ -63,6 +70,7 @@ export const faultsAPI = {
 export const supplyChainAPI = {
   getRisk: (partId) => api.get(`/supply/risk/${partId}`),
   getAllRisks: () => api.get('/supply/risk/all'),
+  getRiskChanges: (since, limit) => api.get('/supply/risk/all', { params: { since, limit } }),
   predictDelay: (supplierId) => api.get(`/supply/delay-prediction/${supplierId}`),
 }
 
@@ -83,11 +91,24 @@ export const alertsAPI = {
     return api.get('/alerts/', { params })
   },
   getActive: () => api.get('/alerts/active'),
+  getSummary: () => api.get('/alerts/summary'),
+  getDailyHistory: (days = 30, machineId) =>
+    api.get('/alerts/history/daily', { params: { days, machine_id: machineId } }),
+  getChanges: (since, limit) => api.get('/alerts/', { params: { since, limit } }),
+  getIncidents: (status = 'open', limit = 50) =>
+    api.get('/alerts/incidents', { params: { status, limit } }),
+  getIncident: (incidentId) => api.get(`/alerts/incidents/${incidentId}`),
+  // Server-Sent Events: alert_created / alert_status
+  stream: () => new EventSource(`${API_BASE_URL}/alerts/stream`),
   acknowledge: (alertId, acknowledgedBy) => 
     api.post(`/alerts/${alertId}/acknowledge`, null, {
       params: { acknowledged_by: acknowledgedBy }
     }),
   resolve: (alertId) => api.post(`/alerts/${alertId}/resolve`),
+  // selection: { alert_ids, machine_id, alert_type, incident_id, older_than_minutes }
+  bulkAcknowledge: (selection, acknowledgedBy) =>
+    api.post('/alerts/bulk/acknowledge', { ...selection, acknowledged_by: acknowledgedBy }),
+  bulkResolve: (selection) => api.post('/alerts/bulk/resolve', selection),
 }
 
 // SOP API
@@ -98,6 +119,7 @@ export const sopAPI = {
     if (sopCode) params.sop_code = sopCode
     return api.get('/sop/tasks', { params })
   },
+  getTaskChanges: (since, limit) => api.get('/sop/tasks', { params: { since, limit } }),
   createTask: (task) => api.post('/sop/tasks', task),
   getTask: (taskId) => api.get(`/sop/tasks/${taskId}`),
   completeTask: (taskId, results, notes) =>
@@ -109,6 +131,16 @@ export const sopAPI = {
 // Maintenance API
 export const maintenanceAPI = {
   schedule: (request) => api.post('/maintenance/schedule', request),
+  // Fleet-wide plan; pass apply: false to preview without writing logs
+  optimize: (request = {}) => api.post('/maintenance/optimize', request),
+  // Conflicts and next free slot for a technician and/or machine
+  getAvailability: (start, durationHours, technician, machineId) => {
+    const params = { start }
+    if (durationHours) params.duration_hours = durationHours
+    if (technician) params.technician = technician
+    if (machineId) params.machine_id = machineId
+    return api.get('/maintenance/availability', { params })
+  },
   getLogs: (machineId, status, limit = 100) => {
     const params = {}
     if (machineId) params.machine_id = machineId
@@ -116,6 +148,13 @@ export const maintenanceAPI = {
     if (limit) params.limit = limit
     return api.get('/maintenance/logs', { params })
   },
+  start: (logId) => api.post(`/maintenance/logs/${logId}/start`),
+  // MTBF, MTTR and cost; groupBy is 'machine_type' or 'machine'
+  getKpis: (groupBy = 'machine_type', machineType) => {
+    const params = { group_by: groupBy }
+    if (machineType) params.machine_type = machineType
+    return api.get('/maintenance/kpis', { params })
+  },
 }
 
 export default api
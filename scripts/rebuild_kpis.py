@@ -0,0 +1,28 @@
+"""
+Reliability KPI Rebuild
+Recomputes the per-machine reliability aggregates from the full maintenance
+history (same as POST /api/maintenance/kpis/rebuild, without the server)
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add backend to path
+backend_path = Path(__file__).parent.parent / "backend"
+sys.path.insert(0, str(backend_path))
+
+from database.connection import AsyncSessionLocal, close_db
+from services.reliability_kpis import reliability_kpis
+
+async def main():
+    """Main entry point"""
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await reliability_kpis.rebuild(db)
+        print(f"Rebuilt reliability KPIs: {result['machines']} machines from {result['logs']} maintenance logs")
+    finally:
+        await close_db()
+
+if __name__ == "__main__":
+    asyncio.run(main())